@@ -3,30 +3,35 @@ FreeTalk 核心管线，其主要功能为：
 将给定的小说或任何长文本形式的内容转化为可语音化，可播放的形式。
 """
 import os
+from typing import Dict
 
 try:
-    from src.template.sentences_json import SentencesJsonListCrud, SentencesJsonCrud
-    from src.utils.tools import is_all_symbols, check_sub_ta, preprocess_text
+    from src.template.sentences_json import SentencesJsonListCrud, SentencesJsonCrud, SentencesSnapshot
+    from src.utils.tools import is_all_symbols_batch, check_sub_ta_batch, preprocess_text
     from src.template.LLM_prompt import LLM_prompt
+    from src.template.llm_backend import LLMBackend, OpenAIBatchBackend, TransformersBackend
     from src.template.BaseClassTemp.BaseClass import JsonObjCrud
 except:
-    from template.sentences_json import SentencesJsonListCrud, SentencesJsonCrud
-    from utils.tools import is_all_symbols, check_sub_ta, preprocess_text
+    from template.sentences_json import SentencesJsonListCrud, SentencesJsonCrud, SentencesSnapshot
+    from utils.tools import is_all_symbols_batch, check_sub_ta_batch, preprocess_text
     from template.LLM_prompt import LLM_prompt
+    from template.llm_backend import LLMBackend, OpenAIBatchBackend, TransformersBackend
     from template.BaseClassTemp.BaseClass import JsonObjCrud
 
 class FreeTalkPipeline:
     """FreeTalk 核心管线类"""
-    def __init__(self, file_path: str, coarse_length = 30, Windows_Size: int = 3, url: str = None) -> None:
+    def __init__(self, file_path: str, coarse_length = 30, Windows_Size: int = 3, url: str = None, backend: LLMBackend | None = None, batch_job: bool = False) -> None:
         """
         初始化文本部分以及准备各类超参数，例如温度，Windows_Size等
+        backend为None时通过url（OpenAI兼容接口）调用模型，也可以传入TransformersBackend在进程内批量推理
+        batch_job为True时，每个阶段的请求作为一个batch任务提交到url并等待完成，适合整本书等不需要交互延迟的场景
         """
         self.file_path = file_path
         if not self.file_path and os.path.exists(self.file_path):
             raise FileNotFoundError(f"文件路径 {self.file_path} 不存在")
         with open(file_path, "r", encoding="utf-8") as f:
             self.origin_text = f.read()
-            self.origin_text = self.origin_text.strip().replace(" ", "")
+            self.origin_text = self.origin_text.strip()
         
         # 提取读取目录的根目录，作为后续处理的基础
         self.path_dir = os.path.dirname(self.file_path)
@@ -34,11 +39,17 @@ class FreeTalkPipeline:
         self.COARSE_LENGTH = coarse_length
         self.WINDOW_SIZE = Windows_Size
         self.data = SentencesJsonListCrud(Windows_Size=Windows_Size)
+        # 每个阶段结束时的快照，与当前列表共享未修改的子句
+        self.stages: Dict[str, SentencesSnapshot] = {}
         api_key = os.getenv("VOLCENGINE_API_KEY", "")
         if url is not None:
             self.LLM_prompt = LLM_prompt(api_key, api_default=url)
         else:
             self.LLM_prompt = LLM_prompt(api_key)
+        if batch_job:
+            self.LLM_prompt.backend = OpenAIBatchBackend(self.LLM_prompt.api_key_default, self.LLM_prompt.api_default)
+        if backend is not None:
+            self.LLM_prompt.backend = backend
     
     def forward(self):
         self.coarse_split_process()
@@ -46,6 +57,13 @@ class FreeTalkPipeline:
         self.batch_classify_role()
         self.fine_grained_text()
 
+    def _save_stage(self, stage_name: str) -> None:
+        """
+        保存当前进度到stage_name.json，并保留该阶段的快照
+        """
+        self.data.save_date(os.path.join(self.path_dir, f"{stage_name}.json"))
+        self.stages[stage_name] = self.data.snapshot()
+
     def coarse_split_process(self) -> SentencesJsonListCrud:
         """
         步骤一，对原始文本进行粗粒度非AI处理，令其初步具备基础的Json List格式
@@ -69,14 +87,13 @@ class FreeTalkPipeline:
         if _temp_sentence != "":
             coarse_sentence.append(_temp_sentence)
         ## 删除空的行以及只有符号的行
-        coarse_sentence = [s for s in coarse_sentence if s and not is_all_symbols(s)]
+        coarse_sentence = [s for s, symbols in zip(coarse_sentence, is_all_symbols_batch(coarse_sentence)) if s and not symbols]
         
         # 然后，简单管理前后文的array,建立基础的json_file
-        for i, item in enumerate(coarse_sentence):
-            self.data.create(i, {"class": None, "sub_sentence": item, "describe": {"role": None, "style": None}})
+        self.data.create_many(None, [{"class": None, "sub_sentence": item, "describe": {"role": None, "style": None}} for item in coarse_sentence])
 
         #最后，保存备份当前进度。
-        self.data.save_date(os.path.join(self.path_dir, "step1.json"))
+        self._save_stage("step1")
     
     def fine_split_process(self, reload_file_path: str | None = None) -> SentencesJsonListCrud:
         """
@@ -87,30 +104,34 @@ class FreeTalkPipeline:
             self.data.load_data(reload_file_path)
 
         # 然后，人称处理，对句子中含有代词，例如"他"，则对其进行标注。
-        for i, item in enumerate(self.data.data):
-            if not check_sub_ta(item.read_sub_sentence()):
-                continue
-            ctx = self.LLM_prompt.use_prompt_with_class("classify_ta_name", item)
+        # 含代词的子句一次性提交，后端支持时合并推理
+        _has_ta = check_sub_ta_batch(item.read_sub_sentence() for item in self.data.data)
+        _ta_items = [item for item, has_ta in zip(self.data.data, _has_ta) if has_ta]
+        for item, ctx in zip(_ta_items, self.LLM_prompt.use_prompt_with_class_batch("classify_ta_name", _ta_items)):
             item.write_origin_sub_sentence(ctx.read_origin_sub_sentence())
             print(f"代词新子句: {item.read_all()}")
         
         # 然后，开始调用api对现有现有粗颗粒度无类别结果进行处理。
-        _data = SentencesJsonListCrud(Windows_Size=self.WINDOW_SIZE)
-
-        for i, item in enumerate(self.data.data):
-            ctx_list = self.LLM_prompt.use_prompt_with_class("fine_split_process", item)
-            # 需要删除原先的整句，然后
-            for ctx in ctx_list:
+        # 先基于原列表的上下文收集所有拆分结果，再从后往前原地替换，避免替换影响后续句子的上下文
+        _splits = []
+        _items_all = list(self.data.data)
+        for item, ctx_list in zip(_items_all, self.LLM_prompt.use_prompt_with_class_batch("fine_split_process", _items_all)):
+            _items = []
+            _symbols = is_all_symbols_batch(ctx.read_sub_sentence() for ctx in ctx_list)
+            for ctx, symbols in zip(ctx_list, _symbols):
                 #查看该子句是否为不可语音句子，也就是全空或者符号等
-                if not ctx.read_sub_sentence() or is_all_symbols(ctx.read_sub_sentence()) or ctx.read_sub_sentence() == "":
+                if not ctx.read_sub_sentence() or symbols:
                     print(f"生成不可语音化句子: {ctx.read_all()}")
                     continue
                 print(f"创建新子句: {ctx.read_all()}")
-                _data.create(None, {"class": ctx.read_class(), "sub_sentence": ctx.read_sub_sentence(), "origin_sub_sentence": item.read_origin_sub_sentence(), "describe": {"role": None, "style": None}})
-        self.data = _data
+                _items.append({"class": ctx.read_class(), "sub_sentence": ctx.read_sub_sentence(), "origin_sub_sentence": item.read_origin_sub_sentence(), "describe": {"role": None, "style": None}})
+            _splits.append(_items)
+        # 需要删除原先的整句，替换为拆分后的子句
+        for i in reversed(range(len(_splits))):
+            self.data.replace_range(i, i + 1, _splits[i])
         
         # 最后，保存备份当前进度。
-        self.data.save_date(os.path.join(self.path_dir, "step2.json"))
+        self._save_stage("step2")
         return self.data
 
     
@@ -119,16 +140,16 @@ class FreeTalkPipeline:
         if reload_file_path:
             self.data.load_data(reload_file_path)
         # 对之前分类为语言和内心独白的说话人进行分类，找出其真实的说话人姓名或者代号
-        for i, item in enumerate(self.data.data):
-            if item.read_class() not in ["语言", "内心独白"]:
-                continue
-            ctx = self.LLM_prompt.use_prompt_with_class("batch_classify_role", item)
+        # 只写入说话人，不影响其他子句的上下文，因此可以一次性提交
+        _role_items = [self.data.data[i] for i in self.data.find(class_name=["语言", "内心独白"])]
+        for item, ctx in zip(_role_items, self.LLM_prompt.use_prompt_with_class_batch("batch_classify_role", _role_items)):
             item.write_describe_role(ctx.read_describe_role())
             print(f"子句的说话人: {item.read_all()}")
-        self.data.save_date(os.path.join(self.path_dir, "step3.json"))
+        self._save_stage("step3")
 
-        # 合并之前的相同类型的连续子句
-        _data = SentencesJsonListCrud(Windows_Size=self.WINDOW_SIZE)
+        # 合并之前的相同类型的连续子句，记录每一段可合并区间，最后从后往前原地替换
+        _runs = []
+        _start = 0
         # 缓冲区
         _data_temp = JsonObjCrud()
         for i, item in enumerate(self.data.data):
@@ -141,12 +162,15 @@ class FreeTalkPipeline:
                 class_name = item.read_class() if item.read_class() == "旁白" else "语言"
                 _data_temp.write_class(class_name)
             else:
-                _data.create(None, _data_temp.to_dict())
+                _runs.append((_start, i, _data_temp.to_dict()))
                 _data_temp.write_all(item.to_dict())
-        if _data_temp.read_sub_sentence != None:
-                _data.create(None, _data_temp.to_dict())
-        self.data = _data
-        self.data.save_date(os.path.join(self.path_dir, "step3_5.json"))
+                _start = i
+        if len(self.data) > 0:
+            _runs.append((_start, len(self.data), _data_temp.to_dict()))
+        for start, stop, merged in reversed(_runs):
+            if stop - start > 1:
+                self.data.replace_range(start, stop, [merged])
+        self._save_stage("step3_5")
 
         return self.data
 
@@ -159,14 +183,13 @@ class FreeTalkPipeline:
         if reload_file_path:
             self.data.load_data(reload_file_path)
         
-        for i, item in enumerate(self.data.data):
-            if item.read_class() not in ["语言", "内心独白"]:
-                continue
+        for i in self.data.find(class_name=["语言", "内心独白"]):
+            item = self.data.data[i]
             ctx = self.LLM_prompt.use_prompt_with_class("fine_grained_process", item)
             item.write_sub_sentence(ctx.read_sub_sentence())
             item.write_describe_style(ctx.read_describe_style())
             print(f"子句的语气描述: {item.read_all()}")
-        self.data.save_date(os.path.join(self.path_dir, "step4.json"))
+        self._save_stage("step4")
 
         return self.data
         
@@ -174,5 +197,25 @@ class FreeTalkPipeline:
 
 
 if __name__ == "__main__":
-    pipeline = FreeTalkPipeline("examples\doupo\origin.txt", Windows_Size=5, url="http://10.193.151.23:15387/v1")
-    pipeline.forward()
+    import argparse
+
+    STAGES = {
+        "coarse": "coarse_split_process",
+        "fine_split": "fine_split_process",
+        "role": "batch_classify_role",
+        "fine_grained": "fine_grained_text",
+    }
+    parser = argparse.ArgumentParser(description="FreeTalk 核心管线")
+    parser.add_argument("file_path", nargs="?", default=os.path.join("examples", "doupo", "origin.txt"), help="原始文本路径")
+    parser.add_argument("--url", default="http://10.193.151.23:15387/v1", help="OpenAI兼容接口地址")
+    parser.add_argument("--windows-size", type=int, default=5, help="上下文窗口大小")
+    parser.add_argument("--local-model", default=None, help="本地模型路径，指定后在进程内用transformers批量推理，不再经过HTTP")
+    parser.add_argument("--batch-size", type=int, default=8, help="本地模型每批的请求数")
+    parser.add_argument("--batch-job", action="store_true", help="每个阶段作为一个batch任务提交到url并等待完成")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="按顺序执行的阶段，只执行coarse时不会调用模型")
+    args = parser.parse_args()
+
+    backend = TransformersBackend(args.local_model, batch_size=args.batch_size) if args.local_model else None
+    pipeline = FreeTalkPipeline(args.file_path, Windows_Size=args.windows_size, url=args.url, backend=backend, batch_job=args.batch_job)
+    for stage in args.stages:
+        getattr(pipeline, STAGES[stage])()
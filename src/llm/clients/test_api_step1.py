@@ -7,16 +7,19 @@ from typing import Dict, List, Any
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 from src.template.LLM_prompt import LLM_prompt
+from src.template.llm_backend import OpenAIBatchBackend
 from src.template.BaseClassTemp.BaseEvalClass import EvalClass, EvalClassList
 
 
 class EvalStepOne:
-    def __init__(self, url: str, api_key: str | None, model_name: Dict, eval_path: str) -> None:
+    def __init__(self, url: str, api_key: str | None, model_name: Dict, eval_path: str, batch_job: bool = False) -> None:
         self.url = url
         self.api_key = api_key
         # 格式为{"api": model, "think": False}
         self.model_name = model_name
         self.eval_path = eval_path
+        # 为True时eval_step的所有请求作为一个batch任务提交并等待完成
+        self.batch_job = batch_job
         self.data: EvalClassList = None
         self.agent = None
         self._load()
@@ -40,6 +43,8 @@ class EvalStepOne:
         self.agent = LLM_prompt(api_key_default, self.url)
         # 修改step 1的api为我们需要的
         self.agent.update_api(api_key_default=None, api_default=None, api=self.model_name.get("api", ""), think=self.model_name.get("think", ""), api_faster=self.model_name.get("api", ""), think_faster=self.model_name.get("think", ""))
+        if self.batch_job:
+            self.agent.backend = OpenAIBatchBackend(self.agent.api_key_default, self.agent.api_default)
 
         
     def eval_step(self):
@@ -49,13 +54,22 @@ class EvalStepOne:
 
         # 首先，对数据进行处理，让其可以正常输入
         _data: List[EvalClass] = self.data.data
+        _messages = [
+            [{"role": "system", "content": "你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的复杂文本进行分割，将其分为语言、内心独白和旁白。你还需要灵活利用上下文来判断，例如观察上文是否正在延续没有说完的话或思考，这会对你后续的判断产生很重要的影响。"}, 
+            {"role": "user", "content": ctx.read_origin_input()}]
+            for ctx in _data
+        ]
+        # batch任务模式下一次提交所有请求，否则逐条调用
+        if self.batch_job:
+            _api = self.agent.api_faster
+            _raws = self.agent.backend.chat_batch(_api["api"], _messages, {"thinking": {"type": _api["think"]}} if _api["think"] != "disable" else None)
+        else:
+            _raws = [None] * len(_messages)
 
         for i, ctx in enumerate(_data):
-            content = message=ctx.read_origin_input()
-            message = [{"role": "system", "content": "你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的复杂文本进行分割，将其分为语言、内心独白和旁白。你还需要灵活利用上下文来判断，例如观察上文是否正在延续没有说完的话或思考，这会对你后续的判断产生很重要的影响。"}, 
-            {"role": "user", "content": content}]
+            message = _messages[i]
             # print(f"发送信息为：{message}")
-            resp: List[Dict] = self.agent._classify_text_interface(prompt_template=None, ctx=None, message=message)
+            resp: List[Dict] = self.agent._classify_text_interface(prompt_template=None, ctx=None, message=message, raw=_raws[i])
             if self.data.data[i].resp != [] and self.data.data[i].resp is not None:
                 _resp = ctx.read_resp()
                 if self.model_name in [ctx["model"] for ctx in _resp]:
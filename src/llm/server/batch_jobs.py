@@ -0,0 +1,297 @@
+"""
+OpenAI-Batch-style offline jobs for the local LLM server.
+
+Clients upload a JSONL file where every line is
+``{"custom_id": ..., "method": "POST", "url": "/v1/chat/completions", "body": {...}}``,
+create a batch from it, poll its status and download the results as another
+JSONL file, the same flow as the OpenAI Batch API.
+
+Jobs run one at a time on a background thread and go through the same
+``BatchScheduler`` as interactive traffic. Requests are sorted by prompt
+length and submitted ``chunk_size`` at a time (the scheduler's batch size by
+default), so every chunk becomes one full batch of similar-length prompts,
+while the queue never holds more than one chunk and interactive requests can
+still get in between chunks.
+
+Nothing here depends on torch: building a ``GenerationRequest`` from a request
+body, rendering a result as a response body and, when the server hosts several
+checkpoints, picking the scheduler of a body's ``model`` are passed in by the
+server.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+try:
+    from src.llm.server.scheduler import BatchScheduler, GenerationRequest, GenerationResult, QueueFullError
+except ImportError:
+    from scheduler import BatchScheduler, GenerationRequest, GenerationResult, QueueFullError
+
+
+@dataclass
+class StoredFile:
+    id: str
+    filename: str
+    purpose: str
+    bytes: int
+    created_at: int
+    path: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "object": "file", "bytes": self.bytes, "created_at": self.created_at,
+                "filename": self.filename, "purpose": self.purpose}
+
+
+class FileStore:
+    """Uploaded inputs and produced outputs, kept on disk under ``directory``."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._files: Dict[str, StoredFile] = {}
+        self._lock = threading.Lock()
+
+    def add(self, filename: str, content: bytes, purpose: str = "batch") -> StoredFile:
+        file_id = f"file-{uuid.uuid4().hex}"
+        path = os.path.join(self.directory, file_id)
+        with open(path, "wb") as f:
+            f.write(content)
+        stored = StoredFile(file_id, filename, purpose, len(content), int(time.time()), path)
+        with self._lock:
+            self._files[file_id] = stored
+        return stored
+
+    def get(self, file_id: str) -> StoredFile:
+        """Raise KeyError for unknown ids."""
+        with self._lock:
+            return self._files[file_id]
+
+    def read(self, file_id: str) -> bytes:
+        with open(self.get(file_id).path, "rb") as f:
+            return f.read()
+
+
+@dataclass
+class BatchJob:
+    id: str
+    input_file_id: str
+    endpoint: str
+    completion_window: str
+    lines: List[Dict[str, Any]] = field(repr=False)
+    metadata: Optional[Dict[str, Any]] = None
+    status: str = "validating"
+    created_at: int = field(default_factory=lambda: int(time.time()))
+    in_progress_at: Optional[int] = None
+    completed_at: Optional[int] = None
+    failed_at: Optional[int] = None
+    cancelled_at: Optional[int] = None
+    output_file_id: Optional[str] = None
+    error_file_id: Optional[str] = None
+    completed: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    cancel_requested: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "batch",
+            "endpoint": self.endpoint,
+            "errors": {"object": "list", "data": self.errors} if self.errors else None,
+            "input_file_id": self.input_file_id,
+            "completion_window": self.completion_window,
+            "status": self.status,
+            "output_file_id": self.output_file_id,
+            "error_file_id": self.error_file_id,
+            "created_at": self.created_at,
+            "in_progress_at": self.in_progress_at,
+            "completed_at": self.completed_at,
+            "failed_at": self.failed_at,
+            "cancelled_at": self.cancelled_at,
+            "request_counts": {"total": len(self.lines), "completed": self.completed, "failed": self.failed},
+            "metadata": self.metadata,
+        }
+
+
+def prompt_length(body: Dict[str, Any]) -> int:
+    """Characters of all messages, a cheap stand-in for the prompt's token count."""
+    return sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+
+
+class BatchJobManager:
+    def __init__(self, scheduler: Optional[BatchScheduler], files: FileStore,
+                 build_request: Callable[[Dict[str, Any]], GenerationRequest],
+                 render_response: Callable[[Dict[str, Any], GenerationResult], Dict[str, Any]],
+                 chunk_size: Optional[int] = None, length_of: Callable[[Dict[str, Any]], int] = prompt_length,
+                 scheduler_for: Optional[Callable[[Dict[str, Any]], BatchScheduler]] = None) -> None:
+        if scheduler is None and (scheduler_for is None or chunk_size is None):
+            raise ValueError("without a scheduler, scheduler_for and chunk_size are required")
+        self.scheduler = scheduler
+        self.files = files
+        self.build_request = build_request
+        self.render_response = render_response
+        self.chunk_size = chunk_size or scheduler.max_batch_size
+        self.length_of = length_of
+        # Picks the scheduler of each request body (e.g. by its model); defaults to the single scheduler
+        self.scheduler_for = scheduler_for or (lambda body: scheduler)
+        self._jobs: Dict[str, BatchJob] = {}
+        self._pending: Deque[BatchJob] = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+    def create(self, input_file_id: str, endpoint: str, completion_window: str = "24h",
+               metadata: Optional[Dict[str, Any]] = None) -> BatchJob:
+        """Validate the input file and queue a job; raise KeyError for unknown files and ValueError for bad input."""
+        if endpoint != "/v1/chat/completions":
+            raise ValueError(f"unsupported endpoint: {endpoint}")
+        lines, custom_ids = [], set()
+        for number, line in enumerate(self.files.read(input_file_id).decode("utf-8").splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {number} is not valid JSON: {e}")
+            if not isinstance(item, dict) or not isinstance(item.get("body"), dict):
+                raise ValueError(f"line {number} has no request body")
+            if item.get("url", endpoint) != endpoint:
+                raise ValueError(f"line {number} targets {item.get('url')}, expected {endpoint}")
+            if item.get("custom_id") in custom_ids:
+                raise ValueError(f"line {number} repeats custom_id {item.get('custom_id')}")
+            custom_ids.add(item.get("custom_id"))
+            lines.append(item)
+        job = BatchJob(f"batch_{uuid.uuid4().hex}", input_file_id, endpoint, completion_window, lines, metadata)
+        with self._cond:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="batch-jobs", daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+        return job
+
+    def get(self, batch_id: str) -> BatchJob:
+        """Raise KeyError for unknown ids."""
+        return self._jobs[batch_id]
+
+    def list(self) -> List[BatchJob]:
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, batch_id: str) -> BatchJob:
+        """Stop a job after its current chunk; results finished so far are still written."""
+        job = self._jobs[batch_id]
+        if job.status in ("validating", "in_progress"):
+            job.cancel_requested = True
+            job.status = "cancelling"
+        return job
+
+    def wait(self, batch_id: str, timeout: Optional[float] = None, poll_interval: float = 0.05) -> BatchJob:
+        """Block until a job reaches a final status (for tests and in-process callers)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self._jobs[batch_id]
+        while job.status not in ("completed", "failed", "cancelled"):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"batch {batch_id} is still {job.status}")
+            time.sleep(poll_interval)
+        return job
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+            try:
+                self._execute(job)
+            except Exception as e:
+                print(f"Batch {job.id} failed: {str(e)}")
+                job.errors.append({"code": "server_error", "message": str(e), "line": None})
+                job.status, job.failed_at = "failed", int(time.time())
+
+    def _submit(self, body: Dict[str, Any], request: GenerationRequest):
+        scheduler = self.scheduler_for(body)
+        retried = False
+        # Wait for room instead of failing when interactive traffic fills the queue
+        while True:
+            try:
+                return scheduler.submit(request)
+            except QueueFullError:
+                time.sleep(max(scheduler.estimated_wait(), 0.05))
+            except RuntimeError:
+                # Stopped because its model was unloaded mid-job; looking it up again reloads the model
+                if retried:
+                    raise
+                retried = True
+                scheduler = self.scheduler_for(body)
+
+    def _execute(self, job: BatchJob) -> None:
+        if job.cancel_requested:
+            job.status, job.cancelled_at = "cancelled", int(time.time())
+            return
+        job.status, job.in_progress_at = "in_progress", int(time.time())
+        lines = job.lines
+        outputs: List[Optional[Dict[str, Any]]] = [None] * len(lines)
+        # Similar lengths in one chunk keep padding low
+        order = sorted(range(len(lines)), key=lambda i: self.length_of(lines[i]["body"]))
+        for start in range(0, len(order), self.chunk_size):
+            if job.cancel_requested:
+                break
+            submitted = []
+            for i in order[start:start + self.chunk_size]:
+                try:
+                    request = self.build_request(lines[i]["body"])
+                except Exception as e:
+                    outputs[i] = self._error_line(lines[i], 400, e)
+                    continue
+                try:
+                    submitted.append((i, self._submit(lines[i]["body"], request)))
+                except Exception as e:
+                    # The line was valid; the model could not be loaded or stayed unavailable
+                    outputs[i] = self._error_line(lines[i], 503, e)
+            for i, future in submitted:
+                try:
+                    outputs[i] = self._output_line(lines[i], 200, self.render_response(lines[i]["body"], future.result()))
+                except Exception as e:
+                    outputs[i] = self._error_line(lines[i], 500, e)
+            job.completed = sum(1 for output in outputs if output is not None and output["error"] is None)
+            job.failed = sum(1 for output in outputs if output is not None and output["error"] is not None)
+        # Results are written in input order
+        successes = [output for output in outputs if output is not None and output["error"] is None]
+        failures = [output for output in outputs if output is not None and output["error"] is not None]
+        if successes:
+            job.output_file_id = self._write(f"{job.id}_output.jsonl", successes).id
+        if failures:
+            job.error_file_id = self._write(f"{job.id}_error.jsonl", failures).id
+        if job.cancel_requested:
+            job.status, job.cancelled_at = "cancelled", int(time.time())
+        else:
+            job.status, job.completed_at = "completed", int(time.time())
+
+    def _write(self, filename: str, outputs: List[Dict[str, Any]]) -> StoredFile:
+        content = "".join(json.dumps(output, ensure_ascii=False) + "\n" for output in outputs)
+        return self.files.add(filename, content.encode("utf-8"), purpose="batch_output")
+
+    @staticmethod
+    def _output_line(line: Dict[str, Any], status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": line.get("custom_id"),
+            "response": {"status_code": status_code, "request_id": uuid.uuid4().hex, "body": body},
+            "error": None,
+        }
+
+    @staticmethod
+    def _error_line(line: Dict[str, Any], status_code: int, error: Exception) -> Dict[str, Any]:
+        # HTTPException keeps its message in detail
+        message = str(getattr(error, "detail", None) or error)
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": line.get("custom_id"),
+            "response": {"status_code": status_code, "request_id": uuid.uuid4().hex, "body": {"error": {"message": message}}},
+            "error": {"code": "invalid_request" if status_code == 400 else "server_error", "message": message},
+        }
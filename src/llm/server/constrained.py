@@ -0,0 +1,298 @@
+"""
+JSON-schema constrained decoding helpers for the local LLM server.
+
+``JsonSchemaMatcher`` is an incremental, character-level pushdown matcher for
+a small JSON-schema subset. The engine feeds it the text generated so far and
+asks whether a candidate token's text would keep the output a valid prefix of
+a document matching the schema; tokens that would not are masked out. Once the
+top-level value is closed the matcher reports ``complete`` and generation for
+that row can stop immediately.
+
+Supported schema keywords: ``type`` (object, array, string, number, integer,
+boolean, null, or a list of them), ``properties``, ``required``,
+``additionalProperties`` (a schema), ``items`` and string ``enum``. A schema
+without ``type`` accepts any JSON value. Objects with ``properties`` only
+accept those keys; keys may appear in any order but at most once.
+
+Nothing here depends on torch.
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+# Schema of the fine_split_process output: a list of {class, content}
+CLAUSE_LIST_SCHEMA: Dict[str, Any] = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "class": {"type": "string", "enum": ["语言", "内心独白", "旁白"]},
+            "content": {"type": "string"},
+        },
+        "required": ["class", "content"],
+    },
+}
+
+# Schemas that requests can refer to by name instead of sending them inline
+NAMED_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "clause_list": CLAUSE_LIST_SCHEMA,
+}
+
+_TYPES = {"object", "array", "string", "number", "integer", "boolean", "null"}
+_WHITESPACE = " \t\n\r"
+# Longest run of whitespace allowed between tokens, so the model cannot pad forever
+MAX_WHITESPACE = 16
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_HEX = set("0123456789abcdefABCDEF")
+_NUMBER_PREFIX = re.compile(r"-?(?:(?:0|[1-9]\d*)(?:\.\d*|\.\d+[eE][+-]?\d*|[eE][+-]?\d*)?)?\Z")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?\Z")
+_INTEGER_PREFIX = re.compile(r"-?(?:0|[1-9]\d*)?\Z")
+_INTEGER = re.compile(r"-?(?:0|[1-9]\d*)\Z")
+
+
+def check_schema(schema: Dict[str, Any]) -> None:
+    """Raise ValueError when a schema uses something the matcher cannot enforce."""
+    if not isinstance(schema, dict):
+        raise ValueError(f"schema must be an object, got {type(schema).__name__}")
+    types = _types(schema)
+    if types is not None and not types <= _TYPES:
+        raise ValueError(f"unsupported schema type: {sorted(types - _TYPES)}")
+    if "enum" in schema and not all(isinstance(value, str) for value in schema["enum"]):
+        raise ValueError("only string enums are supported")
+    for sub_schema in (schema.get("properties") or {}).values():
+        check_schema(sub_schema)
+    if isinstance(schema.get("additionalProperties"), dict):
+        check_schema(schema["additionalProperties"])
+    if "items" in schema:
+        check_schema(schema["items"])
+
+
+def schema_from_response_format(response_format: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Turn an OpenAI-style ``response_format`` into a schema, or None for plain text.
+
+    ``{"type": "json_object"}`` allows any JSON object; ``{"type": "json_schema",
+    "json_schema": {"name": ..., "schema": ...}}`` uses the given schema, or the
+    built-in schema of that name when ``schema`` is omitted.
+    """
+    if not response_format or response_format.get("type", "text") == "text":
+        return None
+    if response_format["type"] == "json_object":
+        return {"type": "object"}
+    if response_format["type"] != "json_schema":
+        raise ValueError(f"unsupported response_format type: {response_format['type']}")
+    json_schema = response_format.get("json_schema") or {}
+    schema = json_schema.get("schema")
+    if schema is None:
+        if json_schema.get("name") not in NAMED_SCHEMAS:
+            raise ValueError(f"unknown schema name: {json_schema.get('name')}")
+        schema = NAMED_SCHEMAS[json_schema["name"]]
+    check_schema(schema)
+    return schema
+
+
+def find_stop(text: str, stops: Sequence[str]) -> int:
+    """Index of the earliest stop sequence in text, or -1."""
+    positions = [index for index in (text.find(stop) for stop in stops if stop) if index >= 0]
+    return min(positions) if positions else -1
+
+
+def _types(schema: Dict[str, Any]) -> Optional[set]:
+    if "type" in schema:
+        return {schema["type"]} if isinstance(schema["type"], str) else set(schema["type"])
+    if "enum" in schema:
+        return {"string"}
+    return None
+
+
+class JsonSchemaMatcher:
+    """
+    Track whether generated text is a valid prefix of a document matching ``schema``.
+
+    The state is a stack of small tuples, so ``copy`` is cheap enough to try
+    every candidate token on its own copy.
+    """
+
+    def __init__(self, schema: Dict[str, Any]) -> None:
+        check_schema(schema)
+        self._stack: List[tuple] = [("value", schema)]
+        self._whitespace = 0
+        self.complete = False
+
+    def copy(self) -> "JsonSchemaMatcher":
+        other = JsonSchemaMatcher.__new__(JsonSchemaMatcher)
+        other._stack = list(self._stack)
+        other._whitespace = self._whitespace
+        other.complete = self.complete
+        return other
+
+    @property
+    def in_free_string(self) -> bool:
+        """True inside a string without enum that is not mid-escape, where any character is allowed."""
+        top = self._stack[-1] if self._stack else None
+        return top is not None and top[0] == "string" and top[1] is None and top[3] is None
+
+    def accepts(self, text: str) -> bool:
+        """Whether text could follow the current output; the matcher itself is unchanged."""
+        return self.copy().advance(text)
+
+    def advance(self, text: str) -> bool:
+        """Consume text; return False (leaving the matcher unusable) when it breaks the schema."""
+        for char in text:
+            if not self._step(char):
+                return False
+        return True
+
+    def _space(self) -> bool:
+        self._whitespace += 1
+        return self._whitespace <= MAX_WHITESPACE
+
+    def _step(self, char: str) -> bool:
+        if self.complete:
+            return char in _WHITESPACE and self._space()
+        top = self._stack[-1]
+        kind = top[0]
+        if kind == "string":
+            return self._string(top, char)
+        if kind == "number":
+            _, integer, buffer = top
+            if (_INTEGER_PREFIX if integer else _NUMBER_PREFIX).match(buffer + char):
+                self._stack[-1] = ("number", integer, buffer + char)
+                return True
+            if not (_INTEGER if integer else _NUMBER).match(buffer):
+                return False
+            # The number ended; the character belongs to the enclosing value
+            self._stack.pop()
+            return self._done(None) and self._step(char)
+        if kind == "literal":
+            if char != top[1][0]:
+                return False
+            if len(top[1]) > 1:
+                self._stack[-1] = ("literal", top[1][1:])
+                return True
+            self._stack.pop()
+            return self._done(None)
+        if char in _WHITESPACE:
+            return self._space()
+        self._whitespace = 0
+        if kind == "value":
+            self._stack.pop()
+            return self._start(top[1], char)
+        if kind == "array":
+            _, schema, phase = top
+            if char == "]" and phase in ("open", "sep"):
+                self._stack.pop()
+                return self._done(None)
+            if char == "," and phase == "sep":
+                self._stack[-1] = ("array", schema, "next")
+                return True
+            if phase in ("open", "next"):
+                self._stack[-1] = ("array", schema, "sep")
+                return self._start(schema.get("items", {}), char)
+            return False
+        # object
+        _, schema, phase, seen, key = top
+        if char == "}" and phase in ("open", "sep"):
+            if not set(schema.get("required", ())) <= seen:
+                return False
+            self._stack.pop()
+            return self._done(None)
+        if char == "," and phase == "sep":
+            self._stack[-1] = ("object", schema, "next", seen, None)
+            return True
+        if char == '"' and phase in ("open", "next"):
+            properties = schema.get("properties")
+            choices = None if properties is None else tuple(name for name in properties if name not in seen)
+            if choices == ():
+                return False
+            self._stack[-1] = ("object", schema, "key", seen, None)
+            self._stack.append(("string", choices, "", None))
+            return True
+        if char == ":" and phase == "colon":
+            properties = schema.get("properties")
+            if properties is not None:
+                value_schema = properties[key]
+            else:
+                additional = schema.get("additionalProperties")
+                value_schema = additional if isinstance(additional, dict) else {}
+            self._stack[-1] = ("object", schema, "sep", seen, None)
+            self._stack.append(("value", value_schema))
+            return True
+        return False
+
+    def _start(self, schema: Dict[str, Any], char: str) -> bool:
+        """Begin a value of ``schema`` whose first character is ``char``."""
+        types = _types(schema)
+
+        def allowed(name: str) -> bool:
+            return types is None or name in types
+
+        if char == "{" and allowed("object"):
+            self._stack.append(("object", schema, "open", frozenset(), None))
+        elif char == "[" and allowed("array"):
+            self._stack.append(("array", schema, "open"))
+        elif char == '"' and allowed("string"):
+            # Only enum strings keep their text, to check it against the choices
+            self._stack.append(("string", tuple(schema["enum"]) if "enum" in schema else None, "", None))
+        elif (char == "-" or char.isdigit()) and (allowed("number") or allowed("integer")):
+            integer = not allowed("number")
+            if not (_INTEGER_PREFIX if integer else _NUMBER_PREFIX).match(char):
+                return False
+            self._stack.append(("number", integer, char))
+        elif char in "tf" and allowed("boolean"):
+            self._stack.append(("literal", "rue" if char == "t" else "alse"))
+        elif char == "n" and allowed("null"):
+            self._stack.append(("literal", "ull"))
+        else:
+            return False
+        return True
+
+    def _string(self, top: tuple, char: str) -> bool:
+        _, choices, buffer, escape = top
+        # Object keys and enum values are matched against choices; free keys keep their text to reject duplicates
+        keep = choices is not None or (len(self._stack) > 1 and self._stack[-2][0] == "object" and self._stack[-2][2] == "key")
+        if escape is None:
+            if char == '"':
+                self._stack.pop()
+                if choices is not None and buffer not in choices:
+                    return False
+                return self._done(buffer if keep else None)
+            if char == "\\":
+                self._stack[-1] = ("string", choices, buffer, "\\")
+                return True
+            if ord(char) < 0x20:
+                return False
+            decoded = char
+        elif escape == "\\":
+            if char == "u":
+                self._stack[-1] = ("string", choices, buffer, "u")
+                return True
+            if char not in _ESCAPES:
+                return False
+            decoded = _ESCAPES[char]
+        else:
+            if char not in _HEX:
+                return False
+            if len(escape) < 4:
+                self._stack[-1] = ("string", choices, buffer, escape + char)
+                return True
+            decoded = chr(int(escape[1:] + char, 16))
+        if not keep:
+            self._stack[-1] = ("string", None, "", None)
+            return True
+        buffer += decoded
+        if choices is not None and not any(choice.startswith(buffer) for choice in choices):
+            return False
+        self._stack[-1] = ("string", choices, buffer, None)
+        return True
+
+    def _done(self, value: Optional[str]) -> bool:
+        """A value (or object key) just closed; update the enclosing container."""
+        if not self._stack:
+            self.complete = True
+            return True
+        top = self._stack[-1]
+        if top[0] == "object" and top[2] == "key":
+            if value in top[3]:
+                return False
+            self._stack[-1] = ("object", top[1], "colon", top[3] | {value}, value)
+        return True
@@ -1,35 +1,144 @@
 import torch
 import os
+import asyncio
+import gc
 import json
+import math
+import threading
 import time
 import uuid
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Union
+
+try:
+    from src.llm.server.batch_jobs import BatchJobManager, FileStore
+    from src.llm.server.constrained import schema_from_response_format
+    from src.llm.server.engine import QwenEngine
+    from src.llm.server.model_pool import ModelPool, list_checkpoints, resolve_checkpoint
+    from src.llm.server.prefix_cache import PrefixCache
+    from src.llm.server.replicas import ReplicaPool, cpu_threads_per_worker
+    from src.llm.server.scheduler import BatchScheduler, GenerationRequest, QueueFullError
+except ImportError:
+    from batch_jobs import BatchJobManager, FileStore
+    from constrained import schema_from_response_format
+    from engine import QwenEngine
+    from model_pool import ModelPool, list_checkpoints, resolve_checkpoint
+    from prefix_cache import PrefixCache
+    from replicas import ReplicaPool, cpu_threads_per_worker
+    from scheduler import BatchScheduler, GenerationRequest, QueueFullError
 
 # Get absolute path to model directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(current_dir, "..", "checkpoints/checkpoint-300")
+# Requests whose model names a subdirectory of the checkpoint directory are served by that checkpoint,
+# any other model name by the default model
+checkpoint_dir = os.path.abspath(os.getenv("QWEN_CHECKPOINT_DIR", os.path.join(current_dir, "..", "checkpoints")))
+model_path = os.path.join(checkpoint_dir, "checkpoint-300")
 # model_path = os.path.join(current_dir, "..", "model_path")
-model_path = os.path.abspath(model_path)
+model_path = os.path.abspath(os.getenv("QWEN_MODEL_PATH", model_path))
+# Loaded checkpoints are unloaded least recently used first to stay under this size; 0 means no cap
+model_pool_mb = int(os.getenv("QWEN_MODEL_POOL_MB", "0"))
+
+# Devices to serve on, one model replica per device, e.g. QWEN_DEVICES=cuda:0,cuda:1;
+# without it QWEN_NUM_WORKERS replicas share QWEN_DEVICE (cuda:0, or cpu without CUDA)
+default_device = os.getenv("QWEN_DEVICE", "cuda:0" if torch.cuda.is_available() else "cpu")
+devices = [d.strip() for d in os.getenv("QWEN_DEVICES", "").split(",") if d.strip()] \
+    or [default_device] * int(os.getenv("QWEN_NUM_WORKERS", "1"))
+# Past-key-values of shared prompt prefixes (system prompt + template); 0 MB disables the cache
+prefix_cache_mb = int(os.getenv("QWEN_PREFIX_CACHE_MB", "1024"))
+prefix_block_size = int(os.getenv("QWEN_PREFIX_BLOCK_SIZE", "64"))
+# CPU serving: QWEN_QUANTIZE=int8 quantizes linear layers dynamically; QWEN_CPU_THREADS defaults to
+# the usable cores split evenly between CPU workers
+quantize = os.getenv("QWEN_QUANTIZE") or None
+cpu_threads = int(os.getenv("QWEN_CPU_THREADS", "0")) or cpu_threads_per_worker(devices)
+engine_kwargs = {"quantize": quantize, "num_threads": cpu_threads}
+scheduler_kwargs = {
+    "max_batch_size": int(os.getenv("QWEN_MAX_BATCH_SIZE", "8")),
+    "max_wait_ms": float(os.getenv("QWEN_MAX_WAIT_MS", "10")),
+    "max_queue_size": int(os.getenv("QWEN_MAX_QUEUE_SIZE", "64"))
+}
+
+@dataclass
+class ServedModel:
+    path: str
+    tokenizer: Any
+    # BatchScheduler, or ReplicaPool in supervisor mode
+    scheduler: Any
+    prefix_cache: Optional[PrefixCache] = None
+
+def load_backend(path: str) -> ServedModel:
+    """
+    Load a checkpoint and start its request scheduler.
+
+    One device runs in this process: a single engine behind a BatchScheduler.
+    Several devices run in supervisor mode: a ReplicaPool with one worker
+    process per device, and only the tokenizer is loaded here.
+    """
+    print(f"Loading model from: {path}")
+    print(f"Using devices: {devices}" + (f", {quantize} quantization" if quantize else "")
+          + (f", {cpu_threads} threads per CPU worker" if cpu_threads else ""))
+    if len(devices) == 1:
+        prefix_cache = PrefixCache(
+            max_bytes=prefix_cache_mb * 1024 * 1024,
+            block_size=prefix_block_size
+        ) if prefix_cache_mb > 0 else None
+        engine = QwenEngine(path, devices[0], prefix_cache=prefix_cache, **engine_kwargs)
+        # Requests are queued and run in dynamic batches by a single worker thread
+        scheduler = BatchScheduler(engine.generate_batch, **scheduler_kwargs).start()
+        print(f"Batch scheduler: max_batch_size={scheduler.max_batch_size}, max_queue_size={scheduler.max_queue_size}")
+        return ServedModel(path, engine.tokenizer, scheduler, prefix_cache)
+    from transformers import AutoTokenizer
+    # Every worker has its own scheduler and prefix cache; requests go to the least-loaded worker
+    scheduler = ReplicaPool(
+        path,
+        devices,
+        engine_kwargs={"prefix_cache_mb": prefix_cache_mb, "prefix_block_size": prefix_block_size, **engine_kwargs},
+        restart_delay=float(os.getenv("QWEN_RESTART_DELAY", "5")),
+        **scheduler_kwargs
+    ).start()
+    print(f"Replica pool: {scheduler.num_workers} workers, max_batch_size={scheduler.max_batch_size} each")
+    return ServedModel(path, AutoTokenizer.from_pretrained(path, trust_remote_code=True), scheduler)
 
-print(f"Loading model from: {model_path}")
+def unload_backend(served: ServedModel) -> None:
+    """Stop a checkpoint's scheduler (its queued requests are cancelled) and free its memory"""
+    served.scheduler.stop(timeout=30)
+    # The scheduler holds the engine; dropping it lets the weights be freed
+    served.scheduler = None
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
-# Check if CUDA is available
-device = "cuda:3" if torch.cuda.is_available() else "cpu"
-print(f"Using device: {device}")
+models = ModelPool(
+    load_backend,
+    unload_backend,
+    max_bytes=model_pool_mb * 1024 * 1024,
+    # Queued or running requests keep a checkpoint loaded
+    is_busy=lambda served: served.scheduler is not None and served.scheduler.in_flight > 0
+)
+
+def resolve_model(name: Optional[str]) -> str:
+    """Checkpoint path for a request's model field"""
+    return resolve_checkpoint(name, checkpoint_dir) or model_path
+
+async def load_model(path: str) -> ServedModel:
+    """A checkpoint from the pool, loaded on a thread so other requests keep running meanwhile"""
+    try:
+        return await asyncio.to_thread(models.get, path)
+    except Exception as e:
+        print(f"Error loading model {path}: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Model {os.path.basename(path)} could not be loaded: {str(e)}")
 
-# Load the tokenizer and model
-tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
-model = AutoModelForCausalLM.from_pretrained(
-    model_path,
-    torch_dtype=torch.float16,
-    device_map=device,
-    trust_remote_code=True
-).eval()
+async def get_model(name: Optional[str]) -> ServedModel:
+    """The checkpoint serving a request"""
+    return await load_model(resolve_model(name))
+
+# How often a waiting handler checks whether its client has disconnected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("QWEN_DISCONNECT_POLL_INTERVAL", "0.5"))
 
 # FastAPI app
 app = FastAPI(title="Qwen3 API Server", version="1.0.0")
@@ -43,6 +152,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Loading on startup rather than at import keeps spawned replica workers, which re-import this script, from loading it too;
+# the default model loads in the background so the server answers health checks meanwhile
+@app.on_event("startup")
+def startup():
+    if os.getenv("QWEN_PRELOAD", "1") == "1":
+        threading.Thread(target=models.get, args=(model_path,), name="preload", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown():
+    models.clear()
+
 # Pydantic models for request/response
 class Message(BaseModel):
     role: str
@@ -52,9 +172,14 @@ class ChatCompletionRequest(BaseModel):
     model: str
     messages: List[Message]
     max_tokens: Optional[int] = 4096
-    temperature: Optional[float] = 1
+    temperature: Optional[float] = 0.7
     top_p: Optional[float] = 0.9
+    stop: Optional[Union[str, List[str]]] = None
     stream: Optional[bool] = False
+    # {"type": "json_schema", "json_schema": {"name": "clause_list"}} constrains the output to that schema
+    response_format: Optional[Dict[str, Any]] = None
+    # openai clients merge extra_body into the top level, e.g. {"thinking": {"type": "disabled"}}
+    thinking: Optional[Dict[str, Any]] = None
     extra_body: Optional[dict] = None
 
 class ChatMessage(BaseModel):
@@ -70,6 +195,9 @@ class Usage(BaseModel):
     prompt_tokens: int
     completion_tokens: int
     total_tokens: int
+    # Seconds spent waiting in the scheduler queue and running the batch
+    queue_time: float = 0.0
+    compute_time: float = 0.0
 
 class ChatCompletionResponse(BaseModel):
     id: str
@@ -80,90 +208,182 @@ class ChatCompletionResponse(BaseModel):
     usage: Usage
     system_fingerprint: Optional[str] = None
 
-def generate_response(messages: List[Message], max_tokens: int = 4096):
-    """Generate response using the local Qwen3 model"""
+def submit_request(request: GenerationRequest, served: ServedModel) -> asyncio.Future:
+    """
+    Queue a request on the model's batch scheduler; a full queue answers 429 with a retry hint.
+    A checkpoint unloaded since it was looked up answers 503, and the retry loads it again.
+    """
+    scheduler = served.scheduler
     try:
-        # Convert messages to the format expected by tokenizer
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Apply chat template
-        text = tokenizer.apply_chat_template(
-            formatted_messages,
-            tokenize=False,
-            add_generation_prompt=True,
-        )
-        
-        # Tokenize input and count tokens
-        model_inputs = tokenizer([text], return_tensors="pt").to(model.device)
-        prompt_tokens = len(model_inputs.input_ids[0])
-        
-        # Generate response
-        generated_ids = model.generate(
-            **model_inputs,
-            max_new_tokens=max_tokens,
-            temperature=0.7,
-            top_p=0.9,
-            do_sample=True,
-            pad_token_id=tokenizer.eos_token_id
-        )
-        
-        # Extract and decode response
-        output_ids = generated_ids[0][len(model_inputs.input_ids[0]):].tolist()
-        content = tokenizer.decode(output_ids, skip_special_tokens=True)
-        completion_tokens = len(output_ids)
-        
-        return content.strip(), prompt_tokens, completion_tokens
-        
+        if scheduler is None:
+            raise RuntimeError("scheduler is stopped")
+        return asyncio.wrap_future(scheduler.submit(request))
+    except QueueFullError as e:
+        retry_after = max(1, math.ceil(scheduler.estimated_wait()))
+        raise HTTPException(status_code=429, detail=f"Server busy: {str(e)}", headers={"Retry-After": str(retry_after)})
+    except RuntimeError as e:
+        # Raised by a stopped BatchScheduler or ReplicaPool
+        print(f"Model {os.path.basename(served.path)} was unloaded before the request was queued: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Model {os.path.basename(served.path)} was unloaded, please retry",
+                            headers={"Retry-After": "1"})
+
+def build_generation_request(request: ChatCompletionRequest, **kwargs) -> GenerationRequest:
+    """Map an OpenAI-style request onto the scheduler's GenerationRequest"""
+    try:
+        json_schema = schema_from_response_format(request.response_format)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid response_format: {str(e)}")
+    thinking = request.thinking or (request.extra_body or {}).get("thinking")
+    return GenerationRequest(
+        messages=[{"role": msg.role, "content": msg.content} for msg in request.messages],
+        max_tokens=request.max_tokens if request.max_tokens is not None else 4096,
+        temperature=request.temperature if request.temperature is not None else 0.7,
+        top_p=request.top_p if request.top_p is not None else 0.9,
+        stop=[request.stop] if isinstance(request.stop, str) else list(request.stop or []),
+        json_schema=json_schema,
+        enable_thinking=thinking.get("type") == "enabled" if thinking else None,
+        **kwargs
+    )
+
+async def generate_response(request: GenerationRequest, served: ServedModel, http_request: Optional[Request] = None):
+    """Queue a request on the model's batch scheduler and wait for its result, cancelling it if the client goes away"""
+    future = submit_request(request, served)
+    try:
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return future.result()
+            if http_request is not None and await http_request.is_disconnected():
+                print("Client disconnected, cancelling request")
+                request.cancel()
+                # 499: client closed request; nobody reads this response
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except asyncio.CancelledError:
+        request.cancel()
+        raise
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation error: {str(e)}")
 
+def stream_response(request: ChatCompletionRequest, served: ServedModel) -> StreamingResponse:
+    """Stream a request's text back as OpenAI-style chat.completion.chunk events"""
+    loop = asyncio.get_running_loop()
+    deltas: asyncio.Queue = asyncio.Queue()
+    gen_request = build_generation_request(
+        request,
+        # The worker thread hands text over to the event loop
+        on_text=lambda text: loop.call_soon_threadsafe(deltas.put_nowait, text)
+    )
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage: Optional[Dict[str, Any]] = None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        if usage is not None:
+            body["usage"] = usage
+        return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+    def error(message: str, code: int) -> str:
+        return f"data: {json.dumps({'error': {'message': message, 'code': code}}, ensure_ascii=False)}\n\n"
+
+    async def events():
+        # Queued only once Starlette starts iterating, so a client that leaves before that queues nothing
+        try:
+            future = submit_request(gen_request, served)
+        except HTTPException as e:
+            # The status line is already sent, so queue-full and unloaded errors go in the stream
+            yield error(e.detail, e.status_code)
+            return
+        # Runs after every delta the worker scheduled before resolving the future
+        future.add_done_callback(lambda _: deltas.put_nowait(None))
+        try:
+            yield chunk({"role": "assistant", "content": ""})
+            while True:
+                text = await deltas.get()
+                if text is None:
+                    break
+                yield chunk({"content": text})
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error in streamed completion: {str(e)}")
+                yield error(f"Generation error: {str(e)}", 500)
+                return
+            usage = {
+                "prompt_tokens": result.prompt_tokens,
+                "completion_tokens": result.completion_tokens,
+                "total_tokens": result.prompt_tokens + result.completion_tokens,
+                "queue_time": result.queue_time,
+                "compute_time": result.compute_time
+            }
+            # The usage block rides on the final chunk
+            yield chunk({}, result.finish_reason, usage)
+            yield "data: [DONE]\n\n"
+            print(f"Streamed response: {result.completion_tokens} tokens, "
+                  f"queued {result.queue_time:.3f}s, computed {result.compute_time:.3f}s")
+        finally:
+            # Starlette cancels the generator when the client disconnects
+            if not future.done():
+                print("Client disconnected, cancelling streamed request")
+                gen_request.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def build_chat_response(model_name: str, result) -> ChatCompletionResponse:
+    """Create response in OpenAI format"""
+    return ChatCompletionResponse(
+        id=f"chatcmpl-{uuid.uuid4().hex}",
+        created=int(time.time()),
+        model=model_name,
+        choices=[
+            ChatChoice(
+                index=0,
+                message=ChatMessage(
+                    role="assistant",
+                    content=result.text
+                ),
+                finish_reason=result.finish_reason
+            )
+        ],
+        usage=Usage(
+            prompt_tokens=result.prompt_tokens,
+            completion_tokens=result.completion_tokens,
+            total_tokens=result.prompt_tokens + result.completion_tokens,
+            queue_time=result.queue_time,
+            compute_time=result.compute_time
+        ),
+        system_fingerprint=f"qwen3-{uuid.uuid4().hex[:8]}"
+    )
+
 @app.post("/v1/chat/completions", response_model=ChatCompletionResponse)
-async def create_chat_completion(request: ChatCompletionRequest):
+async def create_chat_completion(request: ChatCompletionRequest, http_request: Request):
     """OpenAI-compatible chat completion endpoint"""
     try:
         print(f"Received request: model={request.model}, messages={len(request.messages)}")
         if request.extra_body:
             print(f"Extra body: {request.extra_body}")
+        served = await get_model(request.model)
+        if request.stream:
+            return stream_response(request, served)
         
         # Generate response with token counts
-        response_content, prompt_tokens, completion_tokens = generate_response(
-            messages=request.messages,
-            max_tokens=request.max_tokens
-        )
+        gen_request = build_generation_request(request)
+        result = await generate_response(gen_request, served, http_request=http_request)
+        response = build_chat_response(request.model, result)
         
-        total_tokens = prompt_tokens + completion_tokens
-        
-        # Create response in OpenAI format
-        response = ChatCompletionResponse(
-            id=f"chatcmpl-{uuid.uuid4().hex}",
-            created=int(time.time()),
-            model=request.model,
-            choices=[
-                ChatChoice(
-                    index=0,
-                    message=ChatMessage(
-                        role="assistant",
-                        content=response_content
-                    ),
-                    finish_reason="stop"
-                )
-            ],
-            usage=Usage(
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens
-            ),
-            system_fingerprint=f"qwen3-{uuid.uuid4().hex[:8]}"
-        )
-        
-        print(f"Generated response: {len(response_content)} characters, {completion_tokens} tokens")
+        print(f"Generated response: {len(result.text)} characters, {result.completion_tokens} tokens, "
+              f"queued {result.queue_time:.3f}s, computed {result.compute_time:.3f}s")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in create_chat_completion: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -171,7 +391,24 @@ async def create_chat_completion(request: ChatCompletionRequest):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": True}
+    return {
+        "status": "healthy",
+        "model_loaded": model_path in models,
+        "models": [model_status(entry) for entry in models.stats()]
+    }
+
+def model_status(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Pool entry of a checkpoint plus its scheduler's state once loaded"""
+    status = dict(entry, name=os.path.basename(entry["path"]), default=entry["path"] == model_path)
+    served = models.peek(entry["path"])
+    # None while the checkpoint is loading or being unloaded
+    scheduler = served.scheduler if served is not None else None
+    if scheduler is not None:
+        status["queue_depth"] = scheduler.queue_depth
+        status["in_flight"] = scheduler.in_flight
+        status["prefix_cache"] = served.prefix_cache.stats() if served.prefix_cache is not None else None
+        status["workers"] = scheduler.stats() if isinstance(scheduler, ReplicaPool) else None
+    return status
 
 # Pydantic model for eval response
 class EvalChatCompletionResponse(BaseModel):
@@ -185,58 +422,25 @@ class EvalChatCompletionResponse(BaseModel):
     prompt_tokens: int
     completion_tokens: int
     total_tokens: int
+    queue_time: float = 0.0
+    compute_time: float = 0.0
 
 @app.post("/eval/chat/completions", response_model=EvalChatCompletionResponse)
-async def create_eval_chat_completion(request: ChatCompletionRequest):
+async def create_eval_chat_completion(request: ChatCompletionRequest, http_request: Request):
     """Evaluation endpoint that returns raw generation data"""
     try:
         print(f"Eval request: model={request.model}, messages={len(request.messages)}")
         
-        # Convert messages to the format expected by tokenizer
-        formatted_messages = []
-        for msg in request.messages:
-            formatted_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Apply chat template
-        text = tokenizer.apply_chat_template(
-            formatted_messages,
-            tokenize=False,
-            add_generation_prompt=True,
-        )
-        
-        # Tokenize input and count tokens
-        model_inputs = tokenizer([text], return_tensors="pt").to(model.device)
-        prompt_tokens = len(model_inputs.input_ids[0])
-        input_ids = model_inputs.input_ids[0].tolist()
-        
-        # Generate response
-        generated_ids = model.generate(
-            **model_inputs,
-            max_new_tokens=request.max_tokens,
-            temperature=0.7,
-            top_p=0.9,
-            do_sample=True,
-            pad_token_id=tokenizer.eos_token_id,
-            return_dict_in_generate=True,
-            output_scores=False
-        )
-        
-        # Get all generated sequences
-        generated_sequences = generated_ids.sequences
-        
-        # For eval, we return the first sequence (batch size 1)
-        full_sequence = generated_sequences[0].tolist()
-        
-        # Extract the generated part (after input)
-        output_ids = full_sequence[len(input_ids):]
-        completion_tokens = len(output_ids)
+        gen_request = build_generation_request(request, return_ids=True)
+        served = await get_model(request.model)
+        result = await generate_response(gen_request, served, http_request=http_request)
+        input_ids, output_ids = result.input_ids, result.output_ids
+        full_sequence = input_ids + output_ids
+        prompt_tokens, completion_tokens = result.prompt_tokens, result.completion_tokens
         total_tokens = prompt_tokens + completion_tokens
         
         # Decode the generated text
-        generated_text = tokenizer.decode(output_ids, skip_special_tokens=True)
+        generated_text = served.tokenizer.decode(output_ids, skip_special_tokens=True)
         
         # Create eval response with raw data
         response = EvalChatCompletionResponse(
@@ -249,16 +453,143 @@ async def create_eval_chat_completion(request: ChatCompletionRequest):
             generated_text=generated_text,
             prompt_tokens=prompt_tokens,
             completion_tokens=completion_tokens,
-            total_tokens=total_tokens
+            total_tokens=total_tokens,
+            queue_time=result.queue_time,
+            compute_time=result.compute_time
         )
         
         print(f"Eval response: {len(generated_text)} characters, {completion_tokens} tokens")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in create_eval_chat_completion: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def batch_scheduler(body: Dict[str, Any]):
+    """Scheduler of the checkpoint a batch line names; one evicted right after the lookup is loaded again"""
+    served = models.get(resolve_model(body.get("model")))
+    return served.scheduler or models.get(served.path).scheduler
+
+# Offline batch jobs (OpenAI Batch API): upload a JSONL of requests, create a batch, poll it, download the results.
+# Every line goes to the checkpoint its model names; a chunk fills one batch on every worker
+batch_jobs = BatchJobManager(
+    None,
+    FileStore(os.getenv("QWEN_BATCH_DIR", os.path.join(current_dir, "batch_files"))),
+    build_request=lambda body: build_generation_request(ChatCompletionRequest(**body)),
+    render_response=lambda body, result: jsonable_encoder(build_chat_response(body.get("model", ""), result)),
+    chunk_size=scheduler_kwargs["max_batch_size"] * len(devices),
+    scheduler_for=batch_scheduler
+)
+
+class CreateBatchRequest(BaseModel):
+    input_file_id: str
+    endpoint: str = "/v1/chat/completions"
+    completion_window: str = "24h"
+    metadata: Optional[Dict[str, Any]] = None
+
+@app.post("/v1/files")
+async def upload_file(file: UploadFile = File(...), purpose: str = Form("batch")):
+    """Upload a JSONL file of batch requests"""
+    stored = batch_jobs.files.add(file.filename or "input.jsonl", await file.read(), purpose)
+    print(f"Uploaded file {stored.id}: {stored.bytes} bytes")
+    return stored.to_dict()
+
+@app.get("/v1/files/{file_id}")
+async def retrieve_file(file_id: str):
+    try:
+        return batch_jobs.files.get(file_id).to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No such file: {file_id}")
+
+@app.get("/v1/files/{file_id}/content")
+async def retrieve_file_content(file_id: str):
+    try:
+        return Response(content=batch_jobs.files.read(file_id), media_type="application/jsonl")
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No such file: {file_id}")
+
+@app.post("/v1/batches")
+async def create_batch(request: CreateBatchRequest):
+    """Queue every request of an uploaded file as one offline job"""
+    try:
+        job = batch_jobs.create(request.input_file_id, request.endpoint, request.completion_window, request.metadata)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No such file: {request.input_file_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    print(f"Created batch {job.id} with {len(job.lines)} requests")
+    return job.to_dict()
+
+@app.get("/v1/batches")
+async def list_batches():
+    return {"object": "list", "data": [job.to_dict() for job in batch_jobs.list()]}
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str):
+    try:
+        return batch_jobs.get(batch_id).to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No such batch: {batch_id}")
+
+@app.post("/v1/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    try:
+        return batch_jobs.cancel(batch_id).to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No such batch: {batch_id}")
+
+class AdminModelRequest(BaseModel):
+    model: str
+
+def admin_model_path(name: str) -> str:
+    """Checkpoint path for an admin request, which must name a checkpoint (or the default model) exactly"""
+    path = resolve_checkpoint(name, checkpoint_dir)
+    if path is None and name == os.path.basename(model_path):
+        path = model_path
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No such checkpoint: {name}")
+    return path
+
+@app.get("/v1/models")
+async def list_models():
+    """OpenAI-compatible list of the checkpoints this server can serve"""
+    names = list_checkpoints(checkpoint_dir)
+    if os.path.basename(model_path) not in names:
+        names.insert(0, os.path.basename(model_path))
+    return {"object": "list", "data": [{"id": name, "object": "model", "owned_by": "local"} for name in names]}
+
+@app.get("/admin/models")
+async def admin_models():
+    """Loaded checkpoints, least recently used first, and the pool's memory use"""
+    return {
+        "models": [model_status(entry) for entry in models.stats()],
+        "total_bytes": models.total_bytes,
+        "max_bytes": models.max_bytes,
+        "available": list_checkpoints(checkpoint_dir)
+    }
+
+@app.post("/admin/models/load")
+async def admin_load_model(request: AdminModelRequest):
+    """Load a checkpoint ahead of the first request for it"""
+    path = admin_model_path(request.model)
+    await load_model(path)
+    entry = next((entry for entry in models.stats() if entry["path"] == path), None)
+    if entry is None:
+        # Evicted again under memory pressure before we could report it
+        raise HTTPException(status_code=503, detail=f"Checkpoint {request.model} was unloaded, please retry",
+                            headers={"Retry-After": "1"})
+    return model_status(entry)
+
+@app.post("/admin/models/unload")
+async def admin_unload_model(request: AdminModelRequest):
+    """Unload a checkpoint now; its queued requests are cancelled"""
+    path = admin_model_path(request.model)
+    if not await asyncio.to_thread(models.evict, path):
+        raise HTTPException(status_code=404, detail=f"Checkpoint {request.model} is not loaded")
+    return {"model": request.model, "status": "unloaded"}
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -268,6 +599,10 @@ async def root():
         "endpoints": {
             "chat": "/v1/chat/completions",
             "eval": "/eval/chat/completions",
+            "files": "/v1/files",
+            "batches": "/v1/batches",
+            "models": "/v1/models",
+            "admin": "/admin/models",
             "health": "/health"
         }
     }
@@ -0,0 +1,409 @@
+"""
+Batched generation engine for the local Qwen server.
+
+Wraps one tokenizer/model pair and turns a list of ``GenerationRequest`` into
+one left-padded ``model.generate`` call. When the rows of a batch share a hot
+prompt prefix, its past-key-values come from a ``PrefixCache`` and only the
+rest of each prompt is prefilled.
+
+Sampling parameters, stop sequences and JSON-schema constraints are applied
+per row by the logits processors and stopping criteria below, so requests
+with different settings can still share a batch.
+
+On CPU the model runs in fp32, optionally with int8 dynamic quantization of
+its linear layers (``quantize="int8"``), which shrinks the weights about 4x
+and speeds up decoding; test/benchmark/bench_cpu_quantization.py compares it
+with fp32.
+"""
+from typing import Dict, List, Optional, Set
+
+import torch
+from transformers import (AutoModelForCausalLM, AutoTokenizer, DynamicCache, LogitsProcessor, LogitsProcessorList,
+                          StoppingCriteria, StoppingCriteriaList)
+from transformers.generation.streamers import BaseStreamer
+
+try:
+    from src.llm.server.scheduler import GenerationRequest, GenerationResult
+    from src.llm.server.prefix_cache import PrefixCache
+    from src.llm.server.constrained import JsonSchemaMatcher, find_stop
+except ImportError:
+    from scheduler import GenerationRequest, GenerationResult
+    from prefix_cache import PrefixCache
+    from constrained import JsonSchemaMatcher, find_stop
+
+
+class CancelledRows(StoppingCriteria):
+    """Finish the rows whose request was cancelled; generate returns once every row is done."""
+
+    def __init__(self, requests: List[GenerationRequest]) -> None:
+        self.requests = requests
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.tensor([request.cancelled for request in self.requests], dtype=torch.bool, device=input_ids.device)
+
+
+class RowMaxTokens(StoppingCriteria):
+    """Finish each row once it has generated its own request's max_tokens, not the batch's largest budget."""
+
+    def __init__(self, requests: List[GenerationRequest], prompt_length: int) -> None:
+        self.max_tokens = [request.max_tokens for request in requests]
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        generated = input_ids.shape[1] - self.prompt_length
+        return torch.tensor([generated >= max_tokens for max_tokens in self.max_tokens], dtype=torch.bool, device=input_ids.device)
+
+
+class RowSampling(LogitsProcessor):
+    """Apply each row's own temperature and top-p; a temperature of 0 keeps only the best token."""
+
+    def __init__(self, requests: List[GenerationRequest], device: torch.device) -> None:
+        self.temperatures = torch.tensor([[max(request.temperature, 1e-5)] for request in requests], device=device)
+        self.greedy = torch.tensor([request.temperature <= 0 for request in requests], device=device)
+        self.top_ps = torch.tensor([[request.top_p] for request in requests], device=device)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        scores = scores / self.temperatures.to(scores.dtype)
+        sorted_scores, sorted_indices = torch.sort(scores, descending=True)
+        probs = sorted_scores.softmax(dim=-1)
+        # Drop tokens once the probability mass before them reaches top_p; the best token always stays
+        drop = (probs.cumsum(dim=-1) - probs) >= self.top_ps
+        drop[:, 0] = False
+        drop[self.greedy, 1:] = True
+        return scores.masked_fill(drop.scatter(1, sorted_indices, drop), float("-inf"))
+
+
+class StopSequences(StoppingCriteria):
+    """Finish a row once its recent output contains one of the request's stop sequences."""
+
+    def __init__(self, tokenizer, requests: List[GenerationRequest], prompt_length: int) -> None:
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.prompt_length = prompt_length
+        # Every token decodes to at least one character, so this many tokens cover the longest stop
+        self.window = max((len(stop) for request in requests for stop in request.stop), default=0) + 1
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        start = max(self.prompt_length, input_ids.shape[1] - self.window)
+        finished = [
+            bool(request.stop) and find_stop(self.tokenizer.decode(input_ids[row, start:], skip_special_tokens=True), request.stop) >= 0
+            for row, request in enumerate(self.requests)
+        ]
+        return torch.tensor(finished, dtype=torch.bool, device=input_ids.device)
+
+
+class JsonConstraint(LogitsProcessor):
+    """
+    Mask every token that would take a row's output outside its JSON schema.
+
+    Only the best ``top_k`` candidates are checked against the row's
+    ``JsonSchemaMatcher`` at each step; if none of them fits, the rest of the
+    vocabulary is scanned in order of score. Tokens that end in an incomplete
+    UTF-8 character are held back until the character is complete and are
+    only allowed inside free-form strings. Once the top-level value closes,
+    only the end-of-sequence token is allowed, and ``JsonComplete`` finishes
+    the row right away.
+    """
+
+    def __init__(self, tokenizer, requests: List[GenerationRequest], prompt_length: int, eos_token_id: int, top_k: int = 32) -> None:
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.eos_token_id = eos_token_id
+        self.top_k = top_k
+        self.matchers = [JsonSchemaMatcher(request.json_schema) if request.json_schema is not None else None for request in requests]
+        self.failed = [False] * len(requests)
+        self.consumed = [0] * len(requests)
+        self.pending: List[List[int]] = [[] for _ in requests]
+        self.special_ids = set(tokenizer.all_special_ids)
+        self._token_text: Dict[int, str] = {}
+
+    def _text(self, row: int, token_id: int) -> str:
+        if self.pending[row]:
+            return self.tokenizer.decode(self.pending[row] + [token_id])
+        if token_id not in self._token_text:
+            self._token_text[token_id] = self.tokenizer.decode([token_id])
+        return self._token_text[token_id]
+
+    def done(self, row: int) -> bool:
+        matcher = self.matchers[row]
+        return matcher is not None and (matcher.complete or self.failed[row])
+
+    def sync(self, input_ids: torch.LongTensor) -> None:
+        """Feed the tokens sampled since the last call to each row's matcher."""
+        for row, matcher in enumerate(self.matchers):
+            if matcher is None:
+                continue
+            new_ids = input_ids[row, self.prompt_length + self.consumed[row]:].tolist()
+            self.consumed[row] += len(new_ids)
+            for token_id in new_ids:
+                if self.done(row):
+                    break
+                text = self._text(row, token_id)
+                if text.endswith("\ufffd"):
+                    self.pending[row].append(token_id)
+                    continue
+                self.pending[row] = []
+                if token_id in self.special_ids or not matcher.advance(text):
+                    self.failed[row] = True
+
+    def _allowed(self, row: int, token_id: int) -> bool:
+        if token_id in self.special_ids:
+            return False
+        text = self._text(row, token_id)
+        if not text.endswith("\ufffd"):
+            return self.matchers[row].accepts(text)
+        matcher = self.matchers[row].copy()
+        return matcher.in_free_string and matcher.advance(text.rstrip("\ufffd")) and matcher.in_free_string
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        self.sync(input_ids)
+        mask = torch.zeros_like(scores, dtype=torch.bool)
+        for row, matcher in enumerate(self.matchers):
+            if matcher is None:
+                continue
+            if self.done(row):
+                mask[row] = True
+                mask[row, self.eos_token_id] = False
+                continue
+            allowed = []
+            ranked = torch.argsort(scores[row], descending=True)
+            start, size = 0, self.top_k
+            while not allowed and start < ranked.shape[0]:
+                allowed = [token_id for token_id in ranked[start:start + size].tolist() if self._allowed(row, token_id)]
+                start, size = start + size, 4096
+            mask[row] = True
+            mask[row, allowed or [self.eos_token_id]] = False
+        return scores.masked_fill(mask, float("-inf"))
+
+
+class JsonComplete(StoppingCriteria):
+    """Finish constrained rows as soon as their top-level JSON value is closed."""
+
+    def __init__(self, constraint: JsonConstraint) -> None:
+        self.constraint = constraint
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        self.constraint.sync(input_ids)
+        finished = [self.constraint.done(row) for row in range(len(self.constraint.matchers))]
+        return torch.tensor(finished, dtype=torch.bool, device=input_ids.device)
+
+
+class BatchStreamer(BaseStreamer):
+    """
+    Incrementally decode every row of a batch and pass new text to the row's
+    ``on_text`` callback. Works like ``TextStreamer`` (which only supports a
+    batch of one): text is held back while it ends in an incomplete character,
+    and the decode cache is reset after each newline. Rows with stop
+    sequences also hold back a possible partial stop sequence, and never
+    send the stop sequence itself.
+    """
+
+    def __init__(self, tokenizer, requests: List[GenerationRequest], stop_token_ids: Set[int]) -> None:
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.stop_token_ids = stop_token_ids
+        self.prompt_seen = False
+        self.generated = [0] * len(requests)
+        self.token_cache: List[List[int]] = [[] for _ in requests]
+        self.print_len = [0] * len(requests)
+        self.finished = [request.on_text is None for request in requests]
+        self.held = [""] * len(requests)
+        self.hold = [max((len(stop) for stop in request.stop), default=1) - 1 for request in requests]
+
+    def put(self, value: torch.Tensor) -> None:
+        # The first call carries the prompt ids
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for row, token_id in enumerate(value.reshape(-1).tolist()):
+            if self.finished[row]:
+                continue
+            request = self.requests[row]
+            self.generated[row] += 1
+            if token_id in self.stop_token_ids or request.cancelled:
+                self._finish(row)
+                continue
+            self.token_cache[row].append(token_id)
+            text = self.tokenizer.decode(self.token_cache[row], skip_special_tokens=True)
+            if text.endswith("\n"):
+                self._emit(row, text[self.print_len[row]:])
+                self.token_cache[row], self.print_len[row] = [], 0
+            elif not text.endswith("\ufffd"):
+                self._emit(row, text[self.print_len[row]:])
+                self.print_len[row] = len(text)
+            if self.finished[row]:
+                continue
+            if self.generated[row] >= request.max_tokens:
+                self._finish(row)
+
+    def end(self) -> None:
+        for row in range(len(self.requests)):
+            if not self.finished[row]:
+                self._finish(row)
+
+    def _emit(self, row: int, text: str) -> None:
+        request = self.requests[row]
+        text = self.held[row] + text
+        if request.stop:
+            index = find_stop(text, request.stop)
+            if index >= 0:
+                self.held[row] = ""
+                if index:
+                    request.on_text(text[:index])
+                self.finished[row] = True
+                return
+        cut = max(len(text) - self.hold[row], 0)
+        self.held[row] = text[cut:]
+        if cut > 0:
+            request.on_text(text[:cut])
+
+    def _finish(self, row: int) -> None:
+        if self.token_cache[row] and not self.finished[row]:
+            text = self.tokenizer.decode(self.token_cache[row], skip_special_tokens=True)
+            self._emit(row, text[self.print_len[row]:])
+        if self.held[row] and not self.finished[row]:
+            self.requests[row].on_text(self.held[row])
+        self.held[row] = ""
+        self.finished[row] = True
+
+
+QUANTIZE_MODES = ("int8",)
+
+
+def configure_cpu_threads(num_threads: int) -> None:
+    """Use num_threads for intra-op parallelism and a single inter-op thread; generate runs one op at a time."""
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first parallel op in the process
+        pass
+
+
+class QwenEngine:
+    def __init__(self, model_path: str, device: str, prefix_cache: Optional[PrefixCache] = None,
+                 quantize: Optional[str] = None, num_threads: Optional[int] = None) -> None:
+        if quantize is not None and quantize not in QUANTIZE_MODES:
+            raise ValueError(f"unsupported quantization: {quantize}, expected one of {QUANTIZE_MODES}")
+        if quantize is not None and not device.startswith("cpu"):
+            raise ValueError(f"{quantize} dynamic quantization runs on CPU only, not {device}")
+        self.model_path = model_path
+        self.device = device
+        self.prefix_cache = prefix_cache
+        self.quantize = quantize
+        if device.startswith("cpu") and num_threads:
+            configure_cpu_threads(num_threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+        # Batched generation needs left padding so every row ends at the same position
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_path,
+            # fp16 matmuls are slow or unsupported on CPU
+            torch_dtype=torch.float16 if device.startswith("cuda") else torch.float32,
+            device_map=device,
+            trust_remote_code=True
+        ).eval()
+        if quantize == "int8":
+            # Linear weights are stored as int8 and activations quantized on the fly; in place to avoid a second copy
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        self.stop_token_ids = {self.tokenizer.eos_token_id, self.tokenizer.pad_token_id}
+
+    def _prompt_text(self, request: GenerationRequest) -> str:
+        kwargs = {} if request.enable_thinking is None else {"enable_thinking": request.enable_thinking}
+        return self.tokenizer.apply_chat_template(request.messages, tokenize=False, add_generation_prompt=True, **kwargs)
+
+    def _trim(self, output_ids: List[int], max_tokens: int) -> tuple:
+        """Cut a generated row after its first stop token or at the request's own max_tokens."""
+        for i, token_id in enumerate(output_ids[:max_tokens]):
+            if token_id in self.stop_token_ids:
+                # Keep the stop token itself, as single-request generation did
+                return output_ids[:i + 1], "stop"
+        if len(output_ids) >= max_tokens:
+            return output_ids[:max_tokens], "length"
+        return output_ids, "stop"
+
+    def _prefix_past(self, prefix: List[int], batch_size: int) -> DynamicCache:
+        """Past-key-values of a prompt prefix, prefilled once and then served from the prefix cache."""
+        layers = self.prefix_cache.get(prefix)
+        if layers is None:
+            past = self.model(torch.tensor([prefix], device=self.model.device), use_cache=True).past_key_values
+            layers = tuple((key, value) for key, value in (past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past))
+            nbytes = sum(key.numel() * key.element_size() + value.numel() * value.element_size() for key, value in layers)
+            self.prefix_cache.put(prefix, layers, nbytes)
+        # generate appends to the cache in place, so every batch gets its own copy
+        return DynamicCache.from_legacy_cache(tuple(
+            (key.expand(batch_size, -1, -1, -1).contiguous(), value.expand(batch_size, -1, -1, -1).contiguous())
+            for key, value in layers
+        ))
+
+    def _model_inputs(self, prompt_ids: List[List[int]], prefix_length: int) -> dict:
+        """
+        Lay the rows out as [shared prefix][padding][suffix]. Without a prefix
+        this is plain left padding; with one, the prefix sits at the same
+        positions in every row so its cached past-key-values can be reused,
+        and position ids derived from the attention mask skip the padding.
+        """
+        pad_token_id = self.tokenizer.pad_token_id
+        width = max(len(ids) for ids in prompt_ids) - prefix_length
+        input_ids, attention_mask = [], []
+        for ids in prompt_ids:
+            padding = width - (len(ids) - prefix_length)
+            input_ids.append(ids[:prefix_length] + [pad_token_id] * padding + ids[prefix_length:])
+            attention_mask.append([1] * prefix_length + [0] * padding + [1] * (len(ids) - prefix_length))
+        device = self.model.device
+        return {"input_ids": torch.tensor(input_ids, device=device), "attention_mask": torch.tensor(attention_mask, device=device)}
+
+    def generate_batch(self, requests: List[GenerationRequest]) -> List[GenerationResult]:
+        prompt_ids = self.tokenizer([self._prompt_text(request) for request in requests])["input_ids"]
+        prefix_length = self.prefix_cache.observe(prompt_ids) if self.prefix_cache is not None else 0
+        model_inputs = self._model_inputs(prompt_ids, prefix_length)
+        prompt_length = model_inputs["input_ids"].shape[1]
+        stopping_criteria = StoppingCriteriaList([CancelledRows(requests)])
+        if len({request.max_tokens for request in requests}) > 1:
+            stopping_criteria.append(RowMaxTokens(requests, prompt_length))
+        logits_processor = LogitsProcessorList()
+        if any(request.stop for request in requests):
+            stopping_criteria.append(StopSequences(self.tokenizer, requests, prompt_length))
+        if any(request.json_schema is not None for request in requests):
+            constraint = JsonConstraint(self.tokenizer, requests, prompt_length, self.tokenizer.eos_token_id)
+            logits_processor.append(constraint)
+            stopping_criteria.append(JsonComplete(constraint))
+        # Applied after the constraint, before the model's own top_k
+        logits_processor.append(RowSampling(requests, self.model.device))
+        with torch.inference_mode():
+            if prefix_length:
+                model_inputs["past_key_values"] = self._prefix_past(prompt_ids[0][:prefix_length], len(requests))
+            generated_ids = self.model.generate(
+                **model_inputs,
+                max_new_tokens=max(request.max_tokens for request in requests),
+                # Per-row temperature and top_p come from RowSampling
+                temperature=1.0,
+                top_p=1.0,
+                do_sample=True,
+                pad_token_id=self.tokenizer.pad_token_id,
+                logits_processor=logits_processor,
+                stopping_criteria=stopping_criteria,
+                streamer=BatchStreamer(self.tokenizer, requests, self.stop_token_ids)
+                if any(request.on_text is not None for request in requests) else None
+            )
+        results = []
+        for row, request in enumerate(requests):
+            input_ids = prompt_ids[row]
+            output_ids, finish_reason = self._trim(generated_ids[row, prompt_length:].tolist(), request.max_tokens)
+            text = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+            index = find_stop(text, request.stop)
+            if index >= 0:
+                text, finish_reason = text[:index], "stop"
+            if request.cancelled:
+                finish_reason = "cancelled"
+            results.append(GenerationResult(
+                text=text.strip(),
+                prompt_tokens=len(input_ids),
+                completion_tokens=len(output_ids),
+                finish_reason=finish_reason,
+                input_ids=input_ids if request.return_ids else None,
+                output_ids=output_ids if request.return_ids else None,
+            ))
+        return results
@@ -0,0 +1,176 @@
+"""
+Checkpoints served side by side, loaded on first use.
+
+The server resolves the ``model`` field of every request to a checkpoint
+directory and asks ``ModelPool.get`` for it. A checkpoint that is not loaded
+yet is loaded on the calling thread, while requests for other checkpoints
+carry on; concurrent requests for the same checkpoint wait for that one load.
+Before loading, least recently used checkpoints are unloaded until the new
+one fits under ``max_bytes``. Checkpoints that still have queued or running
+requests are skipped, so the pool can run over its cap for a while rather than
+fail them.
+
+Sizes are estimated from the weight files on disk before loading, which is
+what has to fit on the device. Nothing here depends on torch: loading and
+unloading are passed in by the server.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".pth")
+
+
+def checkpoint_bytes(path: str) -> int:
+    """Total size of the weight files in a checkpoint directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(WEIGHT_SUFFIXES) and name != "training_args.bin":
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def list_checkpoints(checkpoint_dir: str) -> List[str]:
+    """Names of the loadable checkpoints (directories with a config.json) under checkpoint_dir."""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    return sorted(name for name in os.listdir(checkpoint_dir)
+                  if os.path.isfile(os.path.join(checkpoint_dir, name, "config.json")))
+
+
+def resolve_checkpoint(name: Optional[str], checkpoint_dir: str) -> Optional[str]:
+    """
+    Path of the checkpoint a request's ``model`` names, or None when it names none.
+
+    Only direct subdirectories of checkpoint_dir are served, so a request cannot
+    load arbitrary paths.
+    """
+    if not name or os.path.basename(name) != name or name in (".", ".."):
+        return None
+    path = os.path.join(checkpoint_dir, name)
+    return os.path.abspath(path) if os.path.isfile(os.path.join(path, "config.json")) else None
+
+
+class _Entry:
+    def __init__(self, key: str, nbytes: int) -> None:
+        self.key = key
+        self.nbytes = nbytes
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.loaded = threading.Event()
+        self.loaded_at: Optional[float] = None
+        self.last_used = time.time()
+
+
+class ModelPool(Generic[T]):
+    """LRU pool of loaded checkpoints, keyed by path, under a byte cap (0 for no cap)."""
+
+    def __init__(self, load: Callable[[str], T], unload: Callable[[T], None], max_bytes: int = 0,
+                 estimate: Callable[[str], int] = checkpoint_bytes, is_busy: Callable[[T], bool] = lambda value: False) -> None:
+        self.load = load
+        self.unload = unload
+        self.max_bytes = max_bytes
+        self.estimate = estimate
+        self.is_busy = is_busy
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def __contains__(self, key: str) -> bool:
+        return self.peek(key) is not None
+
+    def get(self, key: str) -> T:
+        """The loaded checkpoint at key, loading it first if needed; load errors are raised to every waiter."""
+        with self._lock:
+            entry = self._entries.get(key)
+            created = entry is None
+            if created:
+                entry = _Entry(key, self.estimate(key))
+                victims = self._make_room(entry.nbytes)
+                self._entries[key] = entry
+            else:
+                self._entries.move_to_end(key)
+            entry.last_used = time.time()
+        if not created:
+            entry.loaded.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.value
+        for victim in victims:
+            self._unload(victim)
+        print(f"Loading checkpoint {key} (~{entry.nbytes / 2 ** 20:.0f} MB)")
+        try:
+            entry.value = self.load(key)
+        except BaseException as e:
+            entry.error = e
+            with self._lock:
+                self._entries.pop(key, None)
+            raise
+        finally:
+            entry.loaded_at = time.time()
+            entry.loaded.set()
+        return entry.value
+
+    def peek(self, key: str) -> Optional[T]:
+        """The checkpoint at key if it is loaded, without loading it or counting as a use."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def evict(self, key: str) -> bool:
+        """Unload a checkpoint now, even if it has queued requests; False when it is not loaded."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.loaded.is_set():
+                return False
+            del self._entries[key]
+        self._unload(entry)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.loaded.is_set()]
+            self._entries.clear()
+        for entry in entries:
+            self._unload(entry)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Loaded and loading checkpoints, least recently used first."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [{"path": entry.key, "bytes": entry.nbytes, "status": "loaded" if entry.loaded.is_set() else "loading",
+                 "loaded_at": entry.loaded_at, "last_used": entry.last_used} for entry in entries]
+
+    def _make_room(self, nbytes: int) -> List[_Entry]:
+        """Take least recently used idle checkpoints out of the pool until nbytes fits; called with the lock held."""
+        if not self.max_bytes:
+            return []
+        total = sum(entry.nbytes for entry in self._entries.values())
+        victims = []
+        for entry in list(self._entries.values()):
+            if total + nbytes <= self.max_bytes:
+                break
+            if entry.loaded.is_set() and entry.error is None and not self.is_busy(entry.value):
+                del self._entries[entry.key]
+                victims.append(entry)
+                total -= entry.nbytes
+        if total + nbytes > self.max_bytes:
+            print(f"Model pool over its cap: {(total + nbytes) / 2 ** 20:.0f} MB of {self.max_bytes / 2 ** 20:.0f} MB")
+        return victims
+
+    def _unload(self, entry: _Entry) -> None:
+        print(f"Unloading checkpoint {entry.key}")
+        try:
+            self.unload(entry.value)
+        except Exception as e:
+            print(f"Error unloading checkpoint {entry.key}: {str(e)}")
+        entry.value = None
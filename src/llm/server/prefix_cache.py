@@ -0,0 +1,106 @@
+"""
+Shared-prefix cache for the local LLM server.
+
+Pipeline requests all start with the same system prompt and prompt template;
+only the context and clause at the end differ. The engine prefills such a
+prefix once, keeps its past-key-values here and resumes every later request
+from it, so prefill only covers the variable suffix.
+
+Prompts are split into fixed-size token blocks and every block is identified
+by a chained hash of all tokens up to its end, so equal hashes mean equal
+prefixes. A prefix is worth caching once it is "hot": shared by several rows
+of the same batch or seen in ``min_hits`` requests. Cached values are kept in
+an LRU bounded by their total size in bytes.
+
+Nothing here depends on torch; values are opaque to the cache.
+"""
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+class PrefixCache:
+    def __init__(self, max_bytes: int, block_size: int = 64, min_hits: int = 2, max_tracked: int = 65536) -> None:
+        if block_size < 1:
+            raise ValueError("block_size must be positive")
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.min_hits = min_hits
+        self.max_tracked = max_tracked
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # block hash -> (prefix tokens, value, nbytes), least recently used first
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, ...], Any, int]]" = OrderedDict()
+        # block hash -> number of requests whose prompt started with that prefix
+        self._seen: "OrderedDict[int, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def block_hashes(self, token_ids: Sequence[int]) -> List[int]:
+        """Chained hash of every full block: hashes[i] identifies token_ids[:(i + 1) * block_size]."""
+        hashes, current = [], 0
+        for start in range(0, len(token_ids) - self.block_size + 1, self.block_size):
+            current = hash((current, tuple(token_ids[start:start + self.block_size])))
+            hashes.append(current)
+        return hashes
+
+    def observe(self, rows: Sequence[Sequence[int]]) -> int:
+        """
+        Record the prompts of one batch and return the length of the longest
+        hot, block-aligned prefix shared by all of them (0 if none). At least
+        one token of every row is left outside the prefix to be prefilled.
+        """
+        if not rows:
+            return 0
+        limit = (min(len(row) for row in rows) - 1) // self.block_size
+        chains = [self.block_hashes(row[:limit * self.block_size]) for row in rows]
+        for chain in chains:
+            for block_hash in chain:
+                self._seen[block_hash] = self._seen.pop(block_hash, 0) + 1
+        while len(self._seen) > self.max_tracked:
+            self._seen.popitem(last=False)
+        shared = 0
+        for blocks in zip(*chains):
+            if any(block_hash != blocks[0] for block_hash in blocks):
+                break
+            shared += 1
+        if len(rows) < 2:
+            # A single prompt only counts up to its longest cached or repeatedly seen prefix
+            chain = chains[0][:shared]
+            while chain and chain[-1] not in self._entries and self._seen[chain[-1]] < self.min_hits:
+                chain.pop()
+            shared = len(chain)
+        return shared * self.block_size
+
+    def _key(self, prefix: Sequence[int]) -> Optional[int]:
+        if not prefix or len(prefix) % self.block_size:
+            return None
+        return self.block_hashes(prefix)[-1]
+
+    def get(self, prefix: Sequence[int]) -> Optional[Any]:
+        key = self._key(prefix)
+        entry = self._entries.get(key)
+        # Compare the tokens too, so a hash collision is only a miss
+        if entry is None or entry[0] != tuple(prefix):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, prefix: Sequence[int], value: Any, nbytes: int) -> bool:
+        """Store a value for a block-aligned prefix, evicting least recently used entries to stay under max_bytes."""
+        key = self._key(prefix)
+        if key is None or nbytes > self.max_bytes:
+            return False
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[2]
+        while self._entries and self.total_bytes + nbytes > self.max_bytes:
+            self.total_bytes -= self._entries.popitem(last=False)[1][2]
+        self._entries[key] = (tuple(prefix), value, nbytes)
+        self.total_bytes += nbytes
+        return True
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.total_bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,327 @@
+"""
+Data-parallel serving: one model replica per worker process.
+
+``ReplicaPool`` starts one worker process per configured device. Every worker
+loads its own engine and runs its own ``BatchScheduler``, so N devices run N
+batches at once. The pool has the same ``submit`` / ``queue_depth`` /
+``estimated_wait`` / ``max_batch_size`` surface as ``BatchScheduler``, so the
+FastAPI front-end and the batch-job manager use it unchanged.
+
+Each request goes to the live worker with the fewest requests in flight
+(workers still loading their model come last). Requests and results cross the
+process boundary as plain dicts over ``multiprocessing`` queues; streamed text
+comes back as separate messages and is handed to the request's ``on_text`` in
+the parent. Cancelling a request's future forwards the cancel to its worker.
+
+One supervisor thread per replica starts the process, reads its results and,
+when the process dies, fails that worker's in-flight requests and starts a new
+process, at most once per ``restart_delay`` seconds so a worker that crashes
+while loading does not spin.
+
+Workers are started with the ``spawn`` method (CUDA cannot be used after a
+fork), which re-imports the server's main module in every worker as
+``__mp_main__``; deploy.py therefore loads models in its startup hook, not
+at import. Nothing in this module imports torch: the engine is built in the
+worker by ``engine_factory``, ``load_qwen_engine`` by default.
+"""
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from src.llm.server.scheduler import BatchScheduler, GenerationRequest, GenerationResult, QueueFullError
+except ImportError:
+    from scheduler import BatchScheduler, GenerationRequest, GenerationResult, QueueFullError
+
+# GenerationRequest fields sent to the worker; callbacks, futures and timestamps stay in the parent
+FORWARDED_FIELDS = ("messages", "max_tokens", "temperature", "top_p", "stop", "json_schema", "enable_thinking", "return_ids")
+
+
+def cpu_threads_per_worker(devices: List[str], total: Optional[int] = None) -> Optional[int]:
+    """
+    Split the CPU cores this process may use evenly between the CPU workers, or None without CPU workers.
+
+    Workers that oversubscribe cores slow each other down far more than they gain.
+    """
+    workers = sum(1 for device in devices if device.startswith("cpu"))
+    if not workers:
+        return None
+    if total is None:
+        total = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    return max(1, total // workers)
+
+
+def load_qwen_engine(model_path: str, device: str, prefix_cache_mb: int = 0, prefix_block_size: int = 64, **engine_kwargs):
+    """Default engine factory: a QwenEngine with its own prefix cache, built inside the worker process."""
+    try:
+        from src.llm.server.engine import QwenEngine
+        from src.llm.server.prefix_cache import PrefixCache
+    except ImportError:
+        from engine import QwenEngine
+        from prefix_cache import PrefixCache
+    prefix_cache = PrefixCache(max_bytes=prefix_cache_mb * 1024 * 1024, block_size=prefix_block_size) if prefix_cache_mb > 0 else None
+    return QwenEngine(model_path, device, prefix_cache=prefix_cache, **engine_kwargs)
+
+
+def worker_main(model_path: str, device: str, engine_factory: Callable[..., Any], engine_kwargs: Dict[str, Any],
+                scheduler_kwargs: Dict[str, Any], requests: "multiprocessing.Queue", results: "multiprocessing.Queue") -> None:
+    """
+    Entry point of a worker process.
+
+    Reads ``("submit", id, payload)`` / ``("cancel", id, None)`` messages until a
+    ``None`` arrives, and answers with ``("ready" | "text" | "result" | "error" |
+    "cancelled", id, data)`` messages.
+    """
+    engine = engine_factory(model_path, device, **engine_kwargs)
+    scheduler = BatchScheduler(engine.generate_batch, **scheduler_kwargs).start()
+    active: Dict[int, GenerationRequest] = {}
+    results.put(("ready", None, None))
+
+    def report(request_id: int, future: Future) -> None:
+        active.pop(request_id, None)
+        if future.cancelled():
+            results.put(("cancelled", request_id, None))
+        elif future.exception() is not None:
+            results.put(("error", request_id, str(future.exception())))
+        else:
+            results.put(("result", request_id, asdict(future.result())))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        kind, request_id, payload = message
+        if kind == "cancel":
+            if request_id in active:
+                active[request_id].cancel()
+            continue
+        on_text = (lambda text, request_id=request_id: results.put(("text", request_id, text))) if payload.pop("stream") else None
+        request = GenerationRequest(on_text=on_text, **payload)
+        active[request_id] = request
+        try:
+            future = scheduler.submit(request)
+        except Exception as e:
+            active.pop(request_id, None)
+            results.put(("error", request_id, str(e)))
+            continue
+        future.add_done_callback(lambda future, request_id=request_id: report(request_id, future))
+    scheduler.stop(timeout=30)
+
+
+class _Replica:
+    """Parent-side state of one worker slot; the process behind it changes on every restart."""
+
+    def __init__(self, index: int, device: str) -> None:
+        self.index = index
+        self.device = device
+        self.process: Optional[multiprocessing.Process] = None
+        self.requests: Optional["multiprocessing.Queue"] = None
+        self.ready = False
+        self.restarts = 0
+        self.started_at = 0.0
+        self.inflight: Dict[int, GenerationRequest] = {}
+        self.supervisor: Optional[threading.Thread] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class ReplicaPool:
+    """Run requests on one worker process per device, routed to the least-loaded live worker."""
+
+    def __init__(self, model_path: str, devices: List[str], engine_factory: Callable[..., Any] = load_qwen_engine,
+                 engine_kwargs: Optional[Dict[str, Any]] = None, max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 max_queue_size: int = 64, restart_delay: float = 5.0, poll_interval: float = 0.5) -> None:
+        if not devices:
+            raise ValueError("devices must not be empty")
+        self.model_path = model_path
+        self.engine_factory = engine_factory
+        self.engine_kwargs = engine_kwargs or {}
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.scheduler_kwargs = {"max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms, "max_queue_size": max_queue_size}
+        self.restart_delay = restart_delay
+        self.poll_interval = poll_interval
+        self.replicas = [_Replica(index, device) for index, device in enumerate(devices)]
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._stopped = False
+        # Moving average of the compute time reported by workers, used to suggest a retry delay
+        self.avg_batch_time = 0.0
+
+    @property
+    def num_workers(self) -> int:
+        return len(self.replicas)
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(len(replica.inflight) for replica in self.replicas)
+
+    @property
+    def in_flight(self) -> int:
+        """Requests sent to workers and not answered yet, queued or running."""
+        return self.queue_depth
+
+    def estimated_wait(self) -> float:
+        """Rough seconds until the least-loaded worker could start a request submitted now."""
+        with self._lock:
+            load = min(len(replica.inflight) for replica in self.replicas)
+        return (math.ceil(load / self.max_batch_size) + 1) * self.avg_batch_time
+
+    def start(self) -> "ReplicaPool":
+        for replica in self.replicas:
+            if replica.supervisor is None:
+                replica.supervisor = threading.Thread(target=self._supervise, args=(replica,),
+                                                      name=f"replica-{replica.index}", daemon=True)
+                replica.supervisor.start()
+        return self
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every worker has loaded its model; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(replica.ready for replica in self.replicas):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Shut the workers down; requests still in flight are cancelled."""
+        self._stopped = True
+        for replica in self.replicas:
+            if replica.requests is not None:
+                replica.requests.put(None)
+        for replica in self.replicas:
+            if replica.process is not None:
+                replica.process.join(timeout)
+                if replica.process.is_alive():
+                    replica.process.terminate()
+            if replica.supervisor is not None:
+                replica.supervisor.join(timeout)
+            self._fail_inflight(replica, None)
+
+    def submit(self, request: GenerationRequest) -> Future:
+        """Send a request to the least-loaded worker; raise QueueFullError when every worker is full or down."""
+        payload = {name: getattr(request, name) for name in FORWARDED_FIELDS}
+        payload["stream"] = request.on_text is not None
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("replica pool is stopped")
+            # A worker holds at most one running batch plus a full queue
+            capacity = self.max_queue_size + self.max_batch_size
+            candidates = [replica for replica in self.replicas
+                          if replica.alive and replica.requests is not None and len(replica.inflight) < capacity]
+            if not candidates:
+                raise QueueFullError(f"all {len(self.replicas)} workers are full or restarting")
+            replica = min(candidates, key=lambda replica: (not replica.ready, len(replica.inflight)))
+            request_id = next(self._ids)
+            request.enqueued_at = time.perf_counter()
+            replica.inflight[request_id] = request
+            replica.requests.put(("submit", request_id, payload))
+        request.future.add_done_callback(lambda future: self._forward_cancel(replica, request_id, future))
+        return request.future
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"device": replica.device, "pid": replica.process.pid if replica.process is not None else None,
+                     "alive": replica.alive, "ready": replica.ready, "in_flight": len(replica.inflight),
+                     "restarts": replica.restarts} for replica in self.replicas]
+
+    def _spawn(self, replica: _Replica) -> "multiprocessing.Queue":
+        results = self._context.Queue()
+        requests = self._context.Queue()
+        process = self._context.Process(
+            target=worker_main,
+            args=(self.model_path, replica.device, self.engine_factory, self.engine_kwargs, self.scheduler_kwargs, requests, results),
+            name=f"qwen-worker-{replica.index}",
+            daemon=True
+        )
+        process.start()
+        with self._lock:
+            replica.process, replica.requests, replica.ready = process, requests, False
+            replica.started_at = time.monotonic()
+        print(f"Started worker {replica.index} on {replica.device} (pid {process.pid})")
+        return results
+
+    def _supervise(self, replica: _Replica) -> None:
+        while not self._stopped:
+            results = self._spawn(replica)
+            while True:
+                try:
+                    message = results.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    if not replica.process.is_alive():
+                        break
+                    continue
+                self._dispatch(replica, message)
+            # Results the worker sent just before exiting
+            while True:
+                try:
+                    self._dispatch(replica, results.get_nowait())
+                except queue.Empty:
+                    break
+            if self._stopped:
+                return
+            with self._lock:
+                replica.ready = False
+                replica.restarts += 1
+            print(f"Worker {replica.index} on {replica.device} exited with code {replica.process.exitcode}, restarting")
+            self._fail_inflight(replica, RuntimeError(f"worker {replica.index} on {replica.device} exited "
+                                                      f"with code {replica.process.exitcode}"))
+            time.sleep(max(0.0, replica.started_at + self.restart_delay - time.monotonic()))
+
+    def _forward_cancel(self, replica: _Replica, request_id: int, future: Future) -> None:
+        # The worker answers with a cancelled or finished result, which frees the slot
+        if future.cancelled() and not self._stopped and request_id in replica.inflight:
+            replica.requests.put(("cancel", request_id, None))
+
+    def _dispatch(self, replica: _Replica, message: tuple) -> None:
+        kind, request_id, data = message
+        if kind == "ready":
+            replica.ready = True
+            print(f"Worker {replica.index} on {replica.device} is ready")
+            return
+        if kind == "text":
+            request = replica.inflight.get(request_id)
+            if request is not None and request.on_text is not None and not request.cancelled:
+                request.on_text(data)
+            return
+        with self._lock:
+            request = replica.inflight.pop(request_id, None)
+        if request is None:
+            return
+        try:
+            if kind == "result":
+                result = GenerationResult(**data)
+                self.avg_batch_time = result.compute_time if not self.avg_batch_time else 0.8 * self.avg_batch_time + 0.2 * result.compute_time
+                request.future.set_result(result)
+            elif kind == "error":
+                request.future.set_exception(RuntimeError(data))
+            else:
+                request.future.cancel()
+        except InvalidStateError:
+            # The caller cancelled while the worker was finishing
+            pass
+
+    def _fail_inflight(self, replica: _Replica, error: Optional[BaseException]) -> None:
+        with self._lock:
+            pending = list(replica.inflight.values())
+            replica.inflight.clear()
+        for request in pending:
+            try:
+                if error is None:
+                    request.future.cancel()
+                else:
+                    request.future.set_exception(error)
+            except InvalidStateError:
+                pass
@@ -0,0 +1,185 @@
+"""
+Dynamic batching scheduler for the local LLM server.
+
+HTTP handlers submit requests to a bounded queue. A single worker thread
+collects them into batches of at most ``max_batch_size`` requests, waiting at
+most ``max_wait_ms`` after the oldest queued request for the batch to fill,
+and runs one batched generation per batch. Every request carries a
+``concurrent.futures.Future`` that the worker resolves with that request's own
+result, so handlers can ``await asyncio.wrap_future(...)`` without blocking
+the event loop.
+
+The scheduler knows nothing about torch or the model: ``generate_batch`` is
+any callable that takes a list of requests and returns one result per request.
+It stamps every result with the time the request spent queued and the wall
+time of the batch that produced it.
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class QueueFullError(RuntimeError):
+    """Raised by ``BatchScheduler.submit`` when the queue is at capacity."""
+
+
+@dataclass
+class GenerationRequest:
+    messages: List[Dict[str, str]]
+    max_tokens: int = 4096
+    # Per-request sampling; temperature 0 means greedy decoding
+    temperature: float = 0.7
+    top_p: float = 0.9
+    stop: List[str] = field(default_factory=list)
+    # Constrain the output to JSON matching this schema (see constrained.py)
+    json_schema: Optional[Dict[str, Any]] = None
+    # Passed to the chat template when set (Qwen3 thinking mode)
+    enable_thinking: Optional[bool] = None
+    # Return token ids along with the text (used by the eval endpoint)
+    return_ids: bool = False
+    # Called from the worker thread with each new piece of decoded text (streaming)
+    on_text: Optional[Callable[[str], None]] = field(default=None, repr=False)
+    future: Future = field(default_factory=Future, repr=False)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    # Set when the caller gives up; a running batch checks it between decoding steps
+    cancelled: bool = False
+
+    def cancel(self) -> None:
+        """Drop the request if it is still queued, or ask a running batch to stop its row."""
+        self.cancelled = True
+        self.future.cancel()
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    finish_reason: str = "stop"
+    input_ids: Optional[List[int]] = None
+    output_ids: Optional[List[int]] = None
+    # Seconds between submit and the start of the batch, and wall time of the batch
+    queue_time: float = 0.0
+    compute_time: float = 0.0
+
+
+class BatchScheduler:
+    """Queue requests and run them through ``generate_batch`` in dynamic batches."""
+
+    def __init__(self, generate_batch: Callable[[List[GenerationRequest]], List[Any]], max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0, max_queue_size: int = 64) -> None:
+        if max_batch_size < 1 or max_queue_size < 1:
+            raise ValueError("max_batch_size and max_queue_size must be positive")
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self._queue: Deque[GenerationRequest] = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._worker: Optional[threading.Thread] = None
+        # Requests of the batch being generated
+        self._running = 0
+        # Moving average of batch wall time, used to suggest a retry delay
+        self.avg_batch_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def in_flight(self) -> int:
+        """Queued requests plus those of the running batch."""
+        with self._cond:
+            return len(self._queue) + self._running
+
+    def estimated_wait(self) -> float:
+        """Rough seconds until a request submitted now would start running."""
+        return (math.ceil(len(self._queue) / self.max_batch_size) + 1) * self.avg_batch_time
+
+    def start(self) -> "BatchScheduler":
+        with self._cond:
+            if self._worker is None:
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+                self._worker.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker after the current batch; queued requests are cancelled."""
+        with self._cond:
+            self._stopped = True
+            pending = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+        for request in pending:
+            request.future.cancel()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def submit(self, request: GenerationRequest) -> Future:
+        """Queue a request and return its future; raise QueueFullError when the queue is full."""
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("scheduler is stopped")
+            if len(self._queue) >= self.max_queue_size:
+                raise QueueFullError(f"queue is full ({self.max_queue_size} requests waiting)")
+            request.enqueued_at = time.perf_counter()
+            self._queue.append(request)
+            self._cond.notify_all()
+        return request.future
+
+    def _next_batch(self) -> List[GenerationRequest]:
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+            # Give the batch until max_wait after the oldest request to fill up
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                request = self._queue.popleft()
+                # Skip requests whose caller already gave up
+                if not request.cancelled and request.future.set_running_or_notify_cancel():
+                    batch.append(request)
+            # Counted as running before they leave the queue count, so in_flight never dips mid-handover
+            self._running = len(batch)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stopped:
+                    return
+                continue
+            started_at = time.perf_counter()
+            try:
+                results = self.generate_batch(batch)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"generate_batch returned {len(results)} results for {len(batch)} requests")
+            except BaseException as e:
+                with self._cond:
+                    self._running = 0
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            compute_time = time.perf_counter() - started_at
+            self.avg_batch_time = compute_time if not self.avg_batch_time else 0.8 * self.avg_batch_time + 0.2 * compute_time
+            with self._cond:
+                self._running = 0
+            for request, result in zip(batch, results):
+                result.queue_time = started_at - request.enqueued_at
+                result.compute_time = compute_time
+                request.future.set_result(result)
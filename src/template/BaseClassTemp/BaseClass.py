@@ -1,7 +1,9 @@
 from typing import Dict, Optional, Any, List
 from enum import Enum
 from abc import ABC, abstractmethod
+import copy
 import os
+import sys
 
 class SentenceKeys(Enum):
     """句子JSON键枚举"""
@@ -124,43 +126,179 @@ class BaseJsonListCrud(ABC):
             print(f"文件不存在，已创建空数据结构 {self.__getattribute__}")
 
 
+# 句子类别的整数编码表，下标即编码；模型可能返回额外的类别，写入时追加到表尾，查询时不追加
+_CLASS_TABLE: List[str | None] = [None] + [key.value for key in SentenceClassKey]
+_CLASS_CODES: Dict[str | None, int] = {name: code for code, name in enumerate(_CLASS_TABLE)}
+
+
+def class_code_of(class_name: str | None) -> int:
+    """
+    获取句子类别对应的整数编码，未知类别追加到编码表，仅用于写入
+    """
+    code = _CLASS_CODES.get(class_name)
+    if code is None:
+        code = len(_CLASS_TABLE)
+        _CLASS_TABLE.append(sys.intern(class_name) if isinstance(class_name, str) else class_name)
+        _CLASS_CODES[class_name] = code
+    return code
+
+
+def find_class_code(class_name: str | None) -> int | None:
+    """
+    只读地查询句子类别对应的整数编码，未知类别返回None，不会追加到编码表
+    """
+    return _CLASS_CODES.get(class_name)
+
+
+def class_name_of(class_code: int) -> str | None:
+    """
+    获取整数编码对应的句子类别
+    """
+    return _CLASS_TABLE[class_code]
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
 class JsonObjCrud:
+    """
+    单条子句的紧凑表示：使用__slots__去掉实例字典，类别以整数编码保存，
+    describe拆为role/style两个字段，角色等重复出现的字符串做驻留处理
+    """
+    __slots__ = ("id", "_class_code", "Sentence", "sub_sentence", "origin_sub_sentence", "_role", "_style", "_describe_extra", "duration_begin", "duration_end", "speaker_id", "_owner", "_offset", "_epoch")
+
     def __init__(self, id: int | None = -1, class_name: SentenceClassKey | None = None, Sentence: Dict[str, Any] | None = None, sub_sentence: str | None = None, describe: Dict[str, Any] | None = None, describe_role: str | None = None, describe_style: str | None = None, duration_begin: int | None = None, duration_end: int | None = None, speaker_id: str | None = None) -> None:
+        # 所属的列表，存在时上下文窗口由列表按需计算，不再保存邻居子句的副本
+        self._owner = None
+        # 在所属列表的JSONL存储中最近一次落盘的偏移，任何写入都会将其置空，置空即为脏
+        self._offset = None
+        # 最近一次被快照保留或挂到列表下时列表的快照版本号，小于列表当前版本号时写入前需要先为快照保留副本
+        self._epoch = 0
         self.id = id
-        self.class_name = class_name
+        self._class_code = class_code_of(class_name)
         self.Sentence = Sentence
         self.sub_sentence = sub_sentence
         self.origin_sub_sentence = sub_sentence
-        self.describe = describe if describe is not None else {}
+        self.write_describe(describe)
         if describe_role is not None:
-            self.describe["role"] = describe_role
+            self._role = _intern(describe_role)
         if describe_style is not None:
-            self.describe["style"] = describe_style
-        self.duration_begin = duration_begin if duration_begin is not None else None
-        self.duration_end = duration_end if duration_end is not None else None
-        self.speaker_id = speaker_id if speaker_id is not None else None
-        
-    def to_dict(self) -> Dict[str, Any]:
+            self._style = _intern(describe_style)
+        self.duration_begin = duration_begin
+        self.duration_end = duration_end
+        self.speaker_id = _intern(speaker_id)
+
+    @property
+    def class_name(self) -> str | None:
+        return _CLASS_TABLE[self._class_code]
+
+    @class_name.setter
+    def class_name(self, class_name: str | None) -> None:
+        self.write_class(class_name)
+
+    @property
+    def describe(self) -> Dict[str, Any]:
+        _describe = {"role": self._role, "style": self._style}
+        if self._describe_extra:
+            _describe.update(self._describe_extra)
+        return _describe
+
+    @describe.setter
+    def describe(self, describe: Dict[str, Any] | None) -> None:
+        self.write_describe(describe)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'JsonObjCrud':
+        """
+        深拷贝时不复制所属列表，脱离列表后的副本持有一份当前窗口的快照
+        """
+        _new = JsonObjCrud.__new__(JsonObjCrud)
+        for key in JsonObjCrud.__slots__:
+            setattr(_new, key, getattr(self, key))
+        _new.Sentence = copy.deepcopy(self.read_window(), memo)
+        _new._describe_extra = copy.deepcopy(self._describe_extra, memo)
+        _new._owner = None
+        _new._offset = None
+        _new._epoch = 0
+        return _new
+
+    def __copy__(self) -> 'JsonObjCrud':
+        """
+        浅拷贝：共享所有不可变字段，不属于任何列表，也不带窗口
+        """
+        _new = JsonObjCrud.__new__(JsonObjCrud)
+        for key in JsonObjCrud.__slots__:
+            setattr(_new, key, getattr(self, key))
+        _new.Sentence = None
+        _new._owner = None
+        _new._offset = None
+        _new._epoch = 0
+        return _new
+
+    def derive(self, window: Dict[str, Any] | None = None) -> 'JsonObjCrud':
         """
-        将对象转换为字典格式
+        派生一个不属于任何列表的片段，与当前子句共享所有不可变字段，不复制上下文窗口
+
+        Args:
+            window: 片段使用的窗口，同一子句派生多个片段时传入同一个窗口，只需计算一次
         """
-        return {
+        _new = copy.copy(self)
+        _new.Sentence = window if window is not None else self.read_window()
+        return _new
+
+    def _before_change(self) -> None:
+        """
+        写入前调用：所属列表在该子句上次保留之后拍过快照时，先为这些快照保留一份写入前的副本
+        """
+        if self._owner is not None and self._epoch < self._owner._epoch:
+            self._owner._preserve(self)
+
+    def _changed(self) -> None:
+        """
+        写入后调用：标记为脏，并通知所属列表更新二级索引
+        """
+        self._offset = None
+        if self._owner is not None and self._owner._indexes is not None:
+            self._owner._indexes.update(self)
+
+    def read_window(self) -> Dict[str, Any] | None:
+        """
+        读取上下文窗口，格式为{"now_flag": 当前句位置, "sentence": 子句列表}
+        属于某个列表时由列表按需计算，否则返回自身保存的窗口
+        """
+        if self._owner is not None:
+            return self._owner.window_of(self)
+        return self.Sentence
+
+    def to_storage_dict(self) -> Dict[str, Any]:
+        """
+        转换为落盘用的字典格式，不包含上下文窗口，原始子句与子句相同时省略
+        """
+        _dict = {
             "id": self.id,
-            "class": self.class_name,
-            "sentence": self.Sentence,
+            "class": _CLASS_TABLE[self._class_code],
             "sub_sentence": self.sub_sentence,
             "origin_sub_sentence": self.origin_sub_sentence,
             "describe": self.describe,
             "duration_begin": self.duration_begin,
             "duration_end": self.duration_end,
             "speaker_id": self.speaker_id
-        } if self.describe else {
-            "id": self.id,
-            "class": self.class_name,
-            "sentence": self.Sentence,
+        }
+        if self.origin_sub_sentence == self.sub_sentence:
+            del _dict["origin_sub_sentence"]
+        return _dict
+
+    def to_dict(self, window: Dict[str, Any] | None = None, id: int | None = None) -> Dict[str, Any]:
+        """
+        将对象转换为字典格式，window与id为空时使用自身的窗口与id
+        """
+        return {
+            "id": self.id if id is None else id,
+            "class": _CLASS_TABLE[self._class_code],
+            "sentence": self.read_window() if window is None else window,
             "sub_sentence": self.sub_sentence,
             "origin_sub_sentence": self.origin_sub_sentence,
-            "describe": {"role": None, "style": None},
+            "describe": self.describe,
             "duration_begin": self.duration_begin,
             "duration_end": self.duration_end,
             "speaker_id": self.speaker_id
@@ -169,62 +307,82 @@ class JsonObjCrud:
         """
         从JSON对象加载数据
         """
-        self.id = json_obj["id"] if "id" in json_obj else -1
-        self.class_name = json_obj["class"] if "class" in json_obj else "旁白"
+        self._before_change()
+        self.id = json_obj.get("id", -1)
+        self._class_code = class_code_of(json_obj.get("class", "旁白"))
         if "sentence" in json_obj:
             self.Sentence = json_obj["sentence"] if isinstance(json_obj["sentence"], dict) else {"now_flag": -1, "sentence": json_obj["sentence"]}
         else:
             self.Sentence = {"now_flag": -1, "sentence": None}
         self.sub_sentence = json_obj["sub_sentence"]
-        self.origin_sub_sentence = json_obj["origin_sub_sentence"] if "origin_sub_sentence" in json_obj else json_obj["sub_sentence"]
-        self.describe = json_obj["describe"] if "describe" in json_obj else {"role": None, "style": None}
-        self.duration_begin = json_obj["duration_begin"] if "duration_begin" in json_obj else None
-        self.duration_end = json_obj["duration_end"] if "duration_end" in json_obj else None
-        self.speaker_id = json_obj["speaker_id"] if "speaker_id" in json_obj else None
+        self.origin_sub_sentence = json_obj.get("origin_sub_sentence", self.sub_sentence)
+        self.write_describe(json_obj.get("describe"))
+        self.duration_begin = json_obj.get("duration_begin")
+        self.duration_end = json_obj.get("duration_end")
+        self.speaker_id = _intern(json_obj.get("speaker_id"))
+        self._changed()
 
     def write_duration_begin(self, begin_time: int) -> None:
         """
         写入音频的开始时长，单位为秒
         """
+        self._before_change()
         self.duration_begin = begin_time
+        self._changed()
     
     def write_duration_end(self, end_time: int) -> None:
         """
         写入音频的结束时长，单位为秒
         """
-        self.duration_begin = end_time
+        self._before_change()
+        self.duration_end = end_time
+        self._changed()
 
     def write_speaker_id(self, spk_id: str) -> None:
         """
         写入音频的说话人id对应服务器端
         """
-        self.duration_begin = spk_id
+        self._before_change()
+        self.speaker_id = _intern(spk_id)
+        self._changed()
     
     def write_id(self, id: int) -> None:
         """
         写入ID
         """
         self.id = id
-    def write_describe(self, describe: Dict[str, Any]) -> None:
+    def write_describe(self, describe: Dict[str, Any] | None) -> None:
         """
         写入描述
         """
-        self.describe = describe
+        self._before_change()
+        describe = describe or {}
+        self._role = _intern(describe.get("role"))
+        self._style = _intern(describe.get("style"))
+        _extra = {key: value for key, value in describe.items() if key not in ("role", "style")}
+        self._describe_extra = _extra if _extra else None
+        self._changed()
     def write_describe_role(self, describe_role: str) -> None:
         """
         写入描述角色
         """
-        self.describe["role"] = describe_role
+        self._before_change()
+        self._role = _intern(describe_role)
+        self._changed()
     def write_describe_style(self, describe_style: str) -> None:
         """
         写入描述样式
         """
-        self.describe["style"] = describe_style
+        self._before_change()
+        self._style = _intern(describe_style)
+        self._changed()
     def write_class(self, class_name: SentenceClassKey) -> None:
         """
         写入句子类别
         """
-        self.class_name = class_name
+        self._before_change()
+        self._class_code = class_code_of(class_name)
+        self._changed()
     def write_sentence(self, Sentence: List, now_flag: int) -> None:
         """
         写入句子
@@ -234,12 +392,16 @@ class JsonObjCrud:
         """
         写入子句
         """
+        self._before_change()
         self.sub_sentence = sub_sentence
+        self._changed()
     def write_origin_sub_sentence(self, origin_sub_sentence: str) -> None:
         """
         写入原始子句
         """
+        self._before_change()
         self.origin_sub_sentence = origin_sub_sentence
+        self._changed()
     def read_id(self) -> int:
         """
         读取ID
@@ -254,33 +416,36 @@ class JsonObjCrud:
         """
         读取描述角色
         """
-        return self.describe.get("role", None)
+        return self._role
     def read_describe_style(self) -> str:
         """
         读取描述样式
         """
-        return self.describe.get("role", None)
+        return self._style
     def read_class(self) -> SentenceClassKey:
         """
         读取句子类别
         """
-        return self.class_name
+        return _CLASS_TABLE[self._class_code]
+    def read_class_code(self) -> int:
+        """
+        读取句子类别的整数编码
+        """
+        return self._class_code
     def read_sentence(self) -> str:
         """
         读取句子，并整合为上下文展示str
         """
+        _window = self.read_window()
         _sentence = ""
-        for i, item in enumerate(self.Sentence["sentence"]):
-            if i < self.Sentence["now_flag"]:
+        for i, item in enumerate(_window["sentence"]):
+            if i < _window["now_flag"]:
                 _sentence += "[上文]{} \n".format(item)
-            elif i == self.Sentence["now_flag"]:
+            elif i == _window["now_flag"]:
                 _sentence += "[当前]{} \n".format(item)
             else:
                 _sentence += "[下文]{} \n".format(item)
         return _sentence
-        
-    def read_sub_sentence(self) -> str:
-        return self.sub_sentence    
     
     def read_sub_sentence(self) -> str:
         """
@@ -303,22 +468,13 @@ class JsonObjCrud:
         """
         return {
             "id": self.id,
-            "class": self.class_name,
+            "class": _CLASS_TABLE[self._class_code],
             "sentence": self.read_sentence(),
             "sub_sentence": self.sub_sentence,
             "duration_begin": self.duration_begin,
             "duration_end": self.duration_end,
             "speaker_id": self.speaker_id,
             "describe": self.describe,
-        } if self.describe else {
-            "id": self.id,
-            "class": self.class_name,
-            "sentence": self.read_sentence(),
-            "sub_sentence": self.sub_sentence,
-            "duration_begin": self.duration_begin,
-            "duration_end": self.duration_end,
-            "speaker_id": self.speaker_id,
-            "describe": {"role": None, "style": None}
         }
 
     def read_duration_begin(self) -> int:
@@ -6,6 +6,11 @@ from operator import index
 import os
 from typing import Any, List, Dict
 
+try:
+    from template.prompt_registry import get_prompt_registry
+except:
+    from src.template.prompt_registry import get_prompt_registry
+
 class EvalClass:
     """
     包含元素
@@ -47,9 +52,9 @@ class EvalClass:
         """
         if self.task_id == 0:
             if isinstance(origin_input, Dict):
-                with open("src/llm/prompts/fine_split_process.md", "r", encoding="utf-8") as f:
-                    prompt = f.read()
-                    origin_input = prompt.format(context=origin_input.get("context", ""), clause=origin_input.get("clause", ""))
+                # 模板由进程内共享的注册表缓存，不再每个样本都读取一次文件
+                prompt = get_prompt_registry().get("fine_split_process")
+                origin_input = prompt.format(context=origin_input.get("context", ""), clause=origin_input.get("clause", ""))
             else:
                 origin_input = origin_input
         else:
@@ -213,8 +218,8 @@ class EvalClassList:
 
 
 if __name__ == "__main__":
-    EvalClassList_ctx = EvalClassList(save_path="examples\eval\\train_data.json")
-    EvalClassList_ctx.transfer_jsonl("examples\eval\\train.jsonl")
+    EvalClassList_ctx = EvalClassList(save_path=os.path.join("examples", "eval", "train_data.json"))
+    EvalClassList_ctx.transfer_jsonl(os.path.join("examples", "eval", "train.jsonl"))
     # 五类混合示例（语言+旁白+内心独白+旁白+语言，含情绪转折）
     # data61 = EvalClass(task_id=0, origin_input=None,
     #     ref_resp=[
@@ -1,8 +1,5 @@
-import copy
 import os, sys
 from typing import Any, Dict, List
-from openai import OpenAI
-import langchain
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -10,62 +7,70 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 try:
     from template.BaseClassTemp.BaseEvalClass import EvalClass
     from template.BaseClassTemp.BaseClass import JsonObjCrud
+    from template.prompt_registry import PromptTemplate, get_prompt_registry
+    from template.llm_backend import LLMBackend, OpenAIBackend
     from utils.tools import fine_grained_post_process, parse_list_of_dicts, replace_ta_to_name
 except:
     from src.template.BaseClassTemp.BaseEvalClass import EvalClass
     from src.template.BaseClassTemp.BaseClass import JsonObjCrud
+    from src.template.prompt_registry import PromptTemplate, get_prompt_registry
+    from src.template.llm_backend import LLMBackend, OpenAIBackend
     from src.utils.tools import fine_grained_post_process, parse_list_of_dicts, replace_ta_to_name
 
 class LLM_prompt:
     """
     LLM_prompt类，用于定义LLM的提示接口模板
     """
-    def __init__(self, api_key_default:str, api_default: str = "https://ark.cn-beijing.volces.com/api/v3", prompt_path: str = "src\llm\prompts") -> None:
+    # 各提示词类别的系统提示词、使用的模型配置（api或api_faster）以及填入模板clause的子句字段
+    PROMPT_REQUESTS = {
+        "fine_split_process": ("你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的复杂文本进行分割，将其分为语言、内心独白和旁白。你还需要灵活利用上下文来判断，例如观察上文是否正在延续没有说完的话或思考，这会对你后续的判断产生很重要的影响。", "api_faster", "read_sub_sentence"),
+        "classify_ta_name": ("你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的代词替换为具体的说话人.", "api", "read_origin_sub_sentence"),
+        "batch_classify_role": ("你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的代词替换为具体的说话人。", "api", "read_sub_sentence"),
+        "fine_grained_process": ("你是一个专业的台本润色员", "api", "read_sub_sentence"),
+    }
+
+    def __init__(self, api_key_default:str, api_default: str = "https://ark.cn-beijing.volces.com/api/v3", prompt_path: str | None = None) -> None:
         """
         预留的LLM提示词模板列表
-        默认使用火山引擎
+        默认使用火山引擎，prompt_path为None时使用src/llm/prompts
         """
-        # 读取prompt_path目录下的所有文件
-        self.prompt_list = os.listdir(prompt_path)
+        # 提示词模板由进程内共享的注册表管理，按类名查找，文件修改后自动重新加载
+        self.prompts = get_prompt_registry(prompt_path)
         self.api_key_default = api_key_default
         self.api_default = api_default
         self.api, self.api_faster = {"api": "doubao-seed-1-6-thinking-250715", "think": "enabled"}, {"api": "doubao-seed-1-6-250615", "think": "disable"}
-        try:
-            self.client = OpenAI(
-                api_key=self.api_key_default,
-                base_url=self.api_default
-            )
-        except Exception as e:
-            raise Exception(f"初始化OpenAI API失败：{e}")
-        # 过滤所有md文件
-        self.prompt_path_list = [os.path.join(prompt_path, prompt) for prompt in self.prompt_list if prompt.endswith(".md")]
-        self.prompt_list = []
-        for prompt_path in self.prompt_path_list:
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                prompt = f.read()
-                self.prompt_list.append({"class": prompt_path.split("\\")[-1].split(".")[0], "prompt": prompt})
-        # 打印所有提示词模板
-        # print(self.prompt_list)
-        # 初始化openai api
+        # 推理后端，默认通过OpenAI兼容接口调用，openai客户端在第一次调用时才创建
+        self.backend: LLMBackend = OpenAIBackend(self.api_key_default, self.api_default)
         
     def update_api(self, api_key_default: str | None, api_default: str | None, api: str | None = None, think: str | None = None, api_faster: str | None = None, think_faster: str | None = None):
         self.api_key_default = api_key_default if api_key_default is not None else self.api_key_default
         self.api_default = api_default if api_default is not None else self.api_default
         self.api = {"api": api, "think": think} if api is not None and think is not None else self.api
         self.api_faster = {"api": api_faster, "think": think_faster} if api_faster is not None and think_faster is not None else self.api_faster
-        try:
-            self.client = OpenAI(
-                api_key=self.api_key_default,
-                base_url=self.api_default
-            )
-        except Exception as e:
-            print(f"更新OpenAI API失败：{e}")
+        if isinstance(self.backend, OpenAIBackend):
+            self.backend = OpenAIBackend(self.api_key_default, self.api_default)
+
+    def _request_of(self, prompt_class: str, prompt_template: PromptTemplate, ctx: JsonObjCrud) -> Dict[str, Any]:
+        """
+        构造某个提示词类别对ctx的首次请求，返回backend.chat的参数
+        """
+        system_prompt, api_name, clause_field = self.PROMPT_REQUESTS[prompt_class]
+        api = getattr(self, api_name)
+        _prompt = prompt_template.format(context=ctx.read_sentence(), clause=getattr(ctx, clause_field)())
+        return {
+            "model": api["api"],
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": _prompt},
+            ],
+            "extra_body": {"thinking": {"type": api["think"]}} if api["think"] != "disable" else None,
+        }
 
     def _default_api_interface(self, prompt_full: str) -> Any:
         """
         内部类，所有的提示词接口，当其出现问题时，需要采用默认的api接口处理该逻辑，则需要通过这个接口实现
         """
-        completion = self.client.chat.completions.create(
+        raw = self.backend.chat(
             model=self.api["api"],
             messages=[
                 {"role": "system", "content": "你是一个专业的对话分析员，下面根据任务对现有文本进行标注！"},
@@ -74,38 +79,29 @@ class LLM_prompt:
             ],
             extra_body = {"thinking": {"type": self.api["think"]}} if self.api["think"] != "disable" else None
         )
-        raw = completion.choices[0].message.content
         return raw
     
-    def _classify_text_interface(self, prompt_template: str, ctx: JsonObjCrud, message: List[Dict[str, str]] | None = None) -> JsonObjCrud:
+    def _classify_text_interface(self, prompt_template: PromptTemplate, ctx: JsonObjCrud, message: List[Dict[str, str]] | None = None, raw: str | None = None) -> JsonObjCrud:
         """
         分类文本接口
         ctx: 包含文本分类任务的上下文信息
+        raw: 已经批量得到的首次模型输出，为None时调用后端
         返回值:
         ctx
         """
         if message is not None:
             # 如果提供了message参数，直接使用
             _prompt = message
-            completion = self.client.chat.completions.create(
+            raw = self.backend.chat(
                 model=self.api_faster["api"],
                 messages=message,
                 extra_body = {"thinking": {"type": self.api_faster["think"]}} if self.api_faster["think"] != "disable" else None
-            )
+            ) if raw is None else raw
         else:
             # 否则使用默认的消息结构
-            context, clause = ctx.read_sentence(), ctx.read_sub_sentence()
-            _prompt = prompt_template.format(context=context, clause=clause)
-            completion = self.client.chat.completions.create(
-                model=self.api_faster["api"],
-                messages=[
-                    {"role": "system", "content": "你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的复杂文本进行分割，将其分为语言、内心独白和旁白。你还需要灵活利用上下文来判断，例如观察上文是否正在延续没有说完的话或思考，这会对你后续的判断产生很重要的影响。"},
-
-                    {"role": "user", "content": _prompt},
-                ],
-                extra_body = {"thinking": {"type": self.api_faster["think"]}} if self.api_faster["think"] != "disable" else None
-            )
-        raw = completion.choices[0].message.content
+            request = self._request_of("fine_split_process", prompt_template, ctx)
+            _prompt = request["messages"][-1]["content"]
+            raw = self.backend.chat(**request) if raw is None else raw
         ctx = parse_list_of_dicts(raw)
         if not ctx:
             _max_times, i = 3, 0
@@ -117,27 +113,20 @@ class LLM_prompt:
                 raise ValueError(f"分类文本接口调用{_max_times}次均失败")
         return ctx
 
-    def _classify_ta_name(self, prompt_template: str, ctx: JsonObjCrud) -> List[Dict[str, str]]:
+    def _classify_ta_name(self, prompt_template: PromptTemplate, ctx: JsonObjCrud, raw: str | None = None) -> List[Dict[str, str]]:
         """
         代词-角色映射解析
     
     参数:
+        raw: 已经批量得到的首次模型输出，为None时调用后端
     
     返回:
         代词-角色映射列表，格式[{"ta":代词, "name":角色名}]
         """
-        context, clause = ctx.read_sentence(), ctx.read_origin_sub_sentence()
-        _prompt = prompt_template.format(context=context, clause=clause)
-        completion = self.client.chat.completions.create(
-            model=self.api["api"],
-            messages=[
-                {"role": "system", "content": "你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的代词替换为具体的说话人."},
-
-                {"role": "user", "content": _prompt},
-            ],
-            extra_body = {"thinking": {"type": self.api["think"]}} if self.api["think"] != "disable" else None
-        )
-        ctx = parse_list_of_dicts(completion.choices[0].message.content)
+        request = self._request_of("classify_ta_name", prompt_template, ctx)
+        _prompt = request["messages"][-1]["content"]
+        raw = self.backend.chat(**request) if raw is None else raw
+        ctx = parse_list_of_dicts(raw)
         if not ctx:
             _max_times, i = 3, 0
             while not ctx and i < _max_times:
@@ -148,43 +137,23 @@ class LLM_prompt:
                 raise ValueError(f"分类文本接口调用{_max_times}次均失败")
         return ctx
             
-    def _batch_classify_role(self, prompt_template: str, ctx: JsonObjCrud) -> List[Dict[str, Any]]:
-        context, clause = ctx.read_sentence(), ctx.read_sub_sentence()
-        _prompt = prompt_template.format(context=context, clause=clause)
-        completion = self.client.chat.completions.create(
-            # 指定您创建的方舟推理接入点 ID，此处已帮您修改为您的推理接入点 ID
-            model=self.api["api"],
-            messages=[
-                {"role": "system", "content": "你是一个专业的对话分析员，下面将对将要被用于配音的台本进行分割任务，任务是将台本中的代词替换为具体的说话人。"},
-
-                {"role": "user", "content": _prompt},
-            ],
-            extra_body = {"thinking": {"type": self.api["think"]}} if self.api["think"] != "disable" else None
-        )
-        response = {"describe": {"role": completion.choices[0].message.content}}
+    def _batch_classify_role(self, prompt_template: PromptTemplate, ctx: JsonObjCrud, raw: str | None = None) -> List[Dict[str, Any]]:
+        request = self._request_of("batch_classify_role", prompt_template, ctx)
+        raw = self.backend.chat(**request) if raw is None else raw
+        response = {"describe": {"role": raw}}
         return response
 
-    def _fine_grained_text_interface(self, prompt_template: str, ctx: JsonObjCrud) -> Dict[str, Any]:
-        context, clause = ctx.read_sentence(), ctx.read_sub_sentence()
-        _prompt = prompt_template.format(context=context, clause=clause)
-        completion = self.client.chat.completions.create(
-        # 指定您创建的方舟推理接入点 ID，此处已帮您修改为您的推理接入点 ID
-        model=self.api["api"],
-        messages=[
-            {"role": "system", "content": "你是一个专业的台本润色员"},
-            {"role": "user", "content": _prompt},
-        ],
-        extra_body = {"thinking": {"type": self.api["think"]}} if self.api["think"] != "disable" else None
-        )
-        raw_output = completion.choices[0].message.content
-        raw_output = raw_output.replace(" ", "")
+    def _fine_grained_text_interface(self, prompt_template: PromptTemplate, ctx: JsonObjCrud, raw: str | None = None) -> Dict[str, Any]:
+        request = self._request_of("fine_grained_process", prompt_template, ctx)
+        raw = self.backend.chat(**request) if raw is None else raw
+        raw_output = raw.replace(" ", "")
         return fine_grained_post_process({"text": raw_output, "style": None})
     
     def _evaluate_model_response(self, _prompt: str, ctx: List[Dict]) -> EvalClass:
         """
         对模型响应进行评估
         """
-        completion = self.client.chat.completions.create(
+        raw = self.backend.chat(
         # 指定您创建的方舟推理接入点 ID，此处已帮您修改为您的推理接入点 ID
         model=self.api["api"],
         messages=[
@@ -193,8 +162,7 @@ class LLM_prompt:
         ],
         extra_body = {"thinking": {"type": self.api["think"]}} if self.api["think"] != "disable" else None
         )
-        raw_output = completion.choices[0].message.content
-        ctx = parse_list_of_dicts(raw_output)
+        ctx = parse_list_of_dicts(raw)
         if not ctx:
             _max_times, i = 3, 0
             while not ctx and i < _max_times:
@@ -210,21 +178,9 @@ class LLM_prompt:
         """
         对给定的几个接口进行badcase测试，并评分
         """
-        # 查找评估模型响应的提示词
-        eval_prompt_items = [item for item in self.prompt_list if item["class"] == "evaluate_model_response"]
-        if not eval_prompt_items:
-            raise ValueError("未找到 evaluate_model_response 提示词模板")
-        eval_prompt = eval_prompt_items[0]["prompt"]
-        
-        # 查找指定的提示词类别
-        prompt_template = None
-        for prompt in self.prompt_list:
-            if prompt["class"] == prompt_class:
-                prompt_template = prompt["prompt"]
-                break
-        
-        if not prompt_template:
-            raise ValueError(f"未找到类名为 {prompt_class} 的提示词模板")
+        # 查找评估模型响应的提示词与指定的提示词类别
+        eval_prompt = self.prompts.get("evaluate_model_response")
+        prompt_template = self.prompts.get(prompt_class)
         
         ## 使用api调用prompt
         if prompt_class == "fine_split_process":
@@ -245,37 +201,51 @@ class LLM_prompt:
             
         return resp
 
-    def use_prompt_with_class(self, prompt_class: str, ctx: JsonObjCrud) -> List[JsonObjCrud] | JsonObjCrud:
+    def use_prompt_with_class(self, prompt_class: str, ctx: JsonObjCrud, raw: str | None = None) -> List[JsonObjCrud] | JsonObjCrud:
         """
         根据提示词模板的类名，返回对应的提示词模板
+        raw为已经批量得到的首次模型输出，为None时调用后端
         """
-        for prompt in self.prompt_list:
-            if prompt["class"] == prompt_class:
-                prompt_template = prompt["prompt"]
-                ## 使用api调用prompt
-                if prompt_class == "fine_split_process":
-                    # 这里返回的一定是一个List[JsonObjCrud]对象，因此需要对_classify_text_interface的结果做后处理
-                    feedback = self._classify_text_interface(prompt_template, ctx)
-                    ctx_list = []
-                    for item in feedback:
-                        _new_ctx = copy.deepcopy(ctx)
-                        _new_ctx.write_sub_sentence(item["content"])
-                        _new_ctx.write_class(item["class"])
-                        ctx_list.append(_new_ctx)
-                    return ctx_list
-                elif prompt_class == "classify_ta_name":
-                    feedback = self._classify_ta_name(prompt_template, ctx)
-                    _new_ctx_sentence = ctx.read_origin_sub_sentence()
-                    _new_ctx_sentence = replace_ta_to_name(feedback, _new_ctx_sentence)
-                    ctx.write_origin_sub_sentence(_new_ctx_sentence)
-                    return ctx
-                elif prompt_class == "batch_classify_role":
-                    feedback = self._batch_classify_role(prompt_template, ctx)
-                    ctx.write_describe_role(feedback.get("describe", {}).get("role", ""))
-                    return ctx
-                elif prompt_class == "fine_grained_process":
-                    feedback = self._fine_grained_text_interface(prompt_template, ctx)
-                    ctx.write_sub_sentence(feedback.get("text", ""))
-                    return ctx
-                break
-        raise ValueError(f"未找到类名为{prompt_class}的提示词模板")
+        prompt_template = self.prompts.get(prompt_class)
+        ## 使用api调用prompt
+        if prompt_class == "fine_split_process":
+            # 这里返回的一定是一个List[JsonObjCrud]对象，因此需要对_classify_text_interface的结果做后处理
+            feedback = self._classify_text_interface(prompt_template, ctx, raw=raw)
+            ctx_list = []
+            # 所有片段共享同一个窗口与原子句的不可变字段，不再深拷贝整个上下文
+            _window = ctx.read_window()
+            for item in feedback:
+                _new_ctx = ctx.derive(_window)
+                _new_ctx.write_sub_sentence(item["content"])
+                _new_ctx.write_class(item["class"])
+                ctx_list.append(_new_ctx)
+            return ctx_list
+        elif prompt_class == "classify_ta_name":
+            feedback = self._classify_ta_name(prompt_template, ctx, raw=raw)
+            _new_ctx_sentence = ctx.read_origin_sub_sentence()
+            _new_ctx_sentence = replace_ta_to_name(feedback, _new_ctx_sentence)
+            ctx.write_origin_sub_sentence(_new_ctx_sentence)
+            return ctx
+        elif prompt_class == "batch_classify_role":
+            feedback = self._batch_classify_role(prompt_template, ctx, raw=raw)
+            ctx.write_describe_role(feedback.get("describe", {}).get("role", ""))
+            return ctx
+        elif prompt_class == "fine_grained_process":
+            feedback = self._fine_grained_text_interface(prompt_template, ctx, raw=raw)
+            ctx.write_sub_sentence(feedback.get("text", ""))
+            return ctx
+        raise ValueError(f"不支持的提示词类别: {prompt_class}")
+
+    def use_prompt_with_class_batch(self, prompt_class: str, ctx_list: List[JsonObjCrud]) -> List[List[JsonObjCrud] | JsonObjCrud]:
+        """
+        use_prompt_with_class的批量版本，所有ctx的首次请求通过backend.chat_batch一次提交，
+        后端支持合并推理时（如TransformersBackend）按批生成，每个ctx的结果与逐条调用的约定一致
+        """
+        if prompt_class not in self.PROMPT_REQUESTS:
+            raise ValueError(f"不支持的提示词类别: {prompt_class}")
+        if not ctx_list:
+            return []
+        prompt_template = self.prompts.get(prompt_class)
+        requests = [self._request_of(prompt_class, prompt_template, ctx) for ctx in ctx_list]
+        raws = self.backend.chat_batch(requests[0]["model"], [request["messages"] for request in requests], requests[0]["extra_body"])
+        return [self.use_prompt_with_class(prompt_class, ctx, raw=raw) for ctx, raw in zip(ctx_list, raws)]
@@ -0,0 +1,199 @@
+"""
+LLM推理后端
+
+LLM_prompt只依赖LLMBackend接口，具体的推理方式（OpenAI兼容的HTTP接口、本地模型等）由后端实现，
+后端所需的重量级依赖只在第一次推理时才导入，不影响只做文本处理或dry run时的启动速度。
+"""
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+
+class LLMBackend(ABC):
+    """
+    推理后端接口
+    """
+    @abstractmethod
+    def chat(self, model: str, messages: List[Dict[str, str]], extra_body: Dict[str, Any] | None = None) -> str:
+        """
+        发送一组对话消息，返回模型输出的文本
+        """
+
+    def chat_batch(self, model: str, messages_list: List[List[Dict[str, str]]], extra_body: Dict[str, Any] | None = None) -> List[str]:
+        """
+        批量推理，默认逐条调用chat，能够合并推理的后端应重写此方法
+        """
+        return [self.chat(model, messages, extra_body) for messages in messages_list]
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    OpenAI兼容接口的后端，openai客户端在第一次调用时才导入并创建
+    """
+    def __init__(self, api_key: str, base_url: str) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            try:
+                from openai import OpenAI
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+            except Exception as e:
+                raise Exception(f"初始化OpenAI API失败：{e}")
+        return self._client
+
+    def chat(self, model: str, messages: List[Dict[str, str]], extra_body: Dict[str, Any] | None = None) -> str:
+        completion = self.client.chat.completions.create(model=model, messages=messages, extra_body=extra_body)
+        return completion.choices[0].message.content
+
+
+class OpenAIBatchBackend(OpenAIBackend):
+    """
+    通过OpenAI Batch接口离线推理的后端（本地src/llm/server/deploy.py同样提供该接口）：
+    chat_batch把一个阶段的所有请求写成JSONL上传，创建batch任务后轮询直到结束，再下载结果；
+    单条的chat仍走普通的对话接口。batch中失败或缺失的请求会逐条通过chat补齐
+    """
+    FINAL_STATUSES = ("completed", "failed", "cancelled", "expired")
+
+    def __init__(self, api_key: str, base_url: str, poll_interval: float = 5.0, completion_window: str = "24h") -> None:
+        super().__init__(api_key, base_url)
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+    def chat_batch(self, model: str, messages_list: List[List[Dict[str, str]]], extra_body: Dict[str, Any] | None = None) -> List[str]:
+        if not messages_list:
+            return []
+        # openai客户端会把extra_body合并到请求体顶层，这里保持一致
+        lines = [
+            json.dumps({"custom_id": f"request-{i}", "method": "POST", "url": "/v1/chat/completions",
+                        "body": {"model": model, "messages": messages, **(extra_body or {})}}, ensure_ascii=False)
+            for i, messages in enumerate(messages_list)
+        ]
+        input_file = self.client.files.create(file=(f"batch-{uuid.uuid4().hex}.jsonl", ("\n".join(lines) + "\n").encode("utf-8")), purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window=self.completion_window)
+        print(f"已提交batch任务{batch.id}，共{len(lines)}条请求")
+        while batch.status not in self.FINAL_STATUSES:
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        print(f"batch任务{batch.id}结束，状态: {batch.status}，完成{counts.completed if counts else '?'}条，失败{counts.failed if counts else '?'}条")
+        outputs: List[str | None] = [None] * len(lines)
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                index = int(item["custom_id"].rsplit("-", 1)[-1])
+                response = item.get("response") or {}
+                if item.get("error") is None and response.get("status_code") == 200:
+                    outputs[index] = response["body"]["choices"][0]["message"]["content"]
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            print(f"batch任务{batch.id}中{len(missing)}条请求没有结果，逐条重新请求")
+        for i in missing:
+            outputs[i] = self.chat(model, messages_list[i], extra_body)
+        return outputs
+
+
+def plan_batches(lengths: List[int], batch_size: int, max_batch_tokens: int | None = None) -> List[List[int]]:
+    """
+    按输入长度排序后切分批次，长度相近的请求放在同一批以减少padding
+
+    参数:
+        lengths: 每个请求的token数
+        batch_size: 每批最多的请求数
+        max_batch_tokens: 每批padding后的最大token数（批内最长长度×请求数），为None时不限
+
+    返回:
+        每批请求在lengths中的下标
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # 排序后批内最后加入的请求最长
+        if current and (len(current) >= batch_size or (max_batch_tokens is not None and lengths[index] * (len(current) + 1) > max_batch_tokens)):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TransformersBackend(LLMBackend):
+    """
+    进程内的transformers后端，与src/llm/server/deploy.py加载同一个模型，但不经过HTTP；
+    chat_batch把一个阶段的所有请求按长度分批，左侧padding后每批只调用一次generate。
+    torch与transformers在第一次推理时才导入，模型也在那时加载
+    """
+    def __init__(self, model_path: str, device: str | None = None, torch_dtype: str = "float16", batch_size: int = 8,
+                 max_batch_tokens: int | None = None, max_new_tokens: int = 4096, temperature: float = 0.7, top_p: float = 0.9) -> None:
+        self.model_path = model_path
+        self.device = device
+        self.torch_dtype = torch_dtype
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self._model = None
+        self._tokenizer = None
+
+    def _load(self) -> None:
+        if self._model is not None:
+            return
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"加载本地模型: {self.model_path}，设备: {device}")
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_path, trust_remote_code=True)
+        # 批量生成需要左侧padding，保证每条请求的生成位置对齐
+        self._tokenizer.padding_side = "left"
+        if self._tokenizer.pad_token is None:
+            self._tokenizer.pad_token = self._tokenizer.eos_token
+        self._model = AutoModelForCausalLM.from_pretrained(
+            self.model_path,
+            torch_dtype=getattr(torch, self.torch_dtype) if device != "cpu" else torch.float32,
+            device_map=device,
+            trust_remote_code=True
+        ).eval()
+
+    def chat(self, model: str, messages: List[Dict[str, str]], extra_body: Dict[str, Any] | None = None) -> str:
+        return self.chat_batch(model, [messages], extra_body)[0]
+
+    def chat_batch(self, model: str, messages_list: List[List[Dict[str, str]]], extra_body: Dict[str, Any] | None = None) -> List[str]:
+        """
+        model参数只为与接口保持一致，本地后端始终使用加载的模型
+        """
+        if not messages_list:
+            return []
+        self._load()
+        import torch
+        tokenizer, generator = self._tokenizer, self._model
+        enable_thinking = ((extra_body or {}).get("thinking") or {}).get("type") == "enabled"
+        texts = [
+            tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True, enable_thinking=enable_thinking)
+            for messages in messages_list
+        ]
+        lengths = [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+        outputs: List[str] = [""] * len(texts)
+        for batch in plan_batches(lengths, self.batch_size, self.max_batch_tokens):
+            model_inputs = tokenizer([texts[i] for i in batch], return_tensors="pt", padding=True, add_special_tokens=False).to(generator.device)
+            with torch.inference_mode():
+                generated_ids = generator.generate(
+                    **model_inputs,
+                    max_new_tokens=self.max_new_tokens,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    do_sample=True,
+                    pad_token_id=tokenizer.pad_token_id
+                )
+            prompt_length = model_inputs.input_ids.shape[1]
+            for i, output_ids in zip(batch, generated_ids[:, prompt_length:].tolist()):
+                outputs[i] = tokenizer.decode(output_ids, skip_special_tokens=True).strip()
+        return outputs
@@ -0,0 +1,143 @@
+"""
+提示词模板注册表
+
+进程内只加载一次src/llm/prompts下的所有*.md模板，按类名（文件名去掉后缀）O(1)查找，
+加载时预先解析模板中的格式化字段，并提供内容哈希作为版本号，供缓存使用；
+模板文件被修改后，下一次查找时自动重新加载。
+"""
+import hashlib
+import os
+import string
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+# 默认的提示词目录，与运行时的工作目录无关
+DEFAULT_PROMPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm", "prompts")
+
+
+class PromptTemplate:
+    """
+    单个提示词模板
+    """
+    __slots__ = ("name", "path", "text", "fields", "version", "mtime_ns")
+
+    def __init__(self, name: str, path: str, text: str, mtime_ns: int = 0) -> None:
+        self.name = name
+        self.path = path
+        self.text = text
+        # 模板中用到的格式化字段，{{ }}转义的花括号不计入
+        self.fields: FrozenSet[str] = frozenset(
+            field.split(".")[0].split("[")[0] for _, field, _, _ in string.Formatter().parse(text) if field
+        )
+        self.version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+        self.mtime_ns = mtime_ns
+
+    def format(self, **kwargs: Any) -> str:
+        """
+        填充模板，缺少字段时抛出KeyError并列出缺少的字段
+        """
+        missing = self.fields.difference(kwargs)
+        if missing:
+            raise KeyError(f"提示词模板{self.name}缺少字段: {', '.join(sorted(missing))}")
+        return self.text.format(**kwargs)
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class PromptRegistry:
+    """
+    提示词模板注册表，一个目录对应一个实例，通过get_prompt_registry获取
+    """
+    def __init__(self, prompt_dir: str = DEFAULT_PROMPT_DIR, auto_reload: bool = True, check_interval: float = 1.0) -> None:
+        self.prompt_dir = os.path.abspath(prompt_dir)
+        self.auto_reload = auto_reload
+        # 两次检查文件修改时间的最小间隔（秒），避免每次查找都访问磁盘
+        self.check_interval = check_interval
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._version = ""
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _scan(self) -> Dict[str, Tuple[str, int]]:
+        """
+        类名 -> (文件路径, 修改时间)
+        """
+        if not os.path.isdir(self.prompt_dir):
+            raise FileNotFoundError(f"提示词目录 {self.prompt_dir} 不存在")
+        return {
+            os.path.splitext(entry.name)[0]: (entry.path, entry.stat().st_mtime_ns)
+            for entry in os.scandir(self.prompt_dir) if entry.is_file() and entry.name.endswith(".md")
+        }
+
+    def reload(self, force: bool = False) -> List[str]:
+        """
+        重新加载修改过、新增的模板并移除已删除的模板，force为True时全部重新读取
+
+        返回:
+            发生变化的类名列表
+        """
+        with self._lock:
+            files = self._scan()
+            changed = [name for name in self._templates if name not in files]
+            templates = {}
+            for name, (path, mtime_ns) in files.items():
+                template = self._templates.get(name)
+                if force or template is None or template.mtime_ns != mtime_ns or template.path != path:
+                    with open(path, "r", encoding="utf-8") as f:
+                        template = PromptTemplate(name, path, f.read(), mtime_ns)
+                    changed.append(name)
+                templates[name] = template
+            if changed:
+                self._templates = templates
+                self._version = hashlib.sha1("".join(f"{name}:{templates[name].version};" for name in sorted(templates)).encode("utf-8")).hexdigest()[:12]
+            self._checked_at = time.monotonic()
+            return changed
+
+    def _maybe_reload(self) -> None:
+        if self.auto_reload and time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        按类名获取模板，不存在时抛出ValueError
+        """
+        self._maybe_reload()
+        template = self._templates.get(name)
+        if template is None:
+            raise ValueError(f"未找到类名为{name}的提示词模板")
+        return template
+
+    def __contains__(self, name: str) -> bool:
+        self._maybe_reload()
+        return name in self._templates
+
+    def names(self) -> List[str]:
+        self._maybe_reload()
+        return sorted(self._templates)
+
+    @property
+    def version(self) -> str:
+        """
+        所有模板内容的哈希，任一模板内容变化时改变
+        """
+        self._maybe_reload()
+        return self._version
+
+
+_REGISTRIES: Dict[str, PromptRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_prompt_registry(prompt_dir: str | None = None) -> PromptRegistry:
+    """
+    获取进程内共享的提示词注册表，同一目录只加载一次
+    """
+    prompt_dir = os.path.abspath(prompt_dir or DEFAULT_PROMPT_DIR)
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(prompt_dir)
+        if registry is None:
+            registry = _REGISTRIES[prompt_dir] = PromptRegistry(prompt_dir)
+        return registry
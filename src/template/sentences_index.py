@@ -0,0 +1,104 @@
+"""
+句子列表的二级索引
+
+按class、describe.role、speaker_id对子句分组，并按duration_begin排序，
+随子句的写入增量维护，查询代价只与命中的子句数有关，无需扫描整个列表。
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+
+class SentenceIndex:
+    """
+    SentencesJsonListCrud的二级索引，保存的是子句对象本身，列表插入、删除导致的位置变化不影响索引
+    """
+    FIELDS = ("class", "role", "speaker_id")
+
+    def __init__(self, items: Iterable[Any] = ()) -> None:
+        # 子句 -> (class编码, role, speaker_id, duration_begin, duration_end)，用于写入后定位旧的索引项
+        self._keys: Dict[Any, Tuple[Any, ...]] = {}
+        self._groups: Dict[str, Dict[Any, Set[Any]]] = {field: {} for field in self.FIELDS}
+        # 有时长的子句按duration_begin升序排列，两个列表一一对应
+        self._begins: List[float] = []
+        self._timed: List[Any] = []
+        # 缺少开始或结束时长的子句
+        self._untimed: Set[Any] = set()
+        for item in items:
+            self.add(item)
+
+    @staticmethod
+    def _key_of(item: Any) -> Tuple[Any, ...]:
+        return (item._class_code, item._role, item.speaker_id, item.duration_begin, item.duration_end)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, item: Any) -> None:
+        """
+        加入一个子句
+        """
+        key = self._key_of(item)
+        self._keys[item] = key
+        for field, value in zip(self.FIELDS, key):
+            self._groups[field].setdefault(value, set()).add(item)
+        begin, end = key[3], key[4]
+        if begin is None or end is None:
+            self._untimed.add(item)
+        else:
+            position = bisect_right(self._begins, begin)
+            self._begins.insert(position, begin)
+            self._timed.insert(position, item)
+
+    def remove(self, item: Any) -> None:
+        """
+        移除一个子句，子句不在索引中时忽略
+        """
+        key = self._keys.pop(item, None)
+        if key is None:
+            return
+        for field, value in zip(self.FIELDS, key):
+            _group = self._groups[field][value]
+            _group.discard(item)
+            if not _group:
+                del self._groups[field][value]
+        begin, end = key[3], key[4]
+        if begin is None or end is None:
+            self._untimed.discard(item)
+            return
+        for position in range(bisect_left(self._begins, begin), bisect_right(self._begins, begin)):
+            if self._timed[position] is item:
+                del self._begins[position]
+                del self._timed[position]
+                return
+
+    def update(self, item: Any) -> None:
+        """
+        子句写入后调用，索引字段未变化时不做任何事
+        """
+        key = self._keys.get(item)
+        if key is None or key == self._key_of(item):
+            return
+        self.remove(item)
+        self.add(item)
+
+    def lookup(self, field: str, value: Any) -> Set[Any]:
+        """
+        查询某个字段等于value的子句集合，class字段使用类别编码
+        """
+        return self._groups[field].get(value, set())
+
+    def by_duration(self, begin: float | None = None, end: float | None = None) -> List[Any]:
+        """
+        查询时长区间完全落在[begin, end]内的子句，边界为None表示不限
+        """
+        lo = 0 if begin is None else bisect_left(self._begins, begin)
+        hi = len(self._begins) if end is None else bisect_right(self._begins, end)
+        if end is None:
+            return self._timed[lo:hi]
+        return [item for item in self._timed[lo:hi] if item.duration_end <= end]
+
+    def untimed(self) -> Set[Any]:
+        """
+        查询缺少时长的子句集合
+        """
+        return self._untimed
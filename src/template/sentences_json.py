@@ -4,17 +4,24 @@
 提供对句子JSON数据的增删改查操作，符合代码规范。
 """
 from typing import Dict, Optional, Any, List
+import copy
 import json
 import os
 import sys
+import weakref
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from src.template.BaseClassTemp.BaseClass import BaseJsonCrud, SentenceKeys, BaseJsonListCrud, JsonObjCrud
-    from src.utils.tools import mapping_windows_size
+    from src.template.BaseClassTemp.BaseClass import find_class_code
+    from src.template.sentences_store import JsonlIndexStore, RecordList, _Unloaded, _write_atomic
+    from src.template.sentences_index import SentenceIndex
 except:
     from BaseClassTemp.BaseClass import BaseJsonCrud, SentenceKeys, BaseJsonListCrud, JsonObjCrud
+    from BaseClassTemp.BaseClass import find_class_code
+    from sentences_store import JsonlIndexStore, RecordList, _Unloaded, _write_atomic
+    from sentences_index import SentenceIndex
 
 
 
@@ -135,7 +142,18 @@ class SentencesJsonListCrud(BaseJsonListCrud):
     """句子JSON列表CRUD类"""
     def __init__(self, file_path: Optional[str] = None, Windows_Size: int = 3) -> None:
         self.WINDOWS_SIZE = Windows_Size
+        # 脏区间记录：id从_id_dirty_from开始需要重排
+        self._id_dirty_from = 0
+        # 以.jsonl结尾的文件使用JSONL + 偏移索引存储，元素按需加载
+        self.store: JsonlIndexStore | None = None
+        # 二级索引，第一次查询时才建立，之后随写入增量维护
+        self._indexes: SentenceIndex | None = None
+        # 快照版本号与仍然存活的快照，写入被快照引用的子句前先为快照保留副本
+        self._epoch = 0
+        self._snapshots: List[weakref.ref] = []
         super().__init__(file_path)
+        if not isinstance(self.data, RecordList):
+            self.data = RecordList(self.data)
 
     def __len__(self) -> int:
         """
@@ -150,40 +168,220 @@ class SentencesJsonListCrud(BaseJsonListCrud):
         对当前的列表id进行重排，避免显示问题
         """
         for i in range(len(self.data)):
-            self.data[i].write_id(i)
+            item = self.data.peek(i)
+            if item is not None:
+                item.write_id(i)
     
     def _check_sentence_window(self) -> None:
         """
-        维护每个句子的上下文窗口
+        全量重排所有id，上下文窗口由window_of按需计算，无需在此维护
         """
         self._id_check()
-        _temp_windows = []
-        for i, item in enumerate(self.data):
-            array_size, start_id = mapping_windows_size(self.WINDOWS_SIZE, i, len(self.data))
-            _sentence = [item.read_sub_sentence()]
-            for j in range(start_id):
-                _sentence.insert(0, self.data[i - j - 1].read_origin_sub_sentence())
-            for j in range(array_size - start_id - 1):
-                _sentence.append(self.data[i + j + 1].read_origin_sub_sentence())
-            item.write_sentence(_sentence, start_id)
-        self._id_check()
+        self._id_dirty_from = len(self.data)
+
+    def _mark_dirty(self, list_num: int) -> None:
+        """
+        记录一次发生在list_num处的插入或删除，其后的id需要惰性重排
+        """
+        self._id_dirty_from = min(self._id_dirty_from, list_num)
+
+    def _refresh(self, list_num: int) -> None:
+        """
+        惰性地维护id：只重排到list_num为止
+        """
+        if list_num >= self._id_dirty_from:
+            for i in range(self._id_dirty_from, list_num + 1):
+                item = self.data.peek(i)
+                if item is not None:
+                    item.write_id(i)
+            self._id_dirty_from = list_num + 1
+
+    def _refresh_all(self) -> None:
+        """
+        重排所有脏id，代价与最早的脏位置之后的元素数量成正比
+        """
+        if self.data:
+            self._refresh(len(self.data) - 1)
+
+    def _adopt(self, item: JsonObjCrud) -> JsonObjCrud:
+        """
+        将元素挂到当前列表下，释放其自身保存的窗口副本
+        """
+        item._owner = self
+        item.Sentence = None
+        item._epoch = self._epoch
+        return item
+
+    def _detach(self, item: JsonObjCrud) -> JsonObjCrud:
+        """
+        将元素从当前列表摘下，保留一份离开时的窗口快照
+        """
+        item.Sentence = self.window_of(item)
+        item._owner = None
+        return item
+
+    def _index_of(self, item: JsonObjCrud) -> int:
+        """
+        查找元素在列表中的位置，id干净时为O(1)
+        """
+        list_num = item.read_id()
+        if isinstance(list_num, int) and 0 <= list_num < min(self._id_dirty_from, len(self.data)) and self.data.peek(list_num) is item:
+            return list_num
+        self._refresh_all()
+        list_num = item.read_id()
+        if isinstance(list_num, int) and 0 <= list_num < len(self.data) and self.data.peek(list_num) is item:
+            return list_num
+        raise ValueError("元素不属于当前列表")
+
+    def window_of(self, item: JsonObjCrud | int) -> Dict[str, Any]:
+        """
+        按需计算上下文窗口，窗口为前后各WINDOWS_SIZE个原始子句，当前句使用子句
+
+        Args:
+            item: 列表中的元素或其下标
+        Returns:
+            {"now_flag": 当前句在窗口中的位置, "sentence": 子句列表}
+        """
+        list_num = item if isinstance(item, int) else self._index_of(item)
+        start = max(0, list_num - self.WINDOWS_SIZE)
+        end = min(len(self.data), list_num + self.WINDOWS_SIZE + 1)
+        _sentence = [_item.read_origin_sub_sentence() for _item in self.data[start:end]]
+        _sentence[list_num - start] = self.data[list_num].read_sub_sentence()
+        return {"now_flag": list_num - start, "sentence": _sentence}
     
+    def _ensure_indexes(self) -> SentenceIndex:
+        """
+        第一次查询时建立二级索引，JSONL存储下会加载全部子句
+        """
+        if self._indexes is None:
+            self._indexes = SentenceIndex(self.data)
+        return self._indexes
+
+    def _positions(self, items) -> List[int]:
+        return sorted(self._index_of(item) for item in items)
+
+    def find(self, class_name: str | List[str] | None = ..., role: str | List[str] | None = ..., speaker_id: str | List[str] | None = ...) -> List[int]:
+        """
+        按class、describe.role、speaker_id查询子句，条件之间为且，单个条件传入列表时为或
+
+        Args:
+            class_name: 句子类别，如"语言"或["语言", "内心独白"]，不传表示不限
+            role: 说话人
+            speaker_id: 音色id
+        Returns:
+            命中子句的下标，升序排列
+        """
+        indexes = self._ensure_indexes()
+        conditions = [("class", class_name), ("role", role), ("speaker_id", speaker_id)]
+        _sets = []
+        for field, values in conditions:
+            if values is ...:
+                continue
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if field == "class":
+                # 未知类别不会出现在任何子句上，直接丢弃，不写入编码表
+                values = [code for code in map(find_class_code, values) if code is not None]
+            _hit = [indexes.lookup(field, value) for value in values]
+            _sets.append(_hit[0] if len(_hit) == 1 else set().union(*_hit))
+        if not _sets:
+            return list(range(len(self.data)))
+        _sets.sort(key=len)
+        result = _sets[0]
+        for _set in _sets[1:]:
+            result = result & _set
+        return self._positions(result)
+
+    def find_by_duration(self, begin: float | None = None, end: float | None = None) -> List[int]:
+        """
+        查询音频时长区间完全落在[begin, end]内的子句
+
+        Returns:
+            命中子句的下标，升序排列
+        """
+        return self._positions(self._ensure_indexes().by_duration(begin, end))
+
+    def find_without_duration(self) -> List[int]:
+        """
+        查询尚未写入开始或结束时长的子句
+
+        Returns:
+            命中子句的下标，升序排列
+        """
+        return self._positions(self._ensure_indexes().untimed())
+
+    def snapshot(self) -> 'SentencesSnapshot':
+        """
+        拍摄当前列表的只读快照，用于保留每个处理阶段的结果
+
+        快照与列表共享所有子句，代价只是一份引用列表；之后列表中的子句第一次被修改前，
+        才为快照复制一份写入前的子句（写时复制），未修改的子句始终共享
+        """
+        self._refresh_all()
+        self._epoch += 1
+        _snapshot = SentencesSnapshot(self.data.raw_items(), self._epoch, self.WINDOWS_SIZE, self.data.store)
+        self._snapshots = [ref for ref in self._snapshots if ref() is not None]
+        self._snapshots.append(weakref.ref(_snapshot))
+        return _snapshot
+
+    def _preserve(self, item: JsonObjCrud) -> None:
+        """
+        子句写入前的回调：为在其上次保留之后拍摄的快照保存一份写入前的浅拷贝
+        """
+        _copy = None
+        alive = []
+        for ref in self._snapshots:
+            _snapshot = ref()
+            if _snapshot is None:
+                continue
+            alive.append(ref)
+            if _snapshot.epoch > item._epoch:
+                if _copy is None:
+                    _copy = copy.copy(item)
+                _snapshot._overrides[item] = _copy
+        self._snapshots = alive
+        item._epoch = self._epoch
+
+    def _has_snapshots(self) -> bool:
+        return any(ref() is not None for ref in self._snapshots)
+
+    def _load_item(self, list_num: int, record: Dict[str, Any], offset: int | None = None) -> JsonObjCrud:
+        """
+        RecordList的加载回调：将一条落盘记录解析为挂在当前列表下的元素，并记录其落盘偏移用于脏检查
+        """
+        item = JsonObjCrud()
+        item.write_all(record)
+        item.write_id(list_num)
+        item._offset = offset
+        return self._adopt(item)
+
     def load_data(self, file_path: Optional[str] = None) -> bool:
         """
-        加载JSON数据
+        加载JSON数据，.jsonl文件只读取偏移索引，子句在第一次访问时才解析
         """
         if file_path:
             self.file_path = file_path
+        self._indexes = None
+        if self.file_path.endswith(".jsonl"):
+            try:
+                # 存在快照时旧存储交给快照继续读取，快照释放后随之关闭
+                if self.store is not None and not self._has_snapshots():
+                    self.store.close()
+                self.store = JsonlIndexStore(self.file_path)
+                self.data = RecordList.from_store(self.store, self._load_item)
+                self._snapshots = []
+                self._id_dirty_from = len(self.data)
+                return True
+            except Exception as e:
+                print(f"加载JSONL数据时出错：{e}")
+                return False
         try:
             with open(self.file_path, 'r', encoding="utf-8") as f:
                 loaded = json.load(f)
                 if not isinstance(loaded, List):
                     print(f"JSON数据格式错误，必须是列表类型，当前类型为：{type(loaded)}")
                     return False
-                _data = loaded
-                self.data = [JsonObjCrud() for i in range(len(_data))]
-                for i, item in enumerate(self.data):
-                    item.write_all(_data[i]) 
+                self.data = RecordList(self._load_item(i, item) for i, item in enumerate(loaded))
+                self._snapshots = []
                 self._check_sentence_window()
                 return True
         except Exception as e:
@@ -197,7 +395,9 @@ class SentencesJsonListCrud(BaseJsonListCrud):
         Returns:
             id对应的句子
         """
-        self._check_sentence_window()
+        if list_num < 0:
+            list_num += len(self.data)
+        self._refresh(list_num)
         return self.data[list_num].read_all()
 
     def read_all(self) -> List[Dict[str, Any]]:
@@ -206,12 +406,12 @@ class SentencesJsonListCrud(BaseJsonListCrud):
         Returns:
             所有项的字典
         """
-        self._check_sentence_window()
+        self._refresh_all()
         return [item.read_all() for item in self.data]
 
     def update(self, list_num: int, key_name: SentenceKeys | str, value: str | Dict[str, Any], flag: int | None = None) -> bool:
         """
-        更新项的指定键值
+        更新项的指定键值；列表中项的窗口(sentence)由列表根据当前数据实时计算，不能直接更新，返回False
         
         Args:
             key_name: 要更新的键名
@@ -228,7 +428,8 @@ class SentencesJsonListCrud(BaseJsonListCrud):
             elif key_name == "sub_sentence":
                 self.data[list_num].write_sub_sentence(value)
             elif key_name == "sentence":
-                self.data[list_num].write_sentence(value, flag)
+                print("列表中项的窗口由列表实时计算，不能直接更新sentence")
+                return False
             elif key_name == "describe":
                 self.data[list_num].write_describe(value)
             elif key_name == "role":
@@ -256,9 +457,12 @@ class SentencesJsonListCrud(BaseJsonListCrud):
         """
         try:
             self.data[list_num].write_all(item)
+            self._adopt(self.data[list_num])
         except Exception as e:
             print(f"更新项 {list_num} 时出错：{e}")
             return False
+        # write_all会覆盖id，需要从此处重排
+        self._mark_dirty(list_num % len(self.data))
         return True
 
     def delete(self, list_num: int) -> bool:
@@ -272,7 +476,14 @@ class SentencesJsonListCrud(BaseJsonListCrud):
             处理结果
         """
         try:
+            if list_num < 0:
+                list_num += len(self.data)
+            self._refresh(list_num)
+            if self._indexes is not None:
+                self._indexes.remove(self.data[list_num])
+            self._detach(self.data[list_num])
             del self.data[list_num]
+            self._mark_dirty(list_num)
         except Exception as e:
             print(f"删除项 {list_num} 时出错：{e}")
             return False
@@ -291,32 +502,301 @@ class SentencesJsonListCrud(BaseJsonListCrud):
         try:
             _new_item = JsonObjCrud(None, None)
             _new_item.write_all(item)
+            self._adopt(_new_item)
             if list_num and list_num < len(self.data) and list_num >= 0:
                 self.data.insert(list_num, _new_item)
             else:
+                list_num = len(self.data)
                 self.data.append(_new_item)
+            if self._indexes is not None:
+                self._indexes.add(_new_item)
+            self._mark_dirty(list_num)
         except Exception as e:
             print(f"创建项时出错：{e}")
             return False
         return True
     
-    def save_date(self, save_file_path: str | None = None):
+    def _new_items(self, items: List[Dict[str, Any]]) -> List[JsonObjCrud]:
+        _new_items = []
+        for item in items:
+            _new_item = JsonObjCrud(None, None)
+            _new_item.write_all(item)
+            _new_items.append(self._adopt(_new_item))
+        return _new_items
+
+    def _splice(self, start: int, stop: int, new_items: List[JsonObjCrud], snapshot: bool = True) -> None:
+        """
+        将[start, stop)区间替换为已挂到当前列表下的新元素，被替换的元素保留窗口快照后摘下
+        """
+        _old_items = self.data[start:stop]
+        if snapshot and _old_items:
+            self._refresh(stop - 1)
+            # 先为被替换的项保留窗口快照，再统一摘下
+            for item in _old_items:
+                item.Sentence = self.window_of(item)
+        for item in _old_items:
+            item._owner = None
+            if self._indexes is not None:
+                self._indexes.remove(item)
+        self.data.splice(start, stop, new_items)
+        if self._indexes is not None:
+            for item in new_items:
+                self._indexes.add(item)
+        self._mark_dirty(start)
+
+    def replace_range(self, start: int, stop: int, items: List[Dict[str, Any]]) -> bool:
         """
-        保存数据到文件
+        将[start, stop)区间的项一次性替换为新项，例如把一个粗颗粒度句子替换为拆分后的多个子句
+
+        Args:
+            start: 区间起点
+            stop: 区间终点（不包含）
+            items: 新项数据列表，可以为空，即删除整个区间
+        Returns:
+            处理结果
         """
         try:
-            self._check_sentence_window()
-            if save_file_path:
-                with open(save_file_path, 'w', encoding="utf-8") as f:
-                    json.dump([item.read_all_vis() for item in self.data], f, ensure_ascii=False, indent=4)
+            start, stop, _ = slice(start, stop).indices(len(self.data))
+            self._splice(start, max(start, stop), self._new_items(items))
+        except Exception as e:
+            print(f"替换区间 [{start}, {stop}) 时出错：{e}")
+            return False
+        return True
+
+    def create_many(self, list_num: int | None, items: List[Dict[str, Any]]) -> bool:
+        """
+        在list_num处连续插入多个新项，list_num为None或越界时追加到末尾
+
+        Args:
+            list_num: 插入位置
+            items: 新项数据列表
+        Returns:
+            处理结果
+        """
+        if list_num is None or not 0 <= list_num < len(self.data):
+            list_num = len(self.data)
+        return self.replace_range(list_num, list_num, items)
+
+    def update_many(self, list_nums: List[int], key_name: SentenceKeys | str, values: List[str | Dict[str, Any]]) -> bool:
+        """
+        批量更新多个项的同一个键
+
+        Args:
+            list_nums: 要更新的id列表
+            key_name: 要更新的键名
+            values: 与list_nums一一对应的新值
+        Returns:
+            全部成功时为True
+        """
+        if len(list_nums) != len(values):
+            print(f"批量更新的id数量 {len(list_nums)} 与值数量 {len(values)} 不一致")
+            return False
+        result = True
+        for list_num, value in zip(list_nums, values):
+            result = self.update(list_num, key_name, value) and result
+        return result
+
+    def delete_many(self, list_nums: List[int]) -> bool:
+        """
+        批量删除多个项，相邻的id合并为一次区间删除
+
+        Args:
+            list_nums: 要删除的id列表
+        Returns:
+            处理结果
+        """
+        length = len(self.data)
+        _nums = sorted({list_num + length if list_num < 0 else list_num for list_num in list_nums})
+        if _nums and not (0 <= _nums[0] and _nums[-1] < length):
+            print(f"删除项 {list_nums} 时出错：id越界")
+            return False
+        # 从后往前按连续区间删除，前面区间的位置不受影响
+        runs = []
+        for list_num in _nums:
+            if runs and runs[-1][1] == list_num:
+                runs[-1][1] = list_num + 1
             else:
-                with open(self.file_path, 'w', encoding="utf-8") as f:
-                    json.dump([item.read_all_vis() for item in self.data], f, ensure_ascii=False, indent=4)
+                runs.append([list_num, list_num + 1])
+        try:
+            self._refresh_all()
+            for list_num in _nums:
+                item = self.data[list_num]
+                item.Sentence = self.window_of(item)
+            for start, stop in reversed(runs):
+                self._splice(start, stop, [], snapshot=False)
         except Exception as e:
-            raise f"保存数据到文件时出错：{e}"
+            print(f"删除项 {list_nums} 时出错：{e}")
             return False
         return True
 
+    def _jsonl_lines(self, with_window: bool = False):
+        """
+        按列表顺序生成每条子句的JSONL字节串，未修改的子句直接复制原始字节，不做解析
+        """
+        for i in range(len(self.data)):
+            offset = self.data.offset_of(i) if self.store is not None else None
+            if offset is not None and not with_window:
+                yield self.store.read_raw(offset)
+            else:
+                item = self.data[i]
+                yield json.dumps(item.read_all_vis() if with_window else item.to_storage_dict(), ensure_ascii=False).encode("utf-8")
+
+    def _save_jsonl(self, save_file_path: str, with_window: bool = False) -> None:
+        """
+        保存为JSONL + 偏移索引格式
+
+        保存回自身文件时只把修改过或新建的子句追加到文件末尾，再原子地提交新的索引，未修改的子句不会被重新序列化；
+        文件中的垃圾行过多时整体压缩一次。保存到其他路径时完整写出。
+        """
+        if self.store is not None and os.path.abspath(save_file_path) == os.path.abspath(self.store.file_path) and not with_window:
+            offsets = [self.data.offset_of(i) for i in range(len(self.data))]
+            dirty = [i for i, offset in enumerate(offsets) if offset is None]
+            if dirty:
+                lines = [json.dumps(self.data[i].to_storage_dict(), ensure_ascii=False).encode("utf-8") for i in dirty]
+                for i, offset in zip(dirty, self.store.append_lines(lines)):
+                    offsets[i] = offset
+                    self.data[i]._offset = offset
+            if offsets != self.store.offsets.tolist():
+                self.store.commit_index(offsets)
+            # 快照可能仍引用旧行，存在快照时不压缩
+            if self.store.needs_compaction() and not self._has_snapshots():
+                self.data.rebind(self.store.rewrite(list(self._jsonl_lines())))
+            return
+        _write_jsonl(save_file_path, self._jsonl_lines(with_window))
+
+    def save_date(self, save_file_path: str | None = None, with_window: bool = False):
+        """
+        保存数据到文件，根据后缀选择格式：.jsonl为JSONL + 偏移索引，其余为JSON数组
+
+        Args:
+            save_file_path: 保存路径，为空时覆盖加载时的文件
+            with_window: 为True时导出带[上文]/[当前]/[下文]的可视化窗口，否则只保存每条子句本身
+        """
+        try:
+            self._refresh_all()
+            save_file_path = save_file_path if save_file_path else self.file_path
+            if save_file_path.endswith(".jsonl"):
+                self._save_jsonl(save_file_path, with_window)
+                return True
+            if with_window:
+                _data = [item.read_all_vis() for item in self.data]
+            else:
+                _data = [item.to_storage_dict() for item in self.data]
+            # 先写临时文件再替换，保存中途出错时不会留下截断的步骤文件
+            temp_path = save_file_path + ".tmp"
+            with open(temp_path, 'w', encoding="utf-8") as f:
+                json.dump(_data, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, save_file_path)
+        except Exception as e:
+            raise RuntimeError(f"保存数据到文件时出错：{e}")
+        return True
+
+
+def _write_jsonl(save_file_path: str, lines) -> None:
+    """
+    将JSONL字节串完整写出到新的JSONL + 偏移索引文件
+    """
+    for path in (save_file_path, save_file_path + ".idx"):
+        if os.path.exists(path):
+            os.remove(path)
+    _store = JsonlIndexStore(save_file_path)
+    _store.rewrite(lines)
+    _store.close()
+
+
+class SentencesSnapshot:
+    """
+    SentencesJsonListCrud某一时刻的只读快照，由SentencesJsonListCrud.snapshot创建
+
+    快照与原列表共享子句对象，原列表修改某个子句前会把写入前的副本放入_overrides，
+    因此快照读取到的始终是拍摄时的内容；上下文窗口与id均由快照自己的顺序计算
+    """
+    def __init__(self, items: List[Any], epoch: int, Windows_Size: int, store: JsonlIndexStore | None = None) -> None:
+        self._items = items
+        self.epoch = epoch
+        self.WINDOWS_SIZE = Windows_Size
+        self.store = store
+        # 原列表中被修改过的子句 -> 修改前的副本
+        self._overrides: Dict[JsonObjCrud, JsonObjCrud] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _item(self, list_num: int) -> JsonObjCrud:
+        item = self._items[list_num]
+        if type(item) is _Unloaded:
+            # 拍摄时尚未加载的子句在此之后不会被原列表覆盖，直接从存储中解析
+            _item = JsonObjCrud()
+            _item.write_all(self.store.read_record(item.offset))
+            self._items[list_num] = item = _item
+        return self._overrides.get(item, item)
+
+    def window_of(self, list_num: int) -> Dict[str, Any]:
+        """
+        按快照中的顺序计算上下文窗口，规则与SentencesJsonListCrud.window_of一致
+        """
+        start = max(0, list_num - self.WINDOWS_SIZE)
+        end = min(len(self._items), list_num + self.WINDOWS_SIZE + 1)
+        _sentence = [self._item(j).read_origin_sub_sentence() for j in range(start, end)]
+        _sentence[list_num - start] = self._item(list_num).read_sub_sentence()
+        return {"now_flag": list_num - start, "sentence": _sentence}
+
+    def _view(self, list_num: int) -> JsonObjCrud:
+        """
+        生成带快照窗口与id的临时视图，不修改共享的子句
+        """
+        _view = copy.copy(self._item(list_num))
+        _view.Sentence = self.window_of(list_num)
+        _view.id = list_num
+        return _view
+
+    def read(self, list_num: int) -> Dict[str, Any]:
+        """
+        读取指定id的句子，格式与SentencesJsonListCrud.read一致
+        """
+        if list_num < 0:
+            list_num += len(self._items)
+        return self._view(list_num).read_all()
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        """
+        读取所有项
+        """
+        return [self.read(i) for i in range(len(self._items))]
+
+    def save_date(self, save_file_path: str, with_window: bool = False) -> bool:
+        """
+        将快照保存到文件，格式由后缀决定，与SentencesJsonListCrud.save_date一致
+        """
+        try:
+            _views = (self._view(i) for i in range(len(self._items)))
+            _data = [_view.read_all_vis() if with_window else _view.to_storage_dict() for _view in _views]
+            if save_file_path.endswith(".jsonl"):
+                _write_jsonl(save_file_path, (json.dumps(_dict, ensure_ascii=False).encode("utf-8") for _dict in _data))
+            else:
+                _write_atomic(save_file_path, json.dumps(_data, ensure_ascii=False, indent=4).encode("utf-8"))
+        except Exception as e:
+            raise RuntimeError(f"保存快照到文件时出错：{e}")
+        return True
+
+
+def convert_step_file(src_path: str, dst_path: str, Windows_Size: int = 3, with_window: bool = False) -> bool:
+    """
+    在JSON数组与JSONL + 偏移索引两种格式之间转换步骤文件，格式由文件后缀决定
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 目标文件路径
+        Windows_Size: 上下文窗口大小，仅在with_window为True时有意义
+        with_window: 是否导出可视化窗口
+    Returns:
+        处理结果
+    """
+    crud = SentencesJsonListCrud(src_path, Windows_Size=Windows_Size)
+    return crud.save_date(dst_path, with_window=with_window)
+
 if __name__ == "__main__":
     crud = SentencesJsonListCrud("examples/example1/final.json")
     print(crud.read_all())
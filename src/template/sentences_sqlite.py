@@ -0,0 +1,424 @@
+"""
+句子列表的SQLite存储引擎
+
+与SentencesJsonListCrud提供相同的公开接口（create/read/update/delete/save_date/load_data），
+但子句保存在SQLite数据库中，内存中不保留任何子句，适合整本书规模的语料。
+数据库使用WAL模式，多个管线进程与编辑器可以同时读写同一本书；上下文窗口通过区间查询按需计算。
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from src.template.BaseClassTemp.BaseClass import BaseJsonListCrud, SentenceKeys
+    from src.template.sentences_json import SentencesJsonListCrud
+except:
+    from BaseClassTemp.BaseClass import BaseJsonListCrud, SentenceKeys
+    from sentences_json import SentencesJsonListCrud
+
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentences (
+    uid INTEGER PRIMARY KEY AUTOINCREMENT,
+    pos INTEGER NOT NULL,
+    class TEXT,
+    sub_sentence TEXT,
+    origin_sub_sentence TEXT,
+    role TEXT,
+    style TEXT,
+    describe_extra TEXT,
+    duration_begin NUMERIC,
+    duration_end NUMERIC,
+    speaker_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sentences_pos ON sentences(pos);
+CREATE INDEX IF NOT EXISTS idx_sentences_class ON sentences(class, pos);
+CREATE INDEX IF NOT EXISTS idx_sentences_role ON sentences(role, pos);
+CREATE INDEX IF NOT EXISTS idx_sentences_speaker ON sentences(speaker_id, pos);
+"""
+
+_COLUMNS = "pos, class, sub_sentence, origin_sub_sentence, role, style, describe_extra, duration_begin, duration_end, speaker_id"
+
+# update的键名与数据库列的对应关系
+_KEY_COLUMNS = {
+    "class": "class",
+    "sub_sentence": "sub_sentence",
+    "origin_sub_sentence": "origin_sub_sentence",
+    "role": "role",
+    "style": "style",
+    "duration_begin": "duration_begin",
+    "duration_end": "duration_end",
+    "speaker_id": "speaker_id",
+}
+
+
+def _row_of(pos: int, item: Dict[str, Any]) -> tuple:
+    """
+    将一条子句字典转换为数据库行，字段缺省规则与JsonObjCrud.write_all一致
+    """
+    describe = item.get("describe") or {}
+    extra = {key: value for key, value in describe.items() if key not in ("role", "style")}
+    return (
+        pos,
+        item.get("class", "旁白"),
+        item["sub_sentence"],
+        item.get("origin_sub_sentence", item["sub_sentence"]),
+        describe.get("role"),
+        describe.get("style"),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+        item.get("duration_begin"),
+        item.get("duration_end"),
+        item.get("speaker_id"),
+    )
+
+
+class SentencesSqliteListCrud(BaseJsonListCrud):
+    """句子列表CRUD类，SQLite存储引擎"""
+    def __init__(self, file_path: Optional[str] = None, Windows_Size: int = 3, timeout: float = 30.0) -> None:
+        self.WINDOWS_SIZE = Windows_Size
+        # 其他进程持有写锁时的最长等待时间，单位秒
+        self.timeout = timeout
+        self._conn: sqlite3.Connection | None = None
+        # 嵌套的batch层数，只有最外层负责提交
+        self._batch_depth = 0
+        self._batch_failed = False
+        # 未指定数据库时使用内存数据库，传入.json/.jsonl步骤文件时将其导入内存数据库
+        step_file = file_path if file_path and not file_path.endswith(SQLITE_SUFFIXES) else None
+        super().__init__(":memory:" if file_path is None or step_file else file_path)
+        if self._conn is None:
+            self.load_data()
+        if step_file:
+            self.load_data(step_file)
+
+    def _connect(self, file_path: str) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = sqlite3.connect(file_path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def batch(self) -> Iterator['SentencesSqliteListCrud']:
+        """
+        将多次修改合并为一个事务，例如：
+            with crud.batch():
+                for ...: crud.update(...)
+        事务中任何一层出错时整体回滚，即使错误在内层被捕获，最外层也不会提交
+        """
+        if self._batch_depth == 0:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._batch_failed = False
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_failed = True
+            raise
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._conn.execute("ROLLBACK" if self._batch_failed else "COMMIT")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self) -> int:
+        """
+        返回列表长度
+        """
+        return self._conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0]
+
+    def _normalize(self, list_num: int) -> int:
+        length = len(self)
+        if list_num < 0:
+            list_num += length
+        if not 0 <= list_num < length:
+            raise IndexError(f"id {list_num} 越界，当前长度为 {length}")
+        return list_num
+
+    def window_of(self, list_num: int) -> Dict[str, Any]:
+        """
+        通过区间查询计算上下文窗口，窗口为前后各WINDOWS_SIZE个原始子句，当前句使用子句
+
+        Returns:
+            {"now_flag": 当前句在窗口中的位置, "sentence": 子句列表}
+        """
+        rows = self._conn.execute(
+            "SELECT pos, sub_sentence, origin_sub_sentence FROM sentences WHERE pos BETWEEN ? AND ? ORDER BY pos",
+            (list_num - self.WINDOWS_SIZE, list_num + self.WINDOWS_SIZE),
+        ).fetchall()
+        start = rows[0][0]
+        return {"now_flag": list_num - start, "sentence": [row[1] if row[0] == list_num else row[2] for row in rows]}
+
+    def _to_dict(self, row: tuple, window: Dict[str, Any] | None) -> Dict[str, Any]:
+        pos, class_name, sub_sentence, origin_sub_sentence, role, style, describe_extra, duration_begin, duration_end, speaker_id = row
+        describe = {"role": role, "style": style}
+        if describe_extra:
+            describe.update(json.loads(describe_extra))
+        return {
+            "id": pos,
+            "class": class_name,
+            "sentence": window,
+            "sub_sentence": sub_sentence,
+            "origin_sub_sentence": origin_sub_sentence,
+            "describe": describe,
+            "duration_begin": duration_begin,
+            "duration_end": duration_end,
+            "speaker_id": speaker_id,
+        }
+
+    def load_data(self, file_path: Optional[str] = None) -> bool:
+        """
+        打开数据库；传入.json/.jsonl步骤文件时，在一个事务内将其全部导入当前数据库，替换原有内容
+        """
+        if file_path and not file_path.endswith(SQLITE_SUFFIXES):
+            try:
+                if self._conn is None:
+                    self._connect(self.file_path or ":memory:")
+                source = SentencesJsonListCrud(file_path, Windows_Size=self.WINDOWS_SIZE)
+                with self.batch():
+                    self._conn.execute("DELETE FROM sentences")
+                    self._conn.executemany(f"INSERT INTO sentences ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                           (_row_of(i, item.to_storage_dict()) for i, item in enumerate(source.data)))
+            except Exception as e:
+                print(f"导入步骤文件时出错：{e}")
+                return False
+            return True
+        if file_path:
+            self.file_path = file_path
+        try:
+            self._connect(self.file_path)
+        except Exception as e:
+            print(f"打开SQLite数据库时出错：{e}")
+            return False
+        return True
+
+    def read(self, list_num: int) -> Dict[str, Any]:
+        """
+        读取指定id的句子
+        Args:
+            list_num: 要读取的id
+        Returns:
+            id对应的句子
+        """
+        list_num = self._normalize(list_num)
+        row = self._conn.execute(f"SELECT {_COLUMNS} FROM sentences WHERE pos = ?", (list_num,)).fetchone()
+        return self._to_dict(row, self.window_of(list_num))
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        """
+        读取所有项，顺序扫描一遍并用滑动窗口计算上下文
+        Returns:
+            所有项的字典
+        """
+        rows = self._conn.execute(f"SELECT {_COLUMNS} FROM sentences ORDER BY pos").fetchall()
+        result = []
+        for i, row in enumerate(rows):
+            start, end = max(0, i - self.WINDOWS_SIZE), min(len(rows), i + self.WINDOWS_SIZE + 1)
+            _sentence = [rows[j][3] for j in range(start, end)]
+            _sentence[i - start] = row[2]
+            result.append(self._to_dict(row, {"now_flag": i - start, "sentence": _sentence}))
+        return result
+
+    def find(self, class_name: str | List[str] | None = ..., role: str | List[str] | None = ..., speaker_id: str | List[str] | None = ...) -> List[int]:
+        """
+        按class、describe.role、speaker_id查询子句，走数据库索引，条件语义与SentencesJsonListCrud.find一致
+
+        Returns:
+            命中子句的下标，升序排列
+        """
+        where, params = [], []
+        for column, values in (("class", class_name), ("role", role), ("speaker_id", speaker_id)):
+            if values is ...:
+                continue
+            values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+            _terms = [f"{column} IS NULL" for value in values if value is None]
+            _values = [value for value in values if value is not None]
+            if _values:
+                _terms.append(f"{column} IN ({', '.join('?' * len(_values))})")
+                params.extend(_values)
+            where.append("(" + " OR ".join(_terms) + ")")
+        sql = "SELECT pos FROM sentences" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY pos"
+        return [row[0] for row in self._conn.execute(sql, params)]
+
+    def update(self, list_num: int, key_name: SentenceKeys | str, value: str | Dict[str, Any], flag: int | None = None) -> bool:
+        """
+        更新项的指定键值，窗口由查询计算，不能直接更新sentence，返回False，与SentencesJsonListCrud.update一致
+
+        Args:
+            key_name: 要更新的键名
+            value: 新值
+
+        Returns:
+            处理结果
+        """
+        try:
+            list_num = self._normalize(list_num)
+            if key_name == "sentence":
+                print("窗口由查询实时计算，不能直接更新sentence")
+                return False
+            with self.batch():
+                if key_name == "describe":
+                    _, _, _, _, role, style, describe_extra, _, _, _ = _row_of(list_num, {"sub_sentence": None, "describe": value})
+                    self._conn.execute("UPDATE sentences SET role = ?, style = ?, describe_extra = ? WHERE pos = ?", (role, style, describe_extra, list_num))
+                elif key_name in _KEY_COLUMNS:
+                    self._conn.execute(f"UPDATE sentences SET {_KEY_COLUMNS[key_name]} = ? WHERE pos = ?", (value, list_num))
+                else:
+                    print(f"键 {key_name} 不存在")
+                    return False
+        except Exception as e:
+            # 处于外层事务中时交给外层batch回滚
+            if self._batch_depth:
+                raise
+            print(f"更新键 {key_name} 时出错：{e}")
+            return False
+        return True
+
+    def update_all(self, list_num: int, item: Dict[str, Any]) -> bool:
+        """
+        更新指定id的所有键值
+
+        Args:
+            list_num: 要更新的id
+            item: 包含新值的项数据
+
+        Returns:
+            处理结果
+        """
+        try:
+            list_num = self._normalize(list_num)
+            row = _row_of(list_num, item)
+            with self.batch():
+                self._conn.execute("UPDATE sentences SET class = ?, sub_sentence = ?, origin_sub_sentence = ?, role = ?, style = ?, describe_extra = ?, duration_begin = ?, duration_end = ?, speaker_id = ? WHERE pos = ?",
+                                   row[1:] + (list_num,))
+        except Exception as e:
+            # 处于外层事务中时交给外层batch回滚
+            if self._batch_depth:
+                raise
+            print(f"更新项 {list_num} 时出错：{e}")
+            return False
+        return True
+
+    def replace_range(self, start: int, stop: int, items: List[Dict[str, Any]]) -> bool:
+        """
+        将[start, stop)区间的项一次性替换为新项，之后的项整体平移，在一个事务内完成
+
+        Args:
+            start: 区间起点
+            stop: 区间终点（不包含）
+            items: 新项数据列表，可以为空，即删除整个区间
+        Returns:
+            处理结果
+        """
+        try:
+            with self.batch():
+                start, stop, _ = slice(start, stop).indices(len(self))
+                stop = max(start, stop)
+                self._conn.execute("DELETE FROM sentences WHERE pos >= ? AND pos < ?", (start, stop))
+                shift = len(items) - (stop - start)
+                if shift:
+                    self._conn.execute("UPDATE sentences SET pos = pos + ? WHERE pos >= ?", (shift, stop))
+                self._conn.executemany(f"INSERT INTO sentences ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       (_row_of(start + i, item) for i, item in enumerate(items)))
+        except Exception as e:
+            # 处于外层事务中时交给外层batch回滚
+            if self._batch_depth:
+                raise
+            print(f"替换区间 [{start}, {stop}) 时出错：{e}")
+            return False
+        return True
+
+    def delete(self, list_num: int) -> bool:
+        """
+        删除指定id的项
+
+        Args:
+            list_num: 要删除的id
+
+        Returns:
+            处理结果
+        """
+        try:
+            with self.batch():
+                list_num = self._normalize(list_num)
+                self.replace_range(list_num, list_num + 1, [])
+        except Exception as e:
+            # 处于外层事务中时交给外层batch回滚
+            if self._batch_depth:
+                raise
+            print(f"删除项 {list_num} 时出错：{e}")
+            return False
+        return True
+
+    def create(self, list_num: int | None, item: Dict[str, Any]) -> bool:
+        """
+        创建新项并返回结果，list_num为0、None或越界时追加到末尾，与SentencesJsonListCrud.create一致
+
+        Args:
+            item: 要创建的项数据
+
+        Returns:
+            处理结果
+        """
+        try:
+            with self.batch():
+                length = len(self)
+                if not (list_num and 0 <= list_num < length):
+                    list_num = length
+                return self.replace_range(list_num, list_num, [item])
+        except Exception as e:
+            if self._batch_depth:
+                raise
+            print(f"创建项时出错：{e}")
+            return False
+
+    def create_many(self, list_num: int | None, items: List[Dict[str, Any]]) -> bool:
+        """
+        在list_num处连续插入多个新项，list_num为None或越界时追加到末尾
+        """
+        try:
+            with self.batch():
+                length = len(self)
+                if list_num is None or not 0 <= list_num < length:
+                    list_num = length
+                return self.replace_range(list_num, list_num, items)
+        except Exception as e:
+            if self._batch_depth:
+                raise
+            print(f"批量创建项时出错：{e}")
+            return False
+
+    def save_date(self, save_file_path: str | None = None, with_window: bool = False) -> bool:
+        """
+        每次修改在事务提交时即已落盘；指定路径时导出副本，格式由后缀决定：
+        .db/.sqlite为数据库备份，.json/.jsonl为步骤文件
+
+        Args:
+            save_file_path: 导出路径，为空时只做一次WAL检查点
+            with_window: 导出步骤文件时是否带可视化窗口
+        """
+        try:
+            if not save_file_path or os.path.abspath(save_file_path) == os.path.abspath(self.file_path):
+                self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                return True
+            if save_file_path.endswith(SQLITE_SUFFIXES):
+                target = sqlite3.connect(save_file_path)
+                with target:
+                    self._conn.backup(target)
+                target.close()
+                return True
+            _data = SentencesJsonListCrud(Windows_Size=self.WINDOWS_SIZE)
+            _data.create_many(None, self.read_all())
+            return _data.save_date(save_file_path, with_window=with_window)
+        except Exception as e:
+            raise RuntimeError(f"保存数据到文件时出错：{e}")
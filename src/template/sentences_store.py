@@ -0,0 +1,445 @@
+"""
+句子列表的存储层
+
+提供两部分功能：
+1. RecordList：SentencesJsonListCrud.data使用的列表容器，支持未加载的占位元素，访问时才解析；
+   底层为分块列表ChunkedList，中间插入、删除与区间替换只移动一个块内的元素；
+2. JsonlIndexStore：JSONL + 偏移索引的落盘格式，每行一条子句，旁边的.idx文件按列表顺序记录每条子句的字节偏移，
+   借助mmap可以只解析需要的那一条，追加时也无需重写整个文件。
+"""
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from collections.abc import MutableSequence
+import json
+import mmap
+import os
+import struct
+
+
+class _Unloaded:
+    """
+    未加载元素的占位符，记录其在JSONL文件中的字节偏移
+    """
+    __slots__ = ("offset",)
+
+    def __init__(self, offset: int) -> None:
+        self.offset = offset
+
+
+class JsonlIndexStore:
+    """
+    JSONL + 偏移索引存储
+
+    data.jsonl      每行一条子句的JSON，修改过的子句追加在文件末尾，旧行成为垃圾，定期压缩清理
+    data.jsonl.idx  头部(魔数, 数据文件inode, 已提交的数据长度, 数据文件总行数) + 按列表顺序排列的uint64字节偏移
+
+    崩溃安全：数据只追加并fsync，之后索引通过临时文件 + rename原子替换；
+    崩溃时未提交的追加行不会被索引引用，重新打开后仍是上一次提交的状态。
+    """
+    MAGIC = b"SJIDX002"
+    HEADER = struct.Struct("<8sQQQ")
+
+    def __init__(self, file_path: str, compact_ratio: float = 2.0, compact_min_lines: int = 64) -> None:
+        self.file_path = file_path
+        self.index_path = file_path + ".idx"
+        # 文件总行数超过存活行数的compact_ratio倍时触发压缩
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+        self.offsets = array("Q")
+        self.total_lines = 0
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self.open()
+
+    def open(self) -> None:
+        """
+        打开文件并读取索引；索引缺失，或数据文件被替换、截断时，扫描换行符重建（只扫描，不解析JSON）
+        """
+        self.close()
+        if not os.path.exists(self.file_path):
+            open(self.file_path, "wb").close()
+        self._file = open(self.file_path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else None
+        if not self._read_index(stat):
+            self.offsets = self._scan_offsets()
+            self.total_lines = len(self.offsets)
+            self.commit_index(self.offsets)
+
+    def _read_index(self, stat: os.stat_result) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+        if len(raw) < self.HEADER.size:
+            return False
+        magic, inode, committed_size, total_lines = self.HEADER.unpack_from(raw)
+        if magic != self.MAGIC or inode != stat.st_ino or stat.st_size < committed_size:
+            return False
+        self.offsets = array("Q")
+        self.offsets.frombytes(raw[self.HEADER.size:])
+        self.total_lines = total_lines
+        return True
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _scan_offsets(self) -> array:
+        offsets, position = array("Q"), 0
+        if self._mmap is None:
+            return offsets
+        size = len(self._mmap)
+        while position < size:
+            end = self._mmap.find(b"\n", position)
+            end = size if end == -1 else end
+            if end > position:
+                offsets.append(position)
+            position = end + 1
+        return offsets
+
+    def commit_index(self, offsets: Iterable[int]) -> None:
+        """
+        原子地提交新的索引，提交之后追加的数据才对重新打开的读者可见
+        """
+        self.offsets = offsets if isinstance(offsets, array) else array("Q", offsets)
+        stat = os.stat(self.file_path)
+        _write_atomic(self.index_path, self.HEADER.pack(self.MAGIC, stat.st_ino, stat.st_size, self.total_lines) + self.offsets.tobytes())
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def read_raw(self, offset: int) -> bytes:
+        """
+        读取偏移处的一行原始字节，不解析
+        """
+        end = self._mmap.find(b"\n", offset)
+        return self._mmap[offset:end if end != -1 else len(self._mmap)]
+
+    def read_record(self, offset: int) -> Dict[str, Any]:
+        """
+        只解析偏移处的一条子句
+        """
+        return json.loads(self.read_raw(offset))
+
+    def append_lines(self, lines: Iterable[bytes]) -> List[int]:
+        """
+        在文件末尾追加若干行并fsync，不修改索引，也不重写已有内容
+
+        Args:
+            lines: 每条子句的JSON字节串，不含换行
+        Returns:
+            每行的字节偏移
+        """
+        offsets = []
+        with open(self.file_path, "ab") as f:
+            position = f.tell()
+            for line in lines:
+                offsets.append(position)
+                f.write(line)
+                f.write(b"\n")
+                position += len(line) + 1
+            f.flush()
+            os.fsync(f.fileno())
+        self.total_lines += len(offsets)
+        self._remap()
+        return offsets
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        在列表末尾追加一条子句并提交索引，不重写已有内容
+
+        Returns:
+            新子句的字节偏移
+        """
+        offset = self.append_lines([json.dumps(record, ensure_ascii=False).encode("utf-8")])[0]
+        self.offsets.append(offset)
+        self.commit_index(self.offsets)
+        return offset
+
+    def needs_compaction(self) -> bool:
+        """
+        垃圾行（被修改或删除的旧版本）过多时需要压缩
+        """
+        return self.total_lines >= self.compact_min_lines and self.total_lines > self.compact_ratio * len(self.offsets)
+
+    def rewrite(self, lines: Iterable[bytes]) -> array:
+        """
+        按给定顺序原子地重写整个文件与索引，同时清理所有垃圾行
+
+        Args:
+            lines: 每条子句的JSON字节串，不含换行
+        Returns:
+            新的偏移数组
+        """
+        offsets, position = array("Q"), 0
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            for line in lines:
+                offsets.append(position)
+                f.write(line)
+                f.write(b"\n")
+                position += len(line) + 1
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        # 新文件的inode与旧索引不一致，rename之后、索引提交之前崩溃时，重新打开会扫描新文件重建索引
+        os.replace(temp_path, self.file_path)
+        self.total_lines = len(offsets)
+        self.commit_index(offsets)
+        self.open()
+        return offsets
+
+    def _remap(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_atomic(file_path: str, content: bytes) -> None:
+    """
+    先写临时文件并fsync，再rename覆盖目标文件，保证目标文件要么是旧内容要么是新内容
+    """
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+
+class ChunkedList(MutableSequence):
+    """
+    分块列表：元素按顺序分散在若干个不超过2 * CHUNK_SIZE的块中，
+    中间插入、删除只移动所在块内的元素，区间替换只重切首尾两个块，块起始下标在下一次定位时才重算
+    """
+    CHUNK_SIZE = 512
+
+    def __init__(self, items: Iterable[Any] = ()) -> None:
+        self._chunks: List[List[Any]] = self._cut(list(items)) or [[]]
+        self._len = sum(len(chunk) for chunk in self._chunks)
+        # 每个块的起始下标，None表示块结构变化后尚未重算
+        self._starts: List[int] | None = None
+
+    def _cut(self, items: List[Any]) -> List[List[Any]]:
+        """
+        切分为大小均匀的块，不超过2 * CHUNK_SIZE时保持为一块，避免反复替换产生大量碎块
+        """
+        if len(items) <= 2 * self.CHUNK_SIZE:
+            return [items] if items else []
+        pieces = -(-len(items) // self.CHUNK_SIZE)
+        size = -(-len(items) // pieces)
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _merge_small(self, k: int) -> None:
+        """
+        第k块过小时与相邻块合并
+        """
+        if len(self._chunks) < 2 or len(self._chunks[k]) >= self.CHUNK_SIZE // 2:
+            return
+        j = k + 1 if k + 1 < len(self._chunks) else k - 1
+        if len(self._chunks[k]) + len(self._chunks[j]) <= 2 * self.CHUNK_SIZE:
+            lo = min(k, j)
+            self._chunks[lo:lo + 2] = [self._chunks[lo] + self._chunks[lo + 1]]
+
+    def _locate(self, index: int) -> tuple:
+        """
+        定位下标所在的块及块内偏移，index等于长度时定位到最后一个块的末尾
+        """
+        if index < 0:
+            index += self._len
+        if not 0 <= index <= self._len:
+            raise IndexError("list index out of range")
+        if index == self._len:
+            return len(self._chunks) - 1, len(self._chunks[-1])
+        if self._starts is None:
+            self._starts = list(accumulate(map(len, self._chunks), initial=0))
+        k = bisect_right(self._starts, index) - 1
+        return k, index - self._starts[k]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: int) -> Any:
+        starts = self._starts
+        if starts is not None and 0 <= index < self._len:
+            # 快速路径：块起始下标有效时直接二分定位
+            k = bisect_right(starts, index) - 1
+            return self._chunks[k][index - starts[k]]
+        if index == self._len:
+            raise IndexError("list index out of range")
+        k, offset = self._locate(index)
+        return self._chunks[k][offset]
+
+    def slice(self, start: int, stop: int) -> List[Any]:
+        """
+        取出[start, stop)区间的元素，只定位一次
+        """
+        if start >= stop:
+            return []
+        k, offset = self._locate(start)
+        result = self._chunks[k][offset:offset + stop - start]
+        while len(result) < stop - start:
+            k += 1
+            result.extend(self._chunks[k][:stop - start - len(result)])
+        return result
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        if index == self._len:
+            raise IndexError("list assignment index out of range")
+        k, offset = self._locate(index)
+        self._chunks[k][offset] = value
+
+    def __delitem__(self, index: int) -> None:
+        if index == self._len:
+            raise IndexError("list assignment index out of range")
+        k, offset = self._locate(index)
+        del self._chunks[k][offset]
+        if not self._chunks[k] and len(self._chunks) > 1:
+            del self._chunks[k]
+        else:
+            self._merge_small(k)
+        self._len -= 1
+        self._starts = None
+
+    def insert(self, index: int, value: Any) -> None:
+        index = min(max(index + self._len if index < 0 else index, 0), self._len)
+        k, offset = self._locate(index)
+        chunk = self._chunks[k]
+        chunk.insert(offset, value)
+        if len(chunk) > 2 * self.CHUNK_SIZE:
+            self._chunks[k:k + 1] = [chunk[:self.CHUNK_SIZE], chunk[self.CHUNK_SIZE:]]
+        self._len += 1
+        self._starts = None
+
+    def append(self, value: Any) -> None:
+        chunk = self._chunks[-1]
+        if len(chunk) >= 2 * self.CHUNK_SIZE:
+            chunk = []
+            self._chunks.append(chunk)
+            self._starts = None
+        elif self._starts is not None:
+            # 末尾追加只改变总长度
+            self._starts[-1] += 1
+        chunk.append(value)
+        self._len += 1
+
+    def splice(self, start: int, stop: int, values: Iterable[Any]) -> None:
+        """
+        将[start, stop)区间替换为values，代价与首尾两个块的大小及values的长度成正比
+        """
+        k1, offset1 = self._locate(start)
+        k2, offset2 = self._locate(max(stop, start))
+        values = list(values)
+        merged = self._chunks[k1][:offset1] + values + self._chunks[k2][offset2:]
+        self._len += len(values) - (max(stop, start) - start)
+        new_chunks = self._cut(merged)
+        self._chunks[k1:k2 + 1] = new_chunks
+        if not self._chunks:
+            self._chunks = [[]]
+        elif len(new_chunks) == 1:
+            self._merge_small(k1)
+        self._starts = None
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self._chunks:
+            yield from chunk
+
+
+class RecordList(ChunkedList):
+    """
+    句子列表容器，行为与list一致，但允许元素以未加载的占位形式存在，第一次访问时才通过loader解析
+    """
+    def __init__(self, items: Iterable[Any] = (), loader: Callable[[int, Dict[str, Any], int], Any] | None = None, store: JsonlIndexStore | None = None) -> None:
+        super().__init__(items)
+        self._loader = loader
+        self.store = store
+
+    @classmethod
+    def from_store(cls, store: JsonlIndexStore, loader: Callable[[int, Dict[str, Any], int], Any]) -> 'RecordList':
+        """
+        基于JSONL存储创建全部未加载的列表，代价只与索引大小有关
+        """
+        return cls((_Unloaded(offset) for offset in store.offsets), loader, store)
+
+    _raw = ChunkedList.__getitem__
+
+    def _load(self, index: int) -> Any:
+        item = self._raw(index)
+        if type(item) is _Unloaded:
+            item = self._loader(index, self.store.read_record(item.offset), item.offset)
+            self[index] = item
+        return item
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return [self._load(i) for i in range(start, stop, step)]
+            items = self.slice(start, stop)
+            for i, item in enumerate(items):
+                if type(item) is _Unloaded:
+                    items[i] = self._load(start + i)
+            return items
+        starts = self._starts
+        if starts is not None and 0 <= index < self._len:
+            k = bisect_right(starts, index) - 1
+            item = self._chunks[k][index - starts[k]]
+            if type(item) is not _Unloaded:
+                return item
+        if index < 0:
+            index += self._len
+        return self._load(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._len):
+            yield self[i]
+
+    def raw_items(self) -> List[Any]:
+        """
+        按顺序返回所有元素的引用，未加载的元素保持占位形式
+        """
+        return list(ChunkedList.__iter__(self))
+
+    def peek(self, index: int) -> Any | None:
+        """
+        读取元素但不触发加载，未加载时返回None
+        """
+        item = self._raw(index)
+        return None if type(item) is _Unloaded else item
+
+    def is_loaded(self, index: int) -> bool:
+        return type(self._raw(index)) is not _Unloaded
+
+    def raw_offset(self, index: int) -> int | None:
+        """
+        未加载元素在存储文件中的偏移，已加载时返回None
+        """
+        item = self._raw(index)
+        return item.offset if type(item) is _Unloaded else None
+
+    def offset_of(self, index: int) -> int | None:
+        """
+        元素最近一次落盘的偏移，未加载的元素一定是干净的；已加载且被修改过的元素返回None
+        """
+        item = self._raw(index)
+        return item.offset if type(item) is _Unloaded else getattr(item, "_offset", None)
+
+    def rebind(self, offsets: array) -> None:
+        """
+        存储文件按列表顺序重写后，更新所有元素的落盘偏移
+        """
+        for i, item in enumerate(ChunkedList.__iter__(self)):
+            if type(item) is _Unloaded:
+                item.offset = offsets[i]
+            else:
+                item._offset = offsets[i]
+
+    def __repr__(self) -> str:
+        return f"RecordList({self._len} items, {sum(1 for item in ChunkedList.__iter__(self) if type(item) is not _Unloaded)} loaded)"
@@ -1,16 +1,15 @@
-import requests
 import json
 import argparse
 import os
 import tempfile
-import soundfile as sf
-import numpy as np
 
 # 服务端地址
 SERVER_URL = "http://localhost:15376/generate"
 
 def generate_audio(text, prompt_text, prompt_wav, class_name):
     """生成单个音频文件"""
+    # 只有真正请求服务端时才需要requests
+    import requests
     data = {
         "text": text,
         "prompts": {
@@ -39,6 +38,9 @@ def merge_wav_files(file_paths, output_path):
     """合并多个WAV文件，并在每个文件之间添加500ms静音，返回每个文件的开始时间和持续时间"""
     if not file_paths:
         return []
+    # 音频处理依赖只在合并时导入，只处理JSON时不需要加载
+    import numpy as np
+    import soundfile as sf
     
     # 读取第一个文件获取参数
     data, sample_rate = sf.read(file_paths[0])
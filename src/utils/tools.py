@@ -1,7 +1,12 @@
 import ast
 import json
 import re
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 def mapping_windows_size(windows_size: int, list_id: int, list_length: int):
     """
@@ -20,6 +25,11 @@ def mapping_windows_size(windows_size: int, list_id: int, list_length: int):
     else:
         return 2 * windows_size + 1, windows_size
 
+# 汉字、字母或数字，与str.isalnum()加上汉字范围\u4e00-\u9fff逐字符判断的结果完全一致
+_WORD_CHAR = re.compile(r'[^\W_]|[\u4e00-\u9fff]')
+# 需要解析的代词
+_PRONOUN = re.compile("他|她|它|你|我|自己|ta|您")
+
 def is_all_symbols(s: str) -> bool:
     """
     检测输入的字符串是否完全由符号组成（不含汉字、字母和数字）
@@ -30,20 +40,21 @@ def is_all_symbols(s: str) -> bool:
     返回:
         如果字符串完全由符号组成则返回True，否则返回False
     """
-    # 检查字符串是否为空
-    if not s:
-        return False  # 空字符串不视为由符号组成
-    
-    # 遍历字符串中的每个字符
-    for char in s:
-        # 判断字符是否为汉字、字母或数字
-        # 汉字的Unicode范围：\u4e00-\u9fff
-        if (char.isalnum() or  # 字母或数字
-            '\u4e00' <= char <= '\u9fff'):  # 汉字
-            return False
+    # 空字符串不视为由符号组成
+    return bool(s) and _WORD_CHAR.search(s) is None
+
+def is_all_symbols_batch(clauses: Iterable[str]) -> List[bool]:
+    """
+    is_all_symbols的批量版本，一次筛查整本书的子句
     
-    # 所有字符都不是汉字、字母或数字，即完全由符号组成
-    return True
+    参数:
+        clauses: 子句列表
+        
+    返回:
+        与clauses一一对应的布尔掩码，True表示该子句完全由符号组成，空子句或None为False
+    """
+    clauses = [s or "" for s in clauses]
+    return [bool(s) and m is None for s, m in zip(clauses, map(_WORD_CHAR.search, clauses))]
 
 def _strip_code_fences(text: str) -> str:
     """
@@ -63,6 +74,260 @@ def _strip_code_fences(text: str) -> str:
     match = re.match(pattern, text.strip())
     return match.group(1).strip() if match else text
 
+# 可作为字符串引号的字符 -> 对应的结束引号
+_JSON_QUOTES = {'"': '"', "'": "'", '“': '”', '‘': '’'}
+# 字符串外出现的全角结构符号
+_FULL_WIDTH_STRUCTURE = {'：': ':', '，': ',', '［': '[', '］': ']', '｛': '{', '｝': '}'}
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/'}
+_BARE_LITERALS = {'true': True, 'false': False, 'null': None, 'True': True, 'False': False, 'None': None}
+
+
+class _TolerantJsonParser:
+    """
+    容错的JSON解析器，逐字符解析模型输出，遇到常见的格式问题时就地修复并记录修复项
+
+    修复项:
+        extract: 丢弃JSON前后多余的文字
+        full_width_punctuation: 字符串外的全角冒号、逗号、括号
+        single_quotes / full_width_quotes: 使用单引号或全角引号包裹的字符串
+        inner_quotes: 字符串内部未转义的引号（如'…'形式的引语）
+        unquoted: 没有引号的键或值
+        trailing_comma: 多余的逗号
+        missing_comma: 缺少的逗号
+        unbalanced_brackets: 括号不配对或缺少结尾括号
+        truncated: 输出在字符串或键值对中间被截断
+    """
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.pos = 0
+        self.repairs: List[str] = []
+
+    def _repair(self, name: str) -> None:
+        if name not in self.repairs:
+            self.repairs.append(name)
+
+    def _peek(self) -> str:
+        """
+        跳过空白并返回下一个字符，全角结构符号转换为半角，到达结尾返回空字符串
+        """
+        text, pos = self.text, self.pos
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        self.pos = pos
+        if pos == len(text):
+            return ''
+        char = text[pos]
+        if char in _FULL_WIDTH_STRUCTURE:
+            self._repair('full_width_punctuation')
+            return _FULL_WIDTH_STRUCTURE[char]
+        return char
+
+    def parse(self) -> Any:
+        match = re.search(r'[\[{［｛]', self.text)
+        if match is None:
+            raise ValueError("未找到JSON数组或对象")
+        if self.text[:match.start()].strip():
+            self._repair('extract')
+        self.pos = match.start()
+        value = self._value(in_object=False)
+        if self._peek():
+            self._repair('extract')
+        return value
+
+    def _value(self, in_object: bool) -> Any:
+        char = self._peek()
+        if char == '{':
+            return self._object()
+        if char == '[':
+            return self._array()
+        if char in _JSON_QUOTES:
+            return self._string(is_key=False)
+        return self._bare(',}]' if in_object else ',]')
+
+    def _object(self) -> Dict[Any, Any]:
+        self.pos += 1
+        result: Dict[Any, Any] = {}
+        while True:
+            char = self._peek()
+            if char == '':
+                self._repair('unbalanced_brackets')
+                return result
+            if char == '}':
+                self.pos += 1
+                return result
+            if char == ']':
+                # 对象没有闭合就遇到了数组的结尾括号，交给外层数组处理
+                self._repair('unbalanced_brackets')
+                return result
+            if char == ',':
+                self._repair('trailing_comma')
+                self.pos += 1
+                continue
+            key = self._string(is_key=True) if char in _JSON_QUOTES else self._bare(':,}')
+            char = self._peek()
+            if char != ':':
+                if char == '':
+                    self._repair('truncated')
+                    return result
+                raise ValueError(f"第{self.pos}个字符处缺少冒号")
+            self.pos += 1
+            if self._peek() == '':
+                self._repair('truncated')
+                return result
+            result[key] = self._value(in_object=True)
+            char = self._peek()
+            if char == ',':
+                self.pos += 1
+                if self._peek() in ('}', ']'):
+                    self._repair('trailing_comma')
+            elif char not in '}]':
+                self._repair('missing_comma')
+
+    def _array(self) -> List[Any]:
+        self.pos += 1
+        result: List[Any] = []
+        while True:
+            char = self._peek()
+            if char == '':
+                self._repair('unbalanced_brackets')
+                return result
+            if char == ']':
+                self.pos += 1
+                return result
+            if char == '}':
+                # 多余的对象结尾括号
+                self._repair('unbalanced_brackets')
+                self.pos += 1
+                continue
+            if char == ',':
+                self._repair('trailing_comma')
+                self.pos += 1
+                continue
+            result.append(self._value(in_object=False))
+            char = self._peek()
+            if char == ',':
+                self.pos += 1
+                if self._peek() in (']', '}'):
+                    self._repair('trailing_comma')
+            elif char not in ']}':
+                self._repair('missing_comma')
+
+    def _closes_string(self, end: int, is_key: bool) -> bool:
+        """
+        判断end处的引号是否为字符串的结尾：键后面应为冒号，值后面应为逗号、括号或文本结尾
+        """
+        text = self.text
+        pos = end + 1
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos == len(text):
+            return True
+        char = _FULL_WIDTH_STRUCTURE.get(text[pos], text[pos])
+        if is_key:
+            return char == ':'
+        if char in '}]':
+            return True
+        if char != ',':
+            return False
+        # 逗号后面需要紧跟下一个键、值或括号，否则视为字符串内部的逗号
+        pos += 1
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        return pos == len(text) or text[pos] in _JSON_QUOTES or text[pos] in '{[]}' or text[pos] in _FULL_WIDTH_STRUCTURE
+
+    def _string(self, is_key: bool) -> str:
+        text = self.text
+        quote = text[self.pos]
+        close = _JSON_QUOTES[quote]
+        if quote == "'":
+            self._repair('single_quotes')
+        elif quote != '"':
+            self._repair('full_width_quotes')
+        pieces: List[str] = []
+        pos = self.pos + 1
+        while True:
+            end = pos
+            while end < len(text) and text[end] != close and text[end] != '\\':
+                end += 1
+            pieces.append(text[pos:end])
+            # 文本在字符串中途结束，或只剩一个没有转义字符的反斜杠，都按截断补上引号
+            if end >= len(text) or text[end:] == '\\':
+                self._repair('truncated')
+                self.pos = len(text)
+                return ''.join(pieces)
+            if text[end] == '\\':
+                escape = text[end + 1:end + 2]
+                if escape == 'u' and re.fullmatch(r'[0-9a-fA-F]{4}', text[end + 2:end + 6]):
+                    pieces.append(chr(int(text[end + 2:end + 6], 16)))
+                    pos = end + 6
+                else:
+                    pieces.append(_JSON_ESCAPES.get(escape, escape))
+                    pos = end + 2
+                continue
+            if self._closes_string(end, is_key):
+                self.pos = end + 1
+                return ''.join(pieces)
+            self._repair('inner_quotes')
+            pieces.append(close)
+            pos = end + 1
+
+    def _bare(self, stops: str) -> Any:
+        """
+        解析没有引号的值：数字、true/false/null或Python的True/False/None，其余按字符串处理
+        """
+        text = self.text
+        end = self.pos
+        while end < len(text) and _FULL_WIDTH_STRUCTURE.get(text[end], text[end]) not in stops and text[end] != '\n':
+            end += 1
+        word = text[self.pos:end].strip()
+        self.pos = end
+        if word in _BARE_LITERALS:
+            return _BARE_LITERALS[word]
+        try:
+            return json.loads(word)
+        except ValueError:
+            pass
+        if not word:
+            raise ValueError(f"第{end}个字符处缺少值")
+        self._repair('unquoted')
+        return word
+
+
+def decode_model_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    分层解析模型输出的JSON
+
+    解析顺序：
+    1) 去围栏后严格解析（安装了orjson时使用orjson）；
+    2) 失败则使用ast.literal_eval解析Python字面量；
+    3) 再失败使用容错解析器逐字符修复解析。
+
+    参数:
+        text: 模型输出的文本
+
+    返回:
+        (解析结果, 修复项列表)，严格解析成功时修复项为空
+
+    异常:
+        三层均失败时抛出ValueError
+    """
+    normalized = _strip_code_fences(text).strip()
+    try:
+        return (orjson.loads(normalized) if orjson is not None else json.loads(normalized)), []
+    except ValueError:
+        pass
+    if normalized[:1] in '[{':
+        try:
+            return ast.literal_eval(normalized), ['python_literal']
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            pass
+    parser = _TolerantJsonParser(normalized)
+    try:
+        value = parser.parse()
+    except RecursionError as e:
+        raise ValueError("嵌套层数过多") from e
+    return value, parser.repairs
+
 def parse_list_of_dicts(text: str) -> List[Dict[str, Any]] | bool:
     """
     解析模型输出的JSON字符串为字典列表
@@ -71,97 +336,103 @@ def parse_list_of_dicts(text: str) -> List[Dict[str, Any]] | bool:
         text: 模型输出的文本（可能包含JSON）
     
     返回:
-        解析后的字典列表
+        解析后的字典列表，无法解析时返回False
     
-    异常:
-        解析失败时抛出ValueError
-    
-
-    解析顺序：
-    1) 去围栏后尝试严格JSON解析；
-    2) 失败则使用ast.literal_eval解析Python字面量；
-    3) 再失败尝试提取首个方括号片段再JSON解析；
-    4) 尝试修复常见的格式问题后再次解析；
-    5) 最终失败抛出异常。
+    解析过程见decode_model_json，发生修复时打印修复项
     """
     if text is None:
         return False
 
-    normalized = _strip_code_fences(text).strip()
-    print(f"去围栏后: {repr(normalized)}")  # 调试信息
-
-    # 优先JSON
     try:
-        parsed = json.loads(normalized)
-        if isinstance(parsed, dict):
-            parsed = [parsed]
-        if not isinstance(parsed, list):
-            raise ValueError("Parsed JSON is not a list")
-        return [dict(item) for item in parsed]
-    except Exception as e:
-        print(f"JSON解析失败: {e}")  # 调试信息
-        pass
-
-    # 尝试Python字面量
-    try:
-        parsed_py = ast.literal_eval(normalized)
-        if isinstance(parsed_py, dict):
-            parsed_list = [parsed_py]
-        elif isinstance(parsed_py, list):
-            parsed_list = parsed_py
-        else:
-            raise ValueError("Literal is not list or dict")
-        return [dict(item) for item in parsed_list]
-    except Exception as e:
-        print(f"Python字面量解析失败: {e}")  # 调试信息
-        pass
+        parsed, repairs = decode_model_json(text)
+    except ValueError as e:
+        print(f"错误：无法解析模型输出为List[Dict]格式，跳过此内容: {e}")
+        return False
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+        print(f"错误：模型输出不是List[Dict]格式，跳过此内容: {repr(text)}")
+        return False
+    if repairs:
+        print(f"[WARN] 模型输出经过修复后解析: {', '.join(repairs)}")
+    return parsed
 
-    # 提取首个形如 [...] 的片段再尝试JSON
-    bracket_match = re.search(r"\[[\s\S]*\]", normalized)
-    if bracket_match:
-        try:
-            bracket_content = bracket_match.group(0)
-            print(f"提取括号内容: {repr(bracket_content)}")  # 调试信息
-            parsed = json.loads(bracket_content)
-            if isinstance(parsed, dict):
-                parsed = [parsed]
-            if not isinstance(parsed, list):
-                raise ValueError("Extracted JSON is not a list")
-            return [dict(item) for item in parsed]
-        except Exception as e:
-            print(f"括号内容JSON解析失败: {e}")  # 调试信息
-            pass
+class PronounAutomaton:
+    """
+    代词的Aho–Corasick自动机，一次遍历文本找出所有代词出现的位置
+    
+    同一组代词只需构建一次，可以在多个子句之间复用
+    """
+    def __init__(self, patterns: Iterable[str]) -> None:
+        # 状态转移表、失败指针与每个状态结尾处匹配到的代词
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in dict.fromkeys(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                _next = self._goto[state].get(char)
+                if _next is None:
+                    _next = len(self._goto)
+                    self._goto[state][char] = _next
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = _next
+            self._output[state].append(pattern)
+        # 按BFS顺序计算失败指针，并把失败状态的输出合并进来
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, _next in self._goto[state].items():
+                queue.append(_next)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[_next] = self._goto[fail].get(char, 0)
+                self._output[_next] = self._output[_next] + self._output[self._fail[_next]]
 
-    # 尝试修复常见格式问题
-    try:
-        # 修复缺少引号的问题
-        fixed_text = normalized
-        # 如果class和content没有引号，尝试添加
-        if '"class"' not in fixed_text and 'class' in fixed_text:
-            fixed_text = re.sub(r'class:\s*([^,}\]]+)', r'"class": "\1"', fixed_text)
-        if '"content"' not in fixed_text and 'content' in fixed_text:
-            fixed_text = re.sub(r'content:\s*([^,}\]]+)', r'"content": "\1"', fixed_text)
-        
-        print(f"修复后文本: {repr(fixed_text)}")  # 调试信息
+    def matches(self, text: str) -> Dict[int, List[str]]:
+        """
+        查找text中所有代词的出现位置
         
-        # 再次尝试JSON解析
-        parsed = json.loads(fixed_text)
-        if isinstance(parsed, dict):
-            parsed = [parsed]
-        if not isinstance(parsed, list):
-            raise ValueError("Fixed JSON is not a list")
-        return [dict(item) for item in parsed]
-    except Exception as e:
-        print(f"修复后JSON解析失败: {e}")  # 调试信息
-        pass
+        返回:
+            起始下标 -> 在该位置开始的代词列表
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        result: Dict[int, List[str]] = {}
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in output[state]:
+                result.setdefault(end - len(pattern), []).append(pattern)
+        return result
+
+_PRONOUN_AUTOMATA: Dict[frozenset, PronounAutomaton] = {}
 
-    print("错误：无法解析模型输出为List[Dict]格式，跳过此内容")
-    return False
+def _pronoun_automaton(patterns: Iterable[str]) -> PronounAutomaton:
+    """
+    按代词集合缓存自动机，模型每次返回的代词基本都在同一个小集合内
+    """
+    key = frozenset(patterns)
+    automaton = _PRONOUN_AUTOMATA.get(key)
+    if automaton is None:
+        if len(_PRONOUN_AUTOMATA) >= 256:
+            _PRONOUN_AUTOMATA.clear()
+        automaton = _PRONOUN_AUTOMATA[key] = PronounAutomaton(key)
+    return automaton
 
 def replace_ta_to_name(ta_list: List, sub_sentence: str) -> str:
     """
     代词替换：将文本中的代词（他/她/它）替换为具体角色名
     
+    从左到右扫描，每个映射只使用一次：同一位置有多个映射可用时取列表中靠前的一项，
+    因此同一个代词的多个映射按出现顺序依次对应。映射中可以带"index"字段（从0开始），
+    表示只标注该代词的第index次出现。不会修改传入的ta_list。
+    
     参数:
         ta_list: 代词-角色映射列表，格式 [{"ta": "他", "name": "张三"}, ...]
         sub_sentence: 待处理的子句文本
@@ -172,35 +443,72 @@ def replace_ta_to_name(ta_list: List, sub_sentence: str) -> str:
     if ta_list is None or len(ta_list) == 0:
         print(f"[WARN] 代词映射表为空，无法处理子句: {sub_sentence}")
         return sub_sentence
+    automaton = _pronoun_automaton(ta_item["ta"] for ta_item in ta_list)
+    return _annotate_pronouns(automaton, ta_list, sub_sentence)
+
+def replace_ta_to_name_batch(ta_lists: List[List], sub_sentences: List[str]) -> List[str]:
+    """
+    批量代词替换，对每个子句的结果与replace_ta_to_name一致，
+    所有子句共用一个包含全部代词的自动机
     
-    result = ""
-    index = 0
-    sentence_len = len(sub_sentence)
-    
-    # 遍历文本字符
-    while index < sentence_len:
-        replaced = False
-        
-        # 尝试匹配所有代词映射项
-        for ta_item in ta_list[:]:  # 使用副本遍历
-            ta_str = ta_item["ta"]
-            ta_len = len(ta_str)
-            
-            # 检查当前位置是否匹配当前代词
-            if sub_sentence.startswith(ta_str, index):
-                # 执行替换：添加角色名注释
-                result += f"{ta_str}({ta_item['name']})"
-                index += ta_len
-                ta_list.remove(ta_item)  # 移除已使用的映射
-                replaced = True
-                break
-        
-        # 未匹配到代词，直接添加当前字符
-        if not replaced:
-            result += sub_sentence[index]
-            index += 1
+    参数:
+        ta_lists: 每个子句对应的代词-角色映射列表
+        sub_sentences: 待处理的子句文本列表
     
-    return result
+    返回:
+        替换后的文本列表
+    """
+    if len(ta_lists) != len(sub_sentences):
+        raise ValueError(f"映射表数量{len(ta_lists)}与子句数量{len(sub_sentences)}不一致")
+    automaton = _pronoun_automaton(ta_item["ta"] for ta_list in ta_lists if ta_list for ta_item in ta_list)
+    return [
+        _annotate_pronouns(automaton, ta_list, sub_sentence) if ta_list else replace_ta_to_name(ta_list, sub_sentence)
+        for ta_list, sub_sentence in zip(ta_lists, sub_sentences)
+    ]
+
+def _annotate_pronouns(automaton: PronounAutomaton, ta_list: List, sub_sentence: str) -> str:
+    """
+    按自动机找到的代词位置标注角色名，automaton需包含ta_list中的全部代词
+    """
+    # 代词 -> 尚未使用的映射在列表中的序号（升序）；带index的映射单独按(代词, 第几次出现)存放
+    pending: Dict[str, List[int]] = {}
+    indexed: Dict[tuple, int] = {}
+    for order, ta_item in enumerate(ta_list):
+        if isinstance(ta_item.get("index"), int):
+            indexed.setdefault((ta_item["ta"], ta_item["index"]), order)
+        elif ta_item["ta"]:
+            pending.setdefault(ta_item["ta"], []).append(order)
+    for queue in pending.values():
+        queue.reverse()
+    pieces: List[str] = []
+    occurrences: Dict[str, int] = {}
+    last = 0
+    matches = automaton.matches(sub_sentence)
+    for begin in sorted(matches):
+        if begin < last:
+            continue
+        # 同一位置可用的映射中取列表中最靠前的一项
+        chosen = None
+        for ta in matches[begin]:
+            order = indexed.get((ta, occurrences.get(ta, 0)))
+            if order is None and pending.get(ta):
+                order = pending[ta][-1]
+            if order is not None and (chosen is None or order < chosen[1]):
+                chosen = (ta, order)
+        for ta in matches[begin]:
+            occurrences[ta] = occurrences.get(ta, 0) + 1
+        if chosen is None:
+            continue
+        ta, order = chosen
+        if indexed.get((ta, occurrences[ta] - 1)) == order:
+            del indexed[(ta, occurrences[ta] - 1)]
+        else:
+            pending[ta].pop()
+        pieces.append(sub_sentence[last:begin])
+        pieces.append(f"{ta}({ta_list[order]['name']})")
+        last = begin + len(ta)
+    pieces.append(sub_sentence[last:])
+    return "".join(pieces)
 
 def check_sub_ta(ctx: str) -> bool:
     """
@@ -212,9 +520,19 @@ def check_sub_ta(ctx: str) -> bool:
     返回:
         包含代词返回True，否则返回False
     """
-    # 定义需要检测的代词列表
-    pronouns = ["他", "她", "它", "你", "我", "自己", "ta", "您"]
-    return any(pronoun in ctx for pronoun in pronouns)
+    return _PRONOUN.search(ctx) is not None
+
+def check_sub_ta_batch(clauses: Iterable[str]) -> List[bool]:
+    """
+    check_sub_ta的批量版本，一次筛查整本书的子句
+    
+    参数:
+        clauses: 子句列表
+    
+    返回:
+        与clauses一一对应的布尔掩码，True表示该子句包含代词
+    """
+    return [m is not None for m in map(_PRONOUN.search, clauses)]
 
 def fine_grained_post_process(ctx: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -229,6 +547,31 @@ def fine_grained_post_process(ctx: Dict[str, Any]) -> Dict[str, Any]:
         sub_sentence = sub_sentence.split("\n")[-1]
     return {"text": sub_sentence, "style": ctx.get("style", None)}
 
+# 中文字符替换为英文字符，最后删除空格；模块加载时预先整理为替换序列，不再在每次调用时重建
+# 注：实测CPython的str.translate只对纯ASCII文本有快速路径，中文文本上逐字符查表反而比逐个str.replace慢数倍，
+# 因此保留按映射替换的方式，每次替换都是C层面的整块扫描
+_CHINESE_TO_ENGLISH_MAP = {
+    '。': '.', '，': ',', '！': '!', '？': '?', '：': ':', '；': ';',
+    '「': '"', '」': '"', '『': '"', '』': '"', '《': '<', '》': '>',
+    '（': '(', '）': ')', '【': '[', '】': ']', '｛': '{', '｝': '}',
+    '～': '~', '—': '-', '·': '`', '、': ',', '＂': '"', '＇': "'",
+    '＄': '$', '％': '%', '＆': '&', '＠': '@', '＃': '#', '＾': '^',
+    '＊': '*', '＋': '+', '＝': '=', '｜': '|', '＼': '\\', '／': '/',
+    '“': "'", '”': "'", "…": "..."
+}
+_PREPROCESS_REPLACEMENTS = tuple(_CHINESE_TO_ENGLISH_MAP.items()) + ((' ', ''),)
+# 流式处理时单行超过该长度且已确认非空，就先输出已读到的部分，保证内存有界
+_STREAM_MAX_PENDING = 1 << 20
+
+def _normalize_lines(text: str) -> str:
+    """
+    删除空行并完成字符替换，text中的行必须是完整的
+    """
+    text = '\n'.join(filter(str.strip, text.split('\n')))
+    for chinese_char, english_char in _PREPROCESS_REPLACEMENTS:
+        text = text.replace(chinese_char, english_char)
+    return text
+
 def preprocess_text(text: str) -> str:
     """
     对原始文本进行基础处理，包含删除空行，中文字符替换，删除空格
@@ -239,28 +582,50 @@ def preprocess_text(text: str) -> str:
     返回:
         处理后的文本
     """
-    # 1. 删除空行
-    lines = text.split('\n')
-    non_empty_lines = [line for line in lines if line.strip()]
-    text = '\n'.join(non_empty_lines)
-    
-    # 2. 中文字符替换为英文字符
-    chinese_to_english_map = {
-        '。': '.', '，': ',', '！': '!', '？': '?', '：': ':', '；': ';',
-        '「': '"', '」': '"', '『': '"', '』': '"', '《': '<', '》': '>',
-        '（': '(', '）': ')', '【': '[', '】': ']', '｛': '{', '｝': '}',
-        '～': '~', '—': '-', '·': '`', '、': ',', '＂': '"', '＇': "'",
-        '＄': '$', '％': '%', '＆': '&', '＠': '@', '＃': '#', '＾': '^',
-        '＊': '*', '＋': '+', '＝': '=', '｜': '|', '＼': '\\', '／': '/',
-        '“': "'", '”': "'", "…": "..."
-    }
-    for chinese_char, english_char in chinese_to_english_map.items():
-        text = text.replace(chinese_char, english_char)
+    return _normalize_lines(text)
+
+def preprocess_text_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    preprocess_text的流式版本，逐块处理文本，内存占用与块大小有关，与全文长度无关
     
-    # 3. 删除空格
-    text = text.replace(' ', '')
+    每次只处理到最后一个换行符为止的完整行，剩余的半行留到下一块，
+    因此块边界不会切断任何映射（包括"…"这类替换为多个字符的映射）
     
-    return text
+    参数:
+        chunks: 文本块的迭代器，可以是按行迭代的文件对象，也可以是iter(lambda: f.read(n), "")
+        
+    返回:
+        处理后文本片段的迭代器，拼接后与preprocess_text(全文)一致
+    """
+    # 是否已经输出过非空内容，决定下一行前是否需要换行
+    emitted = False
+    # 当前行是否已经输出了一部分（超长行提前输出的情况）
+    line_open = False
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        cut = pending.rfind('\n')
+        if cut == -1:
+            if len(pending) > _STREAM_MAX_PENDING and pending.strip():
+                # 超长的非空行：确认该行会被保留，先输出已读到的部分
+                yield ('\n' if emitted and not line_open else '') + _normalize_lines(pending)
+                emitted = line_open = True
+                pending = ""
+            continue
+        block, pending = pending[:cut], pending[cut + 1:]
+        if line_open:
+            # 上一块已输出了该行的开头，行的剩余部分即使是空白也属于该行
+            head, _, block = block.partition('\n')
+            yield _normalize_lines('x' + head)[1:]
+            line_open = False
+        block = _normalize_lines(block)
+        if block:
+            yield ('\n' if emitted else '') + block
+            emitted = True
+    if line_open:
+        yield _normalize_lines('x' + pending)[1:]
+    elif pending.strip():
+        yield ('\n' if emitted else '') + _normalize_lines(pending)
 
 if __name__ == "__main__":
     print(mapping_windows_size(3, 9, 10))
@@ -0,0 +1,56 @@
+"""
+SentencesJsonListCrud 批量修改基准测试
+
+模拟细粒度拆分阶段：把每个粗颗粒度句子拆成5个子句，
+对比逐条create重建新列表与replace_range原地替换两种写法的耗时。
+运行方式：python test/benchmark/bench_bulk_mutation.py [列表长度]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud
+
+
+def build(size: int) -> SentencesJsonListCrud:
+    crud = SentencesJsonListCrud(Windows_Size=3)
+    crud.create_many(None, [{"class": None, "sub_sentence": f"第{i}句，测试用的粗颗粒度句子。", "describe": {"role": None, "style": None}} for i in range(size)])
+    return crud
+
+
+def split(item, parts: int = 5):
+    return [{"class": "旁白", "sub_sentence": f"{item.read_sub_sentence()}#{j}", "origin_sub_sentence": item.read_origin_sub_sentence(), "describe": {"role": None, "style": None}} for j in range(parts)]
+
+
+def main(size: int = 20000) -> None:
+    crud = build(size)
+    begin = time.perf_counter()
+    _data = SentencesJsonListCrud(Windows_Size=3)
+    for item in crud.data:
+        for new_item in split(item):
+            _data.create(None, new_item)
+    _data.read_all()
+    rebuild = time.perf_counter() - begin
+    print(f"逐条create重建: {rebuild:.3f}s，结果 {len(_data)} 条")
+
+    crud = build(size)
+    begin = time.perf_counter()
+    _splits = [split(item) for item in crud.data]
+    for i in reversed(range(len(_splits))):
+        crud.replace_range(i, i + 1, _splits[i])
+    crud.read_all()
+    in_place = time.perf_counter() - begin
+    print(f"replace_range原地替换: {in_place:.3f}s，结果 {len(crud)} 条")
+
+    crud = build(size)
+    begin = time.perf_counter()
+    for i in range(0, size, 100):
+        crud.replace_range(size // 2, size // 2 + 1, split(crud.data[size // 2]))
+    middle = time.perf_counter() - begin
+    print(f"{size // 100}次中部单句拆分: {middle * 1e3:.1f}ms，平均 {middle / (size // 100) * 1e6:.1f}us/次")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,80 @@
+"""
+CPU推理吞吐基准测试
+
+在CPU上分别以fp32与int8动态量化加载SFT模型，用examples/eval/val.jsonl中的细粒度拆分(fine_split)请求
+做贪心解码，对比不同线程数与batch大小下的生成速度(tokens/s)，并统计int8与fp32输出一致的比例。
+需要torch与transformers，以及本地的模型权重。
+运行方式：python test/benchmark/bench_cpu_quantization.py <模型路径> [请求数] [线程数,线程数...]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.llm.server.engine import QwenEngine, configure_cpu_threads
+from src.llm.server.replicas import cpu_threads_per_worker
+from src.llm.server.scheduler import GenerationRequest
+
+VAL_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'eval', 'val.jsonl')
+BATCH_SIZES = (1, 4, 8)
+MAX_TOKENS = 256
+
+
+def load_messages(count: int):
+    """读取前count条fine_split请求，转为chat messages"""
+    messages = []
+    with open(VAL_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            if len(messages) >= count:
+                break
+            item = json.loads(line)
+            messages.append([{"role": "system", "content": item["instruct"]}, {"role": "user", "content": item["question"]}])
+    return messages
+
+
+def run(engine: QwenEngine, messages, batch_size: int):
+    """
+    返回(生成token总数, 耗时秒, 各请求输出文本)
+    """
+    texts, tokens = [], 0
+    begin = time.perf_counter()
+    for start in range(0, len(messages), batch_size):
+        requests = [GenerationRequest(messages=m, max_tokens=MAX_TOKENS, temperature=0.0, enable_thinking=False)
+                    for m in messages[start:start + batch_size]]
+        for result in engine.generate_batch(requests):
+            texts.append(result.text)
+            tokens += result.completion_tokens
+    return tokens, time.perf_counter() - begin, texts
+
+
+def main(model_path: str, count: int = 16, thread_counts=None) -> None:
+    messages = load_messages(count)
+    thread_counts = thread_counts or [cpu_threads_per_worker(["cpu"])]
+    print(f"{len(messages)}条fine_split请求，max_tokens={MAX_TOKENS}，线程数{thread_counts}")
+    outputs = {}
+    for quantize in (None, "int8"):
+        begin = time.perf_counter()
+        engine = QwenEngine(model_path, "cpu", quantize=quantize)
+        name = quantize or "fp32"
+        print(f"[{name}] 加载耗时 {time.perf_counter() - begin:.1f}s")
+        for num_threads in thread_counts:
+            configure_cpu_threads(num_threads)
+            for batch_size in BATCH_SIZES:
+                tokens, seconds, texts = run(engine, messages, batch_size)
+                outputs.setdefault(name, texts)
+                print(f"[{name}] 线程数 {num_threads:>3} batch {batch_size}: {tokens} tokens，{seconds:.1f}s，"
+                      f"{tokens / seconds:.1f} tokens/s，平均 {seconds / len(messages):.2f}s/请求")
+        del engine
+    same = sum(1 for a, b in zip(outputs["fp32"], outputs["int8"]) if a == b)
+    print(f"int8与fp32输出完全一致: {same}/{len(messages)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1],
+         int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+         [int(n) for n in sys.argv[3].split(",")] if len(sys.argv) > 3 else None)
@@ -0,0 +1,55 @@
+"""
+启动耗时基准测试
+
+在新的解释器中导入pipeline（以及TTS客户端），统计导入耗时与导入最慢的模块，
+并检查openai、langchain、numpy、soundfile、requests、torch等重量级依赖没有在导入时被加载。
+超过启动预算或加载了重量级依赖时以非零状态退出，可以直接用作启动预算的检查。
+运行方式：python test/benchmark/bench_import_time.py [预算毫秒数]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+HEAVY_MODULES = ("openai", "langchain", "numpy", "soundfile", "requests", "torch", "transformers")
+TARGETS = ("pipeline", "src.tts.clients.clients")
+REPEAT = 5
+
+
+def import_once(target: str):
+    """
+    返回(导入耗时微秒, 各模块累计耗时, 加载了的重量级依赖)
+    """
+    code = f"import sys; import {target}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    heavy = [name for name in result.stdout.strip().split(",") if name]
+    return modules.get(target, 0), modules, heavy
+
+
+def main(budget_ms: float = 300.0) -> int:
+    status = 0
+    for target in TARGETS:
+        runs = [import_once(target) for _ in range(REPEAT)]
+        elapsed = statistics.median(run[0] for run in runs) / 1e3
+        _, modules, heavy = runs[-1]
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[1:6]
+        print(f"import {target}: {elapsed:.1f}ms（{REPEAT}次中位数，预算 {budget_ms:.0f}ms）")
+        print("  最慢的模块: " + "，".join(f"{name} {cumulative / 1e3:.1f}ms" for name, cumulative in slowest))
+        if heavy:
+            print(f"  [ERROR] 导入时加载了重量级依赖: {', '.join(heavy)}")
+            status = 1
+        if elapsed > budget_ms:
+            print("  [ERROR] 超出启动预算")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else 300.0))
@@ -0,0 +1,46 @@
+"""
+JsonObjCrud 内存占用基准测试
+
+将examples/doupo/step2.json放大到指定倍数后加载为SentencesJsonListCrud，统计每个元素的平均内存占用。
+运行方式：python test/benchmark/bench_item_memory.py [放大倍数]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'doupo', 'step2.json')
+
+
+def main(scale: int = 1000) -> None:
+    with open(EXAMPLE, "r", encoding="utf-8") as f:
+        example = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scaled.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(example * scale, f, ensure_ascii=False)
+
+        tracemalloc.start()
+        crud = SentencesJsonListCrud(path)
+        # 字符串本身由json解析产生，与表示方式无关，这里只统计加载完成后仍然存活的内存
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    size = len(crud)
+    print(f"元素数量: {size}")
+    print(f"存活内存: {current / 1e6:.1f}MB，平均 {current / size:.0f}B/元素，加载峰值 {peak / 1e6:.1f}MB")
+
+    begin = time.perf_counter()
+    for item in crud.data:
+        item.to_dict()
+    print(f"to_dict 全量调用: {time.perf_counter() - begin:.3f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,128 @@
+"""
+parse_list_of_dicts 基准测试
+
+语料来自examples/eval中保存的真实模型输出（评测集中各模型的resp、参考回复与训练集answer），
+按模型实际会输出的几种形式序列化（JSON、Python字面量、代码围栏、带前后说明文字），
+再叠加线上常见的几类格式错误（多余逗号、全角引号、'…'引语、缺少结尾括号、输出被截断），
+统计旧的四段式解析与分层解码器各自解析失败、需要重新调用模型的次数以及耗时。
+运行方式：python test/benchmark/bench_parse_list_of_dicts.py
+"""
+import ast
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, ROOT)
+
+from src.utils.tools import _strip_code_fences, decode_model_json, parse_list_of_dicts
+
+
+def legacy_parse_list_of_dicts(text):
+    """
+    旧实现：严格JSON、Python字面量、提取首个方括号片段、修复缺少引号的键，依次整串重试
+    """
+    normalized = _strip_code_fences(text).strip()
+    for attempt in (lambda: json.loads(normalized), lambda: ast.literal_eval(normalized)):
+        try:
+            parsed = attempt()
+            parsed = [parsed] if isinstance(parsed, dict) else parsed
+            if isinstance(parsed, list):
+                return [dict(item) for item in parsed]
+        except Exception:
+            pass
+    bracket_match = re.search(r"\[[\s\S]*\]", normalized)
+    if bracket_match:
+        try:
+            parsed = json.loads(bracket_match.group(0))
+            parsed = [parsed] if isinstance(parsed, dict) else parsed
+            if isinstance(parsed, list):
+                return [dict(item) for item in parsed]
+        except Exception:
+            pass
+    try:
+        fixed_text = normalized
+        if '"class"' not in fixed_text and 'class' in fixed_text:
+            fixed_text = re.sub(r'class:\s*([^,}\]]+)', r'"class": "\1"', fixed_text)
+        if '"content"' not in fixed_text and 'content' in fixed_text:
+            fixed_text = re.sub(r'content:\s*([^,}\]]+)', r'"content": "\1"', fixed_text)
+        parsed = json.loads(fixed_text)
+        parsed = [parsed] if isinstance(parsed, dict) else parsed
+        if isinstance(parsed, list):
+            return [dict(item) for item in parsed]
+    except Exception:
+        pass
+    return False
+
+
+def load_outputs():
+    """
+    读取examples/eval中的模型输出，每条是一个List[Dict]
+    """
+    eval_dir = os.path.join(ROOT, 'examples', 'eval')
+    outputs = []
+    with open(os.path.join(eval_dir, 'step1_eval.json'), encoding='utf-8') as f:
+        for task in json.load(f):
+            outputs.extend(model['resp'] for model in task['resp'])
+            outputs.append(task['ref_resp'])
+    with open(os.path.join(eval_dir, 'train_data.json'), encoding='utf-8') as f:
+        outputs.extend(task['ref_resp'] for task in json.load(f))
+    for name in ('train.jsonl', 'val.jsonl'):
+        with open(os.path.join(eval_dir, name), encoding='utf-8') as f:
+            outputs.extend(json.loads(line)['answer'] for line in f if line.strip())
+    return [output for output in outputs if isinstance(output, list) and output]
+
+
+def render(output):
+    """
+    模型输出的几种常见形式
+    """
+    as_json = json.dumps(output, ensure_ascii=False)
+    return {
+        "JSON": as_json,
+        "Python字面量": repr(output),
+        "代码围栏": f"```json\n{json.dumps(output, ensure_ascii=False, indent=2)}\n```",
+        "前后说明文字": f"好的，分割结果如下：\n{as_json}\n以上为全部子句。",
+        "多余逗号": as_json[:-2] + "},]",
+        "全角引号": as_json.replace('"', '“', 1).replace('"', '”', 1),
+        "'…'引语": repr(output).replace("'content': '", "'content': ''", 1).replace("'}", "''}", 1),
+        "缺少结尾括号": as_json[:-1],
+        "截断": as_json[:max(len(as_json) * 4 // 5, 1)],
+    }
+
+
+def main() -> None:
+    outputs = load_outputs()
+    cases = {}
+    for output in outputs:
+        for form, text in render(output).items():
+            cases.setdefault(form, []).append(text)
+    print(f"语料: {len(outputs)} 条模型输出，{sum(map(len, cases.values()))} 个用例")
+    print(f"{'形式':<10}{'旧实现失败':>8}{'分层解码失败':>10}  修复项")
+    legacy_failed = layered_failed = 0
+    legacy_time = layered_time = 0.0
+    for form, texts in cases.items():
+        begin = time.perf_counter()
+        legacy = sum(legacy_parse_list_of_dicts(text) is False for text in texts)
+        legacy_time += time.perf_counter() - begin
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            layered = sum(parse_list_of_dicts(text) is False for text in texts)
+        layered_time += time.perf_counter() - begin
+        repairs = set()
+        for text in texts:
+            with contextlib.suppress(ValueError):
+                repairs.update(decode_model_json(text)[1])
+        legacy_failed += legacy
+        layered_failed += layered
+        print(f"{form:<10}{legacy:>8}/{len(texts)}{layered:>10}/{len(texts)}  {', '.join(sorted(repairs)) or '-'}")
+    print(f"需要重新调用模型: 旧实现 {legacy_failed} 次，分层解码 {layered_failed} 次")
+    print(f"总耗时: 旧实现 {legacy_time * 1e3:.1f}ms，分层解码 {layered_time * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
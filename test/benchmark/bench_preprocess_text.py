@@ -0,0 +1,70 @@
+"""
+preprocess_text 基准测试
+
+对比每次调用重建映射字典的旧实现、预先整理替换序列的preprocess_text、str.translate转换表
+与流式的preprocess_text_stream，输入为重复拼接的多MB中文小说文本。
+运行方式：python test/benchmark/bench_preprocess_text.py [MB数]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.utils.tools import _CHINESE_TO_ENGLISH_MAP, preprocess_text, preprocess_text_stream
+
+PARAGRAPH = "“斗之力，三段！”\n\n望着测验魔石碑上面闪亮得甚至有些刺眼的五个大字，少年面无表情，唇角有着一抹自嘲……\n  \n“萧炎，斗之力，三段！级别：低级！”测验魔石碑之旁，一位中年男子（族长）看了一眼碑上所显示出来的信息。\n"
+
+
+def replace_one_by_one(text: str) -> str:
+    """
+    旧实现：逐行判断空行，每个映射一次全文str.replace
+    """
+    text = '\n'.join(line for line in text.split('\n') if line.strip())
+    for chinese_char, english_char in dict(_CHINESE_TO_ENGLISH_MAP, **{' ': ''}).items():
+        text = text.replace(chinese_char, english_char)
+    return text
+
+
+TRANSLATE_TABLE = str.maketrans(dict(_CHINESE_TO_ENGLISH_MAP, **{' ': None}))
+
+
+def translate(text: str) -> str:
+    """
+    对照：str.translate一次遍历，非ASCII文本上没有快速路径
+    """
+    return '\n'.join(filter(str.strip, text.split('\n'))).translate(TRANSLATE_TABLE)
+
+
+def main(megabytes: int = 8) -> None:
+    text = PARAGRAPH * (megabytes * 1024 * 1024 // len(PARAGRAPH.encode("utf-8")))
+    print(f"输入大小: {len(text.encode('utf-8')) / 1e6:.1f}MB")
+
+    begin = time.perf_counter()
+    expected = replace_one_by_one(text)
+    print(f"逐个str.replace: {time.perf_counter() - begin:.3f}s")
+
+    begin = time.perf_counter()
+    result = preprocess_text(text)
+    print(f"preprocess_text: {time.perf_counter() - begin:.3f}s")
+    assert result == expected
+
+    begin = time.perf_counter()
+    assert translate(text) == expected
+    print(f"str.translate对照: {time.perf_counter() - begin:.3f}s")
+
+    source = io.StringIO(text)
+    tracemalloc.start()
+    begin = time.perf_counter()
+    total = sum(len(piece) for piece in preprocess_text_stream(iter(lambda: source.read(1 << 16), "")))
+    elapsed = time.perf_counter() - begin
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"流式64KB分块: {elapsed:.3f}s，峰值额外内存 {peak / 1e6:.2f}MB")
+    assert total == len(expected)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8)
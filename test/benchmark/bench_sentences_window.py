@@ -0,0 +1,60 @@
+"""
+SentencesJsonListCrud 读密集场景基准测试
+
+对10万条句子的列表进行循环读取，统计按需计算窗口与惰性重排id的开销，以及落盘大小。
+运行方式：python test/benchmark/bench_sentences_window.py [列表长度]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud
+
+
+def build(size: int) -> SentencesJsonListCrud:
+    crud = SentencesJsonListCrud(Windows_Size=3)
+    for i in range(size):
+        crud.create(None, {"class": "旁白", "sub_sentence": f"第{i}句，测试用的子句内容。", "describe": {"role": None, "style": None}})
+    return crud
+
+
+def main(size: int = 100000) -> None:
+    crud = build(size)
+
+    begin = time.perf_counter()
+    crud.read_all()
+    first = time.perf_counter() - begin
+    print(f"首次read_all（全部为脏）: {first:.3f}s")
+
+    begin = time.perf_counter()
+    for i in range(size):
+        crud.read(i)
+    clean = time.perf_counter() - begin
+    print(f"{size}次干净read: {clean:.3f}s，平均 {clean / size * 1e6:.2f}us/次")
+
+    begin = time.perf_counter()
+    for i in range(0, size, 100):
+        crud.update(i, "sub_sentence", f"修改{i}")
+        crud.read(i)
+    mixed = time.perf_counter() - begin
+    print(f"{size // 100}次 update+read 交替: {mixed:.3f}s")
+
+    begin = time.perf_counter()
+    crud.create(size // 2, {"class": "语言", "sub_sentence": "插入句", "describe": {"role": None, "style": None}})
+    crud.read(size // 2)
+    insert = time.perf_counter() - begin
+    print(f"中部插入后读取: {insert * 1e3:.3f}ms")
+
+    # 窗口按需计算，元素本身不再保存邻居副本，落盘大小与N成正比
+    with tempfile.TemporaryDirectory() as tmp:
+        compact, vis = os.path.join(tmp, "compact.json"), os.path.join(tmp, "vis.json")
+        crud.save_date(compact)
+        crud.save_date(vis, with_window=True)
+        print(f"落盘大小: 紧凑格式 {os.path.getsize(compact) / 1e6:.1f}MB，可视化导出 {os.path.getsize(vis) / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
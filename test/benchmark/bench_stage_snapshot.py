@@ -0,0 +1,74 @@
+"""
+阶段快照与片段派生基准测试
+
+1. 对比每个阶段深拷贝整个列表与写时复制快照的耗时与峰值内存；
+2. 对比细粒度拆分时每个片段copy.deepcopy与derive的耗时。
+运行方式：python test/benchmark/bench_stage_snapshot.py [列表长度]
+"""
+import copy
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud
+
+
+def build(size: int) -> SentencesJsonListCrud:
+    crud = SentencesJsonListCrud(Windows_Size=3)
+    crud.create_many(None, [{"class": "旁白", "sub_sentence": f"第{i}句，测试用的子句内容。", "describe": {"role": None, "style": None}} for i in range(size)])
+    return crud
+
+
+def measure(func):
+    tracemalloc.start()
+    begin = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - begin
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(size: int = 50000) -> None:
+    crud = build(size)
+
+    # 模拟四个阶段，每个阶段修改十分之一的子句
+    def deep_copy_stages():
+        stages = []
+        for stage in range(4):
+            stages.append([copy.deepcopy(item) for item in crud.data])
+            for i in range(stage, size, 10):
+                crud.data[i].write_describe_style(f"阶段{stage}")
+        return stages
+
+    def snapshot_stages():
+        stages = []
+        for stage in range(4):
+            stages.append(crud.snapshot())
+            for i in range(stage, size, 10):
+                crud.data[i].write_describe_style(f"阶段{stage}")
+        return stages
+
+    _, elapsed, peak = measure(deep_copy_stages)
+    print(f"每阶段深拷贝: {elapsed:.3f}s，峰值内存 {peak / 1e6:.1f}MB")
+    _, elapsed, peak = measure(snapshot_stages)
+    print(f"写时复制快照: {elapsed:.3f}s，峰值内存 {peak / 1e6:.1f}MB")
+
+    items = crud.data[:2000]
+    begin = time.perf_counter()
+    for item in items:
+        [copy.deepcopy(item) for _ in range(5)]
+    deep = time.perf_counter() - begin
+    begin = time.perf_counter()
+    for item in items:
+        _window = item.read_window()
+        [item.derive(_window) for _ in range(5)]
+    derived = time.perf_counter() - begin
+    print(f"{len(items)}个子句各拆5个片段: deepcopy {deep:.3f}s，derive {derived:.3f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
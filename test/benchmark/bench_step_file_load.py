@@ -0,0 +1,56 @@
+"""
+步骤文件打开速度基准测试
+
+将examples/doupo/step2.json放大为约5万条子句的整本书，对比JSON数组与JSONL + 偏移索引两种格式
+打开文件、随机读取单条子句、末尾追加一条子句的耗时。
+运行方式：python test/benchmark/bench_step_file_load.py [放大倍数]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud, convert_step_file
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'doupo', 'step2.json')
+
+
+def measure(path: str) -> None:
+    tracemalloc.start()
+    begin = time.perf_counter()
+    crud = SentencesJsonListCrud(path)
+    opened = time.perf_counter() - begin
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    begin = time.perf_counter()
+    crud.read(len(crud) // 2)
+    read = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    crud.create(None, {"class": "旁白", "sub_sentence": "追加的子句", "describe": {"role": None, "style": None}})
+    crud.save_date()
+    append = time.perf_counter() - begin
+    print(f"{os.path.basename(path)}: 打开 {opened:.3f}s（峰值内存 {peak / 1e6:.1f}MB），读取一条 {read * 1e3:.3f}ms，追加并保存 {append:.3f}s")
+
+
+def main(scale: int = 500) -> None:
+    with open(EXAMPLE, "r", encoding="utf-8") as f:
+        example = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, jsonl_path = os.path.join(tmp, "book.json"), os.path.join(tmp, "book.jsonl")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(example * scale, f, ensure_ascii=False)
+        convert_step_file(json_path, jsonl_path)
+        convert_step_file(jsonl_path, json_path)
+        print(f"子句数量: {len(example) * scale}")
+        measure(json_path)
+        measure(jsonl_path)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
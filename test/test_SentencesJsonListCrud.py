@@ -0,0 +1,510 @@
+"""
+SentencesJsonListCrud 测试用例
+
+测试句子JSON列表CRUD类的增删改查功能，以及上下文窗口的增量维护
+"""
+
+import unittest
+import os
+import sys
+import copy
+import json
+import random
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud, convert_step_file
+from src.template.BaseClassTemp.BaseClass import JsonObjCrud, class_code_of, class_name_of, _CLASS_TABLE
+from src.template.sentences_store import ChunkedList
+
+
+def _build_list(size: int, windows_size: int = 3) -> SentencesJsonListCrud:
+    crud = SentencesJsonListCrud(Windows_Size=windows_size)
+    for i in range(size):
+        crud.create(None, {"class": "旁白", "sub_sentence": f"句子{i}", "describe": {"role": None, "style": None}})
+    return crud
+
+
+class TestSentencesJsonListCrudWindow(unittest.TestCase):
+    """上下文窗口增量维护测试类"""
+
+    def assert_same_as_materialized(self, crud: SentencesJsonListCrud):
+        """按需计算的窗口应与按旧方式物化的窗口一致"""
+        texts = [item.read_origin_sub_sentence() for item in crud.data]
+        for i, item in enumerate(crud.data):
+            start, end = max(0, i - crud.WINDOWS_SIZE), min(len(texts), i + crud.WINDOWS_SIZE + 1)
+            window = texts[start:end]
+            window[i - start] = item.read_sub_sentence()
+            self.assertEqual(crud.read(i)["id"], i)
+            self.assertEqual(crud.read(i)["sentence"], {"now_flag": i - start, "sentence": window})
+
+    def test_window_content(self):
+        """测试窗口内容与当前句位置"""
+        crud = _build_list(10, windows_size=2)
+        item = crud.read(0)
+        self.assertEqual(item["sentence"], {"now_flag": 0, "sentence": ["句子0", "句子1", "句子2"]})
+        item = crud.read(5)
+        self.assertEqual(item["sentence"]["now_flag"], 2)
+        self.assertEqual(item["sentence"]["sentence"], ["句子3", "句子4", "句子5", "句子6", "句子7"])
+        item = crud.read(-1)
+        self.assertEqual(item["id"], 9)
+        self.assertEqual(item["sentence"], {"now_flag": 2, "sentence": ["句子7", "句子8", "句子9"]})
+
+    def test_short_list(self):
+        """测试比窗口还短的列表"""
+        crud = _build_list(2, windows_size=3)
+        self.assertEqual(crud.read(1)["sentence"], {"now_flag": 1, "sentence": ["句子0", "句子1"]})
+
+    def test_create_and_delete(self):
+        """测试插入与删除后id惰性重排，窗口随之变化"""
+        crud = _build_list(30)
+        crud.read_all()
+        crud.create(10, {"class": "语言", "sub_sentence": "新句子", "describe": {"role": None, "style": None}})
+        self.assertEqual(crud._id_dirty_from, 10)
+        self.assertEqual(crud.read(10)["id"], 10)
+        self.assertEqual(crud.read(10)["sub_sentence"], "新句子")
+        self.assertIn("新句子", crud.data[12].read_sentence())
+        removed = crud.data[3]
+        crud.delete(3)
+        self.assertIsNone(removed._owner)
+        self.assertEqual(removed.read_window()["sentence"][3], "句子3")
+        self.assertEqual(crud.read(29)["id"], 29)
+        self.assert_same_as_materialized(crud)
+
+    def test_items_do_not_store_windows(self):
+        """测试列表中的元素不再保存邻居子句的副本"""
+        crud = _build_list(20)
+        self.assertTrue(all(item.Sentence is None for item in crud.data))
+        crud.data[5].write_origin_sub_sentence("直接修改")
+        self.assertIn("直接修改", crud.read(6)["sentence"]["sentence"])
+        # 窗口由列表计算，直接更新sentence返回失败且不改变窗口
+        window = crud.read(6)["sentence"]
+        self.assertFalse(crud.update(6, "sentence", ["伪造的窗口"], 0))
+        self.assertEqual(crud.read(6)["sentence"], window)
+
+    def test_save_and_load(self):
+        """测试默认保存为紧凑格式，可视化窗口需显式导出"""
+        crud = _build_list(20)
+        crud.update(3, "sub_sentence", "改写后的子句")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "step.json")
+            crud.save_date(path)
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self.assertNotIn("sentence", saved[0])
+            self.assertNotIn("origin_sub_sentence", saved[0])
+            self.assertEqual(saved[3]["origin_sub_sentence"], "句子3")
+
+            loaded = SentencesJsonListCrud(path)
+            self.assertEqual(loaded.read_all(), crud.read_all())
+
+            vis_path = os.path.join(tmp, "step_vis.json")
+            crud.save_date(vis_path, with_window=True)
+            with open(vis_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self.assertIn("[当前]改写后的子句", saved[3]["sentence"])
+
+    def test_deepcopy(self):
+        """测试深拷贝不会复制整个列表"""
+        crud = _build_list(10)
+        _copy = copy.deepcopy(crud.data[4])
+        self.assertIsNone(_copy._owner)
+        self.assertEqual(_copy.read_window(), crud.read(4)["sentence"])
+
+    def test_random_mutations(self):
+        """随机增删改后，增量结果应与全量重建一致"""
+        rng = random.Random(0)
+        crud = _build_list(50)
+        for step in range(300):
+            op = rng.choice(["create", "delete", "update", "read"])
+            index = rng.randrange(len(crud))
+            if op == "create":
+                crud.create(index, {"class": "旁白", "sub_sentence": f"新{step}", "describe": {"role": None, "style": None}})
+            elif op == "delete" and len(crud) > 5:
+                crud.delete(index)
+            elif op == "update":
+                crud.update(index, "sub_sentence", f"改{step}")
+            else:
+                crud.read(index)
+        self.assert_same_as_materialized(crud)
+
+
+class TestSentencesJsonlStore(unittest.TestCase):
+    """JSONL + 偏移索引存储测试类"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "step.jsonl")
+        _build_list(50).save_date(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lazy_load(self):
+        """测试加载时不解析子句，只解析被访问的元素及其窗口"""
+        crud = SentencesJsonListCrud(self.path)
+        self.assertEqual(len(crud), 50)
+        self.assertFalse(any(crud.data.is_loaded(i) for i in range(50)))
+        item = crud.read(20)
+        self.assertEqual(item["id"], 20)
+        self.assertEqual(item["sentence"]["sentence"], [f"句子{i}" for i in range(17, 24)])
+        self.assertEqual([i for i in range(50) if crud.data.is_loaded(i)], list(range(17, 24)))
+
+    def test_append_without_rewrite(self):
+        """测试末尾新增子句时只追加，不重写已有内容"""
+        with open(self.path, "rb") as f:
+            before = f.read()
+        crud = SentencesJsonListCrud(self.path)
+        crud.create(None, {"class": "语言", "sub_sentence": "追加的句子", "describe": {"role": None, "style": None}})
+        crud.save_date()
+        with open(self.path, "rb") as f:
+            after = f.read()
+        self.assertTrue(after.startswith(before))
+        self.assertEqual(after.count(b"\n"), 51)
+        reloaded = SentencesJsonListCrud(self.path)
+        self.assertEqual(reloaded.read(50)["sub_sentence"], "追加的句子")
+        self.assertEqual(reloaded.read(49)["sentence"]["sentence"][-1], "追加的句子")
+
+    def test_insert_and_delete(self):
+        """测试中间插入、删除后保存，结果与JSON格式一致"""
+        crud = SentencesJsonListCrud(self.path)
+        crud.create(10, {"class": "语言", "sub_sentence": "插入", "describe": {"role": "萧炎", "style": None}})
+        crud.delete(0)
+        crud.save_date()
+        self.assertEqual(SentencesJsonListCrud(self.path).read_all(), crud.read_all())
+
+    def test_convert(self):
+        """测试JSON与JSONL之间的相互转换"""
+        json_path = os.path.join(self.tmp.name, "step.json")
+        back_path = os.path.join(self.tmp.name, "back.jsonl")
+        self.assertTrue(convert_step_file(self.path, json_path))
+        self.assertTrue(convert_step_file(json_path, back_path))
+        self.assertEqual(SentencesJsonListCrud(back_path).read_all(), SentencesJsonListCrud(self.path).read_all())
+        with open(back_path, "rb") as f, open(self.path, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_rebuild_missing_index(self):
+        """测试索引文件丢失时通过扫描换行符重建"""
+        os.remove(self.path + ".idx")
+        crud = SentencesJsonListCrud(self.path)
+        self.assertEqual(crud.read(-1)["sub_sentence"], "句子49")
+
+    def test_incremental_save_only_appends_dirty(self):
+        """测试修改后保存只追加被修改的子句，未修改的子句保持原位"""
+        with open(self.path, "rb") as f:
+            before = f.read()
+        crud = SentencesJsonListCrud(self.path)
+        crud.update(5, "role", "萧炎")
+        crud.read(30)
+        crud.save_date()
+        with open(self.path, "rb") as f:
+            after = f.read()
+        self.assertTrue(after.startswith(before))
+        self.assertEqual(after.count(b"\n"), 51)
+        reloaded = SentencesJsonListCrud(self.path)
+        self.assertEqual(reloaded.read(5)["describe"]["role"], "萧炎")
+        self.assertEqual(reloaded.read_all(), crud.read_all())
+        # 没有修改时再次保存不会写入任何内容
+        crud.save_date()
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), after)
+
+    def test_uncommitted_append_is_ignored(self):
+        """测试追加了数据但索引未提交（模拟崩溃）时，重新打开仍是上一次提交的状态"""
+        crud = SentencesJsonListCrud(self.path)
+        crud.store.append_lines([json.dumps({"class": "语言", "sub_sentence": "崩溃"}, ensure_ascii=False).encode("utf-8")])
+        reloaded = SentencesJsonListCrud(self.path)
+        self.assertEqual(len(reloaded), 50)
+        self.assertEqual(reloaded.read(-1)["sub_sentence"], "句子49")
+
+    def test_compaction(self):
+        """测试垃圾行过多时自动压缩"""
+        crud = SentencesJsonListCrud(self.path)
+        for round_num in range(3):
+            for i in range(50):
+                crud.update(i, "style", f"风格{round_num}")
+            crud.save_date()
+        self.assertLessEqual(crud.store.total_lines, 100)
+        reloaded = SentencesJsonListCrud(self.path)
+        self.assertEqual(reloaded.read_all(), crud.read_all())
+        self.assertEqual(reloaded.read(7)["describe"]["style"], "风格2")
+
+    def test_json_save_is_atomic(self):
+        """测试JSON格式保存失败时不会破坏原文件"""
+        json_path = os.path.join(self.tmp.name, "step.json")
+        crud = SentencesJsonListCrud(self.path)
+        crud.save_date(json_path)
+        with open(json_path, "rb") as f:
+            before = f.read()
+        crud.update(0, "describe", {"role": object(), "style": None})
+        with self.assertRaises(RuntimeError):
+            crud.save_date(json_path)
+        with open(json_path, "rb") as f:
+            self.assertEqual(f.read(), before)
+
+
+class TestSentencesJsonListCrudIndex(unittest.TestCase):
+    """二级索引测试类"""
+
+    def assert_index_matches_scan(self, crud: SentencesJsonListCrud):
+        """索引查询结果应与全表扫描一致"""
+        items = crud.data[:]
+        for class_name in ("语言", "内心独白", "旁白"):
+            self.assertEqual(crud.find(class_name=class_name), [i for i, item in enumerate(items) if item.read_class() == class_name])
+        for role in ("萧炎", "萧薰儿", None):
+            self.assertEqual(crud.find(class_name=["语言", "内心独白"], role=role),
+                             [i for i, item in enumerate(items) if item.read_class() in ["语言", "内心独白"] and item.read_describe_role() == role])
+        self.assertEqual(crud.find(speaker_id="spk1"), [i for i, item in enumerate(items) if item.read_speaker_id() == "spk1"])
+        self.assertEqual(crud.find_without_duration(), [i for i, item in enumerate(items) if item.read_duration_begin() is None or item.read_duration_end() is None])
+        self.assertEqual(crud.find_by_duration(2, 6), [i for i, item in enumerate(items) if item.read_duration_begin() is not None and item.read_duration_end() is not None and 2 <= item.read_duration_begin() and item.read_duration_end() <= 6])
+
+    def test_find(self):
+        """测试按类别、角色组合查询"""
+        crud = _build_list(6)
+        crud.update(1, "class", "语言")
+        crud.update(1, "role", "萧炎")
+        crud.update(4, "class", "内心独白")
+        self.assertEqual(crud.find(class_name=["语言", "内心独白"]), [1, 4])
+        self.assertEqual(crud.find(role="萧炎"), [1])
+        self.assertEqual(crud.find(class_name="旁白", role="萧炎"), [])
+        self.assertEqual(crud.find(), list(range(6)))
+
+    def test_find_unknown_class(self):
+        """测试查询未知类别不命中任何子句，也不会追加到类别编码表"""
+        crud = _build_list(6)
+        crud.update(1, "class", "语言")
+        size = len(_CLASS_TABLE)
+        self.assertEqual(crud.find(class_name="不存在的类别"), [])
+        self.assertEqual(crud.find(class_name=["不存在的类别", "语言"]), [1])
+        self.assertEqual(len(_CLASS_TABLE), size)
+        self.assertNotIn("不存在的类别", _CLASS_TABLE)
+
+    def test_incremental_maintenance(self):
+        """测试随机增删改后索引与全表扫描一致"""
+        rng = random.Random(31)
+        crud = _build_list(40)
+        crud.find(class_name="旁白")
+        for step in range(300):
+            op = rng.random()
+            if op < 0.2:
+                crud.create(rng.randrange(len(crud)), {"class": rng.choice(["语言", "旁白"]), "sub_sentence": f"新句{step}", "describe": {"role": rng.choice(["萧炎", None]), "style": None}})
+            elif op < 0.35 and len(crud) > 5:
+                crud.delete(rng.randrange(len(crud)))
+            elif op < 0.55:
+                crud.update(rng.randrange(len(crud)), "class", rng.choice(["语言", "内心独白", "旁白"]))
+            elif op < 0.7:
+                crud.update(rng.randrange(len(crud)), "role", rng.choice(["萧炎", "萧薰儿", None]))
+            elif op < 0.8:
+                crud.data[rng.randrange(len(crud))].write_speaker_id(rng.choice(["spk0", "spk1"]))
+            else:
+                item = crud.data[rng.randrange(len(crud))]
+                begin = rng.randrange(10)
+                item.write_duration_begin(begin)
+                item.write_duration_end(begin + rng.randrange(4))
+        self.assert_index_matches_scan(crud)
+
+    def test_reload_resets_index(self):
+        """测试重新加载数据后索引重建"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "step.jsonl")
+            crud = _build_list(10)
+            crud.update(3, "class", "语言")
+            crud.save_date(path)
+            self.assertEqual(crud.find(class_name="语言"), [3])
+            crud.load_data(path)
+            crud.update(5, "class", "语言")
+            self.assertEqual(crud.find(class_name="语言"), [3, 5])
+
+
+class _SmallChunkedList(ChunkedList):
+    CHUNK_SIZE = 4
+
+
+class TestBulkMutation(unittest.TestCase):
+    """分块列表与批量增删改接口测试类"""
+
+    def test_chunked_list_matches_list(self):
+        """测试分块列表的随机操作结果与list一致"""
+        rng = random.Random(32)
+        expected = list(range(30))
+        chunked = _SmallChunkedList(expected)
+        for step in range(500):
+            op = rng.random()
+            if op < 0.3:
+                index = rng.randrange(len(expected) + 1)
+                expected.insert(index, step)
+                chunked.insert(index, step)
+            elif op < 0.5 and expected:
+                index = rng.randrange(len(expected))
+                del expected[index]
+                del chunked[index]
+            elif op < 0.6:
+                expected.append(step)
+                chunked.append(step)
+            else:
+                start = rng.randrange(len(expected) + 1)
+                stop = rng.randrange(start, min(len(expected), start + 10) + 1)
+                values = [step] * rng.randrange(6)
+                expected[start:stop] = values
+                chunked.splice(start, stop, values)
+            self.assertEqual(len(chunked), len(expected))
+        self.assertEqual(list(chunked), expected)
+        self.assertEqual([chunked[i] for i in range(len(expected))], expected)
+        self.assertEqual(chunked[-1], expected[-1])
+
+    def test_replace_range(self):
+        """测试将一个句子原地替换为多个子句，窗口与id随之更新"""
+        crud = _build_list(10)
+        old = crud.data[4]
+        self.assertTrue(crud.replace_range(4, 5, [{"class": "语言", "sub_sentence": f"拆分{j}", "describe": {"role": None, "style": None}} for j in range(3)]))
+        self.assertEqual([item["sub_sentence"] for item in crud.read_all()], [f"句子{i}" for i in range(4)] + ["拆分0", "拆分1", "拆分2"] + [f"句子{i}" for i in range(5, 10)])
+        self.assertEqual(crud.read(11)["id"], 11)
+        self.assertEqual(old.read_window()["sentence"], [f"句子{i}" for i in range(1, 8)])
+        self.assertTrue(crud.replace_range(0, 4, []))
+        self.assertEqual(crud.read(0)["sub_sentence"], "拆分0")
+
+    def test_create_update_delete_many(self):
+        """测试批量创建、更新、删除"""
+        crud = _build_list(5)
+        self.assertTrue(crud.create_many(2, [{"class": "语言", "sub_sentence": f"新{j}", "describe": {"role": None, "style": None}} for j in range(2)]))
+        self.assertTrue(crud.create_many(None, [{"class": "旁白", "sub_sentence": "末尾", "describe": {"role": None, "style": None}}]))
+        self.assertEqual([item["sub_sentence"] for item in crud.read_all()], ["句子0", "句子1", "新0", "新1", "句子2", "句子3", "句子4", "末尾"])
+        self.assertTrue(crud.update_many([2, 3], "role", ["萧炎", "萧薰儿"]))
+        self.assertEqual(crud.find(role="萧炎"), [2])
+        self.assertFalse(crud.update_many([2], "role", []))
+        self.assertTrue(crud.delete_many([0, 1, 3, -1]))
+        self.assertEqual([item["sub_sentence"] for item in crud.read_all()], ["新0", "句子2", "句子3", "句子4"])
+        self.assertEqual(crud.find(role="萧炎"), [0])
+        self.assertFalse(crud.delete_many([10]))
+
+
+class TestSentencesSnapshot(unittest.TestCase):
+    """写时复制快照测试类"""
+
+    def test_snapshot_shares_unchanged_items(self):
+        """测试快照共享未修改的子句，修改时才复制"""
+        crud = _build_list(10)
+        snapshot = crud.snapshot()
+        before = crud.read_all()
+        crud.update(3, "role", "萧炎")
+        crud.data[4].write_sub_sentence("改写")
+        crud.replace_range(6, 7, [{"class": "语言", "sub_sentence": f"拆分{j}", "describe": {"role": None, "style": None}} for j in range(2)])
+        crud.delete(0)
+        self.assertEqual(snapshot.read_all(), before)
+        self.assertEqual(len(snapshot._overrides), 2)
+        self.assertIs(snapshot._item(5), crud.data[4])
+        self.assertEqual(crud.read(3)["sub_sentence"], "改写")
+
+    def test_multiple_snapshots(self):
+        """测试多个阶段的快照各自保持拍摄时的内容"""
+        crud = _build_list(5)
+        first = crud.snapshot()
+        crud.update(1, "class", "语言")
+        second = crud.snapshot()
+        crud.update(1, "class", "内心独白")
+        crud.update(2, "class", "语言")
+        self.assertEqual([item["class"] for item in first.read_all()], ["旁白"] * 5)
+        self.assertEqual([item["class"] for item in second.read_all()], ["旁白", "语言", "旁白", "旁白", "旁白"])
+        self.assertEqual([item["class"] for item in crud.read_all()], ["旁白", "内心独白", "语言", "旁白", "旁白"])
+        self.assertIs(first._item(2), second._item(2))
+
+    def test_snapshot_save(self):
+        """测试快照保存结果与拍摄时列表保存的结果一致"""
+        with tempfile.TemporaryDirectory() as tmp:
+            crud = _build_list(8)
+            crud.save_date(os.path.join(tmp, "a.json"))
+            crud.save_date(os.path.join(tmp, "a_vis.json"), with_window=True)
+            snapshot = crud.snapshot()
+            crud.update(2, "sub_sentence", "改写")
+            snapshot.save_date(os.path.join(tmp, "b.json"))
+            snapshot.save_date(os.path.join(tmp, "b_vis.json"), with_window=True)
+            for a, b in (("a.json", "b.json"), ("a_vis.json", "b_vis.json")):
+                with open(os.path.join(tmp, a), "rb") as f, open(os.path.join(tmp, b), "rb") as g:
+                    self.assertEqual(f.read(), g.read())
+
+    def test_snapshot_of_lazy_store(self):
+        """测试JSONL存储下未加载的子句也能被快照正确读取，存在快照时不压缩"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "step.jsonl")
+            _build_list(40).save_date(path)
+            crud = SentencesJsonListCrud(path)
+            snapshot = crud.snapshot()
+            before = snapshot.read_all()
+            for round_num in range(3):
+                for i in range(40):
+                    crud.update(i, "style", f"风格{round_num}")
+                crud.save_date()
+            self.assertEqual(crud.store.total_lines, 160)
+            self.assertEqual(snapshot.read_all(), before)
+
+    def test_snapshot_survives_reload(self):
+        """测试重新加载文件后，之前拍摄的快照仍能读取未加载的子句"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "step.jsonl")
+            _build_list(10).save_date(path)
+            crud = SentencesJsonListCrud(path)
+            snapshot = crud.snapshot()
+            crud.update(0, "style", "冷淡")
+            crud.save_date()
+            self.assertTrue(crud.load_data(path))
+            self.assertEqual(snapshot.read(3)["sub_sentence"], "句子3")
+            self.assertIsNone(snapshot.read(0)["describe"]["style"])
+            self.assertEqual(crud.read(0)["describe"]["style"], "冷淡")
+
+    def test_derive(self):
+        """测试派生片段共享字段与窗口，修改片段不影响原子句"""
+        crud = _build_list(5)
+        item = crud.data[2]
+        window = item.read_window()
+        fragments = [item.derive(window) for _ in range(3)]
+        fragments[0].write_sub_sentence("片段")
+        self.assertEqual(item.read_sub_sentence(), "句子2")
+        self.assertIs(fragments[1].read_window(), fragments[2].read_window())
+        self.assertIs(fragments[1].read_origin_sub_sentence(), item.read_origin_sub_sentence())
+
+
+class TestJsonObjCrud(unittest.TestCase):
+    """JsonObjCrud 紧凑表示测试类"""
+
+    def test_no_instance_dict(self):
+        """测试使用__slots__，不再有实例字典"""
+        item = JsonObjCrud(sub_sentence="你好")
+        self.assertFalse(hasattr(item, "__dict__"))
+
+    def test_class_code(self):
+        """测试类别以整数编码保存，未知类别会追加编码"""
+        item = JsonObjCrud(class_name="语言", sub_sentence="你好")
+        self.assertEqual(item.read_class(), "语言")
+        self.assertEqual(item.read_class_code(), class_code_of("语言"))
+        item.write_class("动作")
+        self.assertEqual(item.read_class(), "动作")
+        self.assertEqual(class_name_of(item.read_class_code()), "动作")
+        self.assertEqual(class_code_of("动作"), item.read_class_code())
+
+    def test_describe_accessors(self):
+        """测试describe的读写接口与额外字段"""
+        item = JsonObjCrud(sub_sentence="你好")
+        item.write_all({"sub_sentence": "你好", "describe": {"role": "萧炎", "style": "冷淡", "prompt_wav": "a.wav"}})
+        self.assertEqual(item.read_describe_role(), "萧炎")
+        self.assertEqual(item.read_describe_style(), "冷淡")
+        self.assertEqual(item.read_describe(), {"role": "萧炎", "style": "冷淡", "prompt_wav": "a.wav"})
+        item.write_describe_role("萧薰儿")
+        self.assertEqual(item.to_dict()["describe"]["role"], "萧薰儿")
+        item.write_duration_end(3)
+        item.write_speaker_id("spk0")
+        self.assertEqual((item.read_duration_begin(), item.read_duration_end(), item.read_speaker_id()), (None, 3, "spk0"))
+
+    def test_round_trip(self):
+        """测试to_storage_dict与write_all可以互相还原"""
+        item = JsonObjCrud(3, "内心独白", None, "子句", {"role": "萧炎", "style": None})
+        item.write_origin_sub_sentence("原始子句")
+        _new = JsonObjCrud()
+        _new.write_all(item.to_storage_dict())
+        self.assertEqual(_new.to_storage_dict(), item.to_storage_dict())
+
+
+if __name__ == '__main__':
+    # 运行测试
+    unittest.main(verbosity=2)
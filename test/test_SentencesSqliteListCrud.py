@@ -0,0 +1,161 @@
+"""
+SentencesSqliteListCrud 测试用例
+
+测试SQLite存储引擎与内存版SentencesJsonListCrud行为一致，以及事务、多连接共享等特性
+"""
+
+import unittest
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.template.sentences_json import SentencesJsonListCrud
+from src.template.sentences_sqlite import SentencesSqliteListCrud
+
+
+def _item(text: str, class_name: str = "旁白", role: str | None = None):
+    return {"class": class_name, "sub_sentence": text, "describe": {"role": role, "style": None}}
+
+
+class TestSentencesSqliteListCrud(unittest.TestCase):
+    """SQLite存储引擎测试类"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "book.db")
+        self.crud = SentencesSqliteListCrud(self.path, Windows_Size=2)
+
+    def tearDown(self):
+        self.crud.close()
+        self.tmp.cleanup()
+
+    def test_wal_mode(self):
+        """测试数据库使用WAL模式"""
+        self.assertEqual(self.crud._conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_same_as_memory(self):
+        """测试随机增删改后与内存版结果一致"""
+        rng = random.Random(33)
+        memory = SentencesJsonListCrud(Windows_Size=2)
+        for i in range(20):
+            memory.create(None, _item(f"句子{i}"))
+            self.crud.create(None, _item(f"句子{i}"))
+        for step in range(200):
+            op = rng.random()
+            if op < 0.3:
+                list_num = rng.randrange(len(memory))
+                memory.create(list_num, _item(f"新句{step}", "语言"))
+                self.crud.create(list_num, _item(f"新句{step}", "语言"))
+            elif op < 0.5 and len(memory) > 3:
+                list_num = rng.randrange(len(memory))
+                memory.delete(list_num)
+                self.crud.delete(list_num)
+            elif op < 0.7:
+                list_num = rng.randrange(len(memory))
+                memory.update(list_num, "role", f"角色{step % 3}")
+                self.crud.update(list_num, "role", f"角色{step % 3}")
+            elif op < 0.85:
+                list_num = rng.randrange(len(memory))
+                memory.update(list_num, "sub_sentence", f"改写{step}")
+                self.crud.update(list_num, "sub_sentence", f"改写{step}")
+            else:
+                list_num = rng.randrange(len(memory))
+                memory.update(list_num, "describe", {"role": "萧炎", "style": "冷淡", "prompt_wav": "a.wav"})
+                self.crud.update(list_num, "describe", {"role": "萧炎", "style": "冷淡", "prompt_wav": "a.wav"})
+        self.assertEqual(self.crud.read_all(), memory.read_all())
+        for list_num in (0, len(memory) // 2, -1):
+            self.assertEqual(self.crud.read(list_num), memory.read(list_num))
+        self.assertEqual(self.crud.find(class_name="语言", role="萧炎"), memory.find(class_name="语言", role="萧炎"))
+
+    def test_batch_rollback(self):
+        """测试批量事务出错时整体回滚"""
+        self.crud.create_many(None, [_item(f"句子{i}") for i in range(5)])
+        with self.assertRaises(RuntimeError):
+            with self.crud.batch():
+                self.crud.create(None, _item("不会保存"))
+                self.crud.update(0, "class", "语言")
+                raise RuntimeError("模拟出错")
+        self.assertEqual(len(self.crud), 5)
+        self.assertEqual(self.crud.read(0)["class"], "旁白")
+
+    def test_failed_write_rolls_back(self):
+        """测试create/delete中途写入失败时整体回滚，不留下平移了一半的位置"""
+        items = [_item(f"句子{i}") for i in range(5)]
+        self.crud.create_many(None, items)
+        expected = self.crud.read_all()
+        # 缺少sub_sentence，INSERT失败，但之前的位置平移已经执行
+        self.assertFalse(self.crud.create(2, {"class": "语言"}))
+        # 删除成功后位置平移失败
+        self.crud._conn.execute("CREATE TRIGGER no_shift BEFORE UPDATE OF pos ON sentences BEGIN SELECT RAISE(ABORT, '模拟出错'); END")
+        self.assertFalse(self.crud.delete(1))
+        self.crud._conn.execute("DROP TRIGGER no_shift")
+        self.assertEqual(self.crud.read_all(), expected)
+        self.assertEqual([row[0] for row in self.crud._conn.execute("SELECT pos FROM sentences ORDER BY pos")], list(range(5)))
+        self.assertEqual(self.crud.read(4)["sub_sentence"], "句子4")
+        # 外层事务中内层失败被调用方吞掉时，外层同样不提交
+        with self.crud.batch():
+            self.crud.update(0, "class", "语言")
+            try:
+                self.crud.create(2, {"class": "语言"})
+            except Exception:
+                pass
+        self.assertEqual(self.crud.read_all(), expected)
+
+    def test_shared_between_connections(self):
+        """测试两个实例共享同一本书，一方提交后另一方立即可见"""
+        other = SentencesSqliteListCrud(self.path, Windows_Size=2)
+        try:
+            self.crud.create_many(None, [_item(f"句子{i}") for i in range(3)])
+            self.assertEqual(len(other), 3)
+            other.update(1, "role", "萧炎")
+            self.assertEqual(self.crud.read(1)["describe"]["role"], "萧炎")
+        finally:
+            other.close()
+
+    def test_import_and_export(self):
+        """测试导入步骤文件与导出为JSON、数据库备份"""
+        memory = SentencesJsonListCrud(Windows_Size=2)
+        memory.create_many(None, [_item(f"句子{i}", "语言", "萧炎") for i in range(6)])
+        json_path = os.path.join(self.tmp.name, "step.json")
+        memory.save_date(json_path)
+        self.assertTrue(self.crud.load_data(json_path))
+        self.assertEqual(self.crud.read_all(), memory.read_all())
+        export_path = os.path.join(self.tmp.name, "export.jsonl")
+        self.crud.save_date(export_path)
+        self.assertEqual(SentencesJsonListCrud(export_path, Windows_Size=2).read_all(), memory.read_all())
+        backup_path = os.path.join(self.tmp.name, "backup.db")
+        self.crud.save_date(backup_path)
+        with sqlite3.connect(backup_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0], 6)
+
+    def test_without_database_path(self):
+        """测试不传路径时使用内存数据库，传入步骤文件时导入到内存数据库"""
+        crud = SentencesSqliteListCrud(Windows_Size=2)
+        self.assertEqual(len(crud), 0)
+        self.assertTrue(crud.create(None, _item("句子0")))
+        self.assertEqual(crud.read(0)["sub_sentence"], "句子0")
+        crud.close()
+        memory = SentencesJsonListCrud(Windows_Size=2)
+        memory.create_many(None, [_item(f"句子{i}", "语言") for i in range(4)])
+        for suffix in (".json", ".jsonl"):
+            json_path = os.path.join(self.tmp.name, "step" + suffix)
+            memory.save_date(json_path)
+            crud = SentencesSqliteListCrud(json_path, Windows_Size=2)
+            self.assertEqual(crud.read_all(), memory.read_all())
+            crud.close()
+
+    def test_out_of_range(self):
+        """测试越界操作返回失败"""
+        self.assertFalse(self.crud.update(3, "class", "语言"))
+        self.assertFalse(self.crud.delete(0))
+        with self.assertRaises(IndexError):
+            self.crud.read(0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
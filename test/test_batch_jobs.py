@@ -0,0 +1,161 @@
+"""
+离线batch任务测试用例
+
+使用假的generate_batch驱动BatchJobManager，并用假的openai客户端把OpenAIBatchBackend接到同一个管理器上，
+不依赖torch、fastapi与openai
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+import os
+import sys
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.server.batch_jobs import BatchJobManager, FileStore
+from src.llm.server.scheduler import BatchScheduler, GenerationRequest, GenerationResult
+from src.template.llm_backend import OpenAIBatchBackend
+
+
+def build_request(body):
+    if not body.get("messages"):
+        raise ValueError("messages is required")
+    return GenerationRequest(messages=body["messages"], max_tokens=body.get("max_tokens", 16))
+
+
+def render_response(body, result):
+    return {"model": body["model"], "choices": [{"index": 0, "message": {"role": "assistant", "content": result.text}}]}
+
+
+def line(custom_id, content, model="qwen3-sft"):
+    return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+            "body": {"model": model, "messages": [{"role": "user", "content": content}]}}
+
+
+class FakeOpenAI:
+    """只实现OpenAIBatchBackend用到的files与batches接口，转发给BatchJobManager"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        return SimpleNamespace(id=self.manager.files.add(file[0], file[1], purpose).id)
+
+    def _content(self, file_id):
+        return SimpleNamespace(text=self.manager.files.read(file_id).decode("utf-8"))
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        return self._retrieve(self.manager.create(input_file_id, endpoint, completion_window).id)
+
+    def _retrieve(self, batch_id):
+        batch = self.manager.get(batch_id).to_dict()
+        batch["request_counts"] = SimpleNamespace(**batch["request_counts"])
+        return SimpleNamespace(**batch)
+
+
+class TestBatchJobs(unittest.TestCase):
+    """测试BatchJobManager与OpenAIBatchBackend"""
+
+    def setUp(self):
+        self.batches = []
+
+        def generate_batch(requests):
+            self.batches.append([request.messages[-1]["content"] for request in requests])
+            return [GenerationResult(text=request.messages[-1]["content"].upper(), prompt_tokens=1, completion_tokens=1) for request in requests]
+
+        self.directory = tempfile.mkdtemp()
+        self.scheduler = BatchScheduler(generate_batch, max_batch_size=2, max_wait_ms=20).start()
+        self.manager = BatchJobManager(self.scheduler, FileStore(self.directory), build_request, render_response)
+
+    def tearDown(self):
+        self.scheduler.stop(timeout=1)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def upload(self, lines):
+        content = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in lines)
+        return self.manager.files.add("input.jsonl", content.encode("utf-8")).id
+
+    def read_jsonl(self, file_id):
+        return [json.loads(row) for row in self.manager.files.read(file_id).decode("utf-8").splitlines()]
+
+    def test_job_sorted_by_length(self):
+        """测试任务按长度排序后分批执行，结果按输入顺序写出"""
+        contents = ["aaaa", "b", "ccc", "dd", "eeeee"]
+        file_id = self.upload([line(f"req-{i}", content) for i, content in enumerate(contents)])
+        job = self.manager.wait(self.manager.create(file_id, "/v1/chat/completions").id, timeout=5)
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(self.batches, [["b", "dd"], ["ccc", "aaaa"], ["eeeee"]])
+        outputs = self.read_jsonl(job.output_file_id)
+        self.assertEqual([output["custom_id"] for output in outputs], [f"req-{i}" for i in range(5)])
+        self.assertEqual(outputs[0]["response"]["body"]["choices"][0]["message"]["content"], "AAAA")
+        self.assertEqual(job.to_dict()["request_counts"], {"total": 5, "completed": 5, "failed": 0})
+        self.assertIsNone(job.error_file_id)
+
+    def test_failed_lines_go_to_error_file(self):
+        """测试无法构造请求的行写入错误文件，其余请求照常完成"""
+        bad = {"custom_id": "bad", "url": "/v1/chat/completions", "body": {"model": "qwen3-sft", "messages": []}}
+        file_id = self.upload([line("ok", "x"), bad])
+        job = self.manager.wait(self.manager.create(file_id, "/v1/chat/completions").id, timeout=5)
+        self.assertEqual((job.completed, job.failed), (1, 1))
+        errors = self.read_jsonl(job.error_file_id)
+        self.assertEqual(errors[0]["custom_id"], "bad")
+        self.assertIn("messages is required", errors[0]["error"]["message"])
+
+    def test_invalid_input(self):
+        """测试非法输入文件在创建任务时报错"""
+        with self.assertRaises(KeyError):
+            self.manager.create("file-unknown", "/v1/chat/completions")
+        with self.assertRaises(ValueError):
+            self.manager.create(self.upload([line("a", "x"), line("a", "y")]), "/v1/chat/completions")
+        with self.assertRaises(ValueError):
+            self.manager.create(self.upload([line("a", "x")]), "/v1/embeddings")
+        broken = self.manager.files.add("broken.jsonl", b"{not json}\n").id
+        with self.assertRaises(ValueError):
+            self.manager.create(broken, "/v1/chat/completions")
+
+    def test_scheduler_per_model(self):
+        """测试scheduler_for按请求的model选择scheduler"""
+        other = BatchScheduler(lambda requests: [GenerationResult(text="other", prompt_tokens=1, completion_tokens=1)
+                                                 for _ in requests]).start()
+        self.addCleanup(other.stop, 1)
+        manager = BatchJobManager(None, self.manager.files, build_request, render_response, chunk_size=2,
+                                  scheduler_for=lambda body: other if body["model"] == "checkpoint-600" else self.scheduler)
+        file_id = self.upload([line("a", "x"), line("b", "y", model="checkpoint-600")])
+        job = manager.wait(manager.create(file_id, "/v1/chat/completions").id, timeout=5)
+        contents = [output["response"]["body"]["choices"][0]["message"]["content"] for output in self.read_jsonl(job.output_file_id)]
+        self.assertEqual(contents, ["X", "other"])
+        with self.assertRaises(ValueError):
+            BatchJobManager(None, self.manager.files, build_request, render_response)
+
+    def test_stopped_scheduler(self):
+        """测试scheduler在任务中途停止（模型被卸载）时重新获取一次，仍不可用的行记为503而不是400"""
+        stopped = BatchScheduler(lambda requests: []).start()
+        stopped.stop(timeout=1)
+        schedulers = {"qwen3-sft": [stopped, self.scheduler], "checkpoint-600": [stopped, stopped]}
+        manager = BatchJobManager(None, self.manager.files, build_request, render_response, chunk_size=2,
+                                  scheduler_for=lambda body: schedulers[body["model"]].pop(0))
+        file_id = self.upload([line("a", "x"), line("b", "y", model="checkpoint-600")])
+        job = manager.wait(manager.create(file_id, "/v1/chat/completions").id, timeout=5)
+        self.assertEqual((job.completed, job.failed), (1, 1))
+        self.assertEqual(self.read_jsonl(job.output_file_id)[0]["custom_id"], "a")
+        errors = self.read_jsonl(job.error_file_id)
+        self.assertEqual(errors[0]["response"]["status_code"], 503)
+        self.assertEqual(errors[0]["error"]["code"], "server_error")
+
+    def test_openai_batch_backend(self):
+        """测试OpenAIBatchBackend提交batch任务并按请求顺序返回结果"""
+        backend = OpenAIBatchBackend("key", "http://localhost:15387/v1", poll_interval=0.01)
+        backend._client = FakeOpenAI(self.manager)
+        messages_list = [[{"role": "user", "content": content}] for content in ["走吧", "hello", "他说"]]
+        self.assertEqual(backend.chat_batch("qwen3-sft", messages_list), ["走吧", "HELLO", "他说"])
+        self.assertEqual(backend.chat_batch("qwen3-sft", []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
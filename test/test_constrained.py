@@ -0,0 +1,117 @@
+"""
+JSON schema约束解码测试用例
+
+测试JsonSchemaMatcher对合法前缀、完整文档的判断，以及response_format与停止序列的处理
+"""
+
+import json
+import unittest
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.server.constrained import (CLAUSE_LIST_SCHEMA, JsonSchemaMatcher, find_stop,
+                                        schema_from_response_format)
+
+
+def match(text, schema=CLAUSE_LIST_SCHEMA):
+    matcher = JsonSchemaMatcher(schema)
+    return matcher.advance(text), matcher.complete
+
+
+class TestJsonSchemaMatcher(unittest.TestCase):
+    """测试JsonSchemaMatcher"""
+
+    def test_clause_list(self):
+        """测试子句列表schema：合法输出在顶层数组闭合时完成，键顺序不限"""
+        text = '[{"class": "语言", "content": "走吧\\n\\"快\\u4e2d"}, {"content": "他说", "class": "旁白"}]'
+        self.assertEqual(match(text), (True, True))
+        self.assertEqual(match("[]"), (True, True))
+        self.assertEqual(match('[\n  {"class": "内心独白", "content": "这事儿"}\n]'), (True, True))
+        # 未闭合时是合法前缀但未完成
+        self.assertEqual(match('[{"class": "语'), (True, False))
+
+    def test_clause_list_rejects(self):
+        """测试缺少必填键、类别不在枚举内、多余或重复的键、思考块以及闭合后的多余内容"""
+        for text in [
+            '[{"class": "语言"}]',
+            '[{"class": "对白", "content": "走吧"}]',
+            '[{"class": "语言", "content": "走吧", "role": "萧炎"}]',
+            '[{"class": "语言", "content": "a", "class": "旁白"}]',
+            "<think>",
+            '[{"class": "语言", "content": "a"}],',
+            '[{"class": "语言", "content": "a\nb"}]',
+        ]:
+            self.assertFalse(match(text)[0], text)
+
+    def test_prefix_is_checked_per_character(self):
+        """测试逐字符推进时，合法文档的每个严格前缀都被接受且未完成"""
+        text = '[{"class": "旁白", "content": "看着这面相"}]'
+        matcher = JsonSchemaMatcher(CLAUSE_LIST_SCHEMA)
+        for i, char in enumerate(text):
+            self.assertTrue(matcher.advance(char), text[:i + 1])
+            self.assertEqual(matcher.complete, i == len(text) - 1)
+
+    def test_accepts_does_not_change_state(self):
+        """测试accepts只在副本上尝试，in_free_string只在自由字符串内为真"""
+        matcher = JsonSchemaMatcher(CLAUSE_LIST_SCHEMA)
+        matcher.advance('[{"class": "')
+        self.assertFalse(matcher.in_free_string)
+        self.assertTrue(matcher.accepts("语言"))
+        self.assertFalse(matcher.accepts("对白"))
+        matcher.advance('语言", "content": "')
+        self.assertTrue(matcher.in_free_string)
+        self.assertTrue(matcher.accepts('任意文本"}]'))
+        self.assertFalse(matcher.complete)
+
+    def test_any_json(self):
+        """测试不带type的schema接受任意JSON，并与json.loads的结果一致"""
+        for text in ['{"a": [1, 2.5e3, -0, true, null, {"b": "c"}]}', '[1, 2 ]', '"x"', '{}']:
+            json.loads(text)
+            self.assertEqual(match(text, {}), (True, True), text)
+        for text in ['{"a": 1, "a": 2}', '[01]', '[1.e5]', '{"a": -}', "[tru]", "{'a': 1}"]:
+            self.assertFalse(all(match(text, {})), text)
+
+    def test_number_types(self):
+        """测试integer与number的区分"""
+        schema = {"type": "object", "properties": {"n": {"type": "integer"}, "m": {"type": "number"}}}
+        self.assertEqual(match('{"n": 12, "m": -1.5e-3}', schema), (True, True))
+        self.assertFalse(match('{"n": 1.5}', schema)[0])
+
+    def test_whitespace_limit(self):
+        """测试连续空白超过上限时拒绝，避免模型无限输出空白"""
+        self.assertFalse(match("[" + " " * 100)[0])
+
+    def test_unsupported_schema(self):
+        """测试不支持的schema在构造时报错"""
+        with self.assertRaises(ValueError):
+            JsonSchemaMatcher({"type": "tuple"})
+        with self.assertRaises(ValueError):
+            JsonSchemaMatcher({"enum": [1, 2]})
+
+
+class TestRequestOptions(unittest.TestCase):
+    """测试response_format解析与停止序列"""
+
+    def test_schema_from_response_format(self):
+        self.assertIsNone(schema_from_response_format(None))
+        self.assertIsNone(schema_from_response_format({"type": "text"}))
+        self.assertEqual(schema_from_response_format({"type": "json_object"}), {"type": "object"})
+        self.assertIs(schema_from_response_format({"type": "json_schema", "json_schema": {"name": "clause_list"}}), CLAUSE_LIST_SCHEMA)
+        schema = {"type": "array", "items": {"type": "string"}}
+        self.assertEqual(schema_from_response_format({"type": "json_schema", "json_schema": {"name": "x", "schema": schema}}), schema)
+        with self.assertRaises(ValueError):
+            schema_from_response_format({"type": "json_schema", "json_schema": {"name": "unknown"}})
+        with self.assertRaises(ValueError):
+            schema_from_response_format({"type": "xml"})
+
+    def test_find_stop(self):
+        self.assertEqual(find_stop("答案</think>多余", ["</think>", "多"]), 2)
+        self.assertEqual(find_stop("答案", ["###"]), -1)
+        self.assertEqual(find_stop("答案", []), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+延迟导入测试用例
+
+测试导入管线与TTS客户端时不会加载重量级的可选依赖
+"""
+
+import unittest
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+# 添加项目根目录到Python路径
+sys.path.insert(0, ROOT)
+
+from src.template.LLM_prompt import LLM_prompt
+
+HEAVY_MODULES = ("openai", "langchain", "numpy", "soundfile", "requests", "torch", "transformers")
+
+
+def _loaded_heavy_modules(target: str):
+    code = f"import sys; import {target}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+class TestLazyImports(unittest.TestCase):
+    """延迟导入测试类"""
+
+    def test_pipeline(self):
+        """测试导入管线不加载模型客户端与推理依赖"""
+        self.assertEqual(_loaded_heavy_modules("pipeline"), [])
+
+    def test_tts_client(self):
+        """测试导入TTS客户端不加载音频处理依赖"""
+        self.assertEqual(_loaded_heavy_modules("src.tts.clients.clients"), [])
+
+    def test_backend_created_lazily(self):
+        """测试创建LLM_prompt时不创建openai客户端"""
+        llm_prompt = LLM_prompt("")
+        self.assertIsNone(llm_prompt.backend._client)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
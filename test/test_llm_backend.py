@@ -0,0 +1,75 @@
+"""
+LLM推理后端测试用例
+
+测试批次划分，以及LLM_prompt的批量接口与逐条调用结果一致
+"""
+
+import unittest
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.template.llm_backend import LLMBackend, plan_batches
+from src.template.LLM_prompt import LLM_prompt
+from src.template.sentences_json import SentencesJsonListCrud
+
+
+class FakeBackend(LLMBackend):
+    """按系统提示词返回固定输出的后端，记录每次调用的请求数"""
+
+    OUTPUTS = {
+        "台本中的复杂文本进行分割": '[{"class": "语言", "content": "走吧"}, {"class": "旁白", "content": "他说"}]',
+        "代词替换为具体的说话人.": '[{"ta": "他", "name": "萧炎"}]',
+        "代词替换为具体的说话人。": "萧炎",
+    }
+
+    def __init__(self):
+        self.calls = []
+
+    def chat(self, model, messages, extra_body=None):
+        self.calls.append(1)
+        return next(output for key, output in self.OUTPUTS.items() if key in messages[0]["content"])
+
+    def chat_batch(self, model, messages_list, extra_body=None):
+        self.calls.append(len(messages_list))
+        return [next(output for key, output in self.OUTPUTS.items() if key in messages[0]["content"]) for messages in messages_list]
+
+
+class TestLLMBackend(unittest.TestCase):
+    """推理后端测试类"""
+
+    def test_plan_batches(self):
+        """测试按长度排序分批，且不超过请求数与token数上限"""
+        lengths = [50, 10, 40, 20, 30, 10]
+        self.assertEqual(plan_batches(lengths, 2), [[1, 5], [3, 4], [2, 0]])
+        batches = plan_batches(lengths, 4, max_batch_tokens=60)
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(len(lengths))))
+        for batch in batches:
+            self.assertLessEqual(max(lengths[i] for i in batch) * len(batch), 60)
+        self.assertEqual(plan_batches([], 4), [])
+
+    def test_batch_matches_single(self):
+        """测试批量接口一次提交所有请求，结果与逐条调用一致"""
+        llm_prompt = LLM_prompt("")
+        llm_prompt.backend = FakeBackend()
+        crud = SentencesJsonListCrud(Windows_Size=1)
+        crud.create_many(None, [{"class": None, "sub_sentence": f"他说走吧{i}", "describe": {"role": None, "style": None}} for i in range(4)])
+        items = list(crud.data)
+
+        batched = llm_prompt.use_prompt_with_class_batch("fine_split_process", items)
+        self.assertEqual(llm_prompt.backend.calls, [4])
+        single = [llm_prompt.use_prompt_with_class("fine_split_process", item) for item in items]
+        self.assertEqual([[ctx.read_all() for ctx in ctx_list] for ctx_list in batched], [[ctx.read_all() for ctx in ctx_list] for ctx_list in single])
+
+        llm_prompt.use_prompt_with_class_batch("classify_ta_name", items)
+        self.assertEqual([item.read_origin_sub_sentence() for item in items], [f"他(萧炎)说走吧{i}" for i in range(4)])
+        llm_prompt.use_prompt_with_class_batch("batch_classify_role", items[:2])
+        self.assertEqual([item.read_describe_role() for item in items], ["萧炎", "萧炎", None, None])
+        self.assertEqual(llm_prompt.backend.calls[-2:], [4, 2])
+        self.assertEqual(llm_prompt.use_prompt_with_class_batch("batch_classify_role", []), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,111 @@
+"""
+多checkpoint模型池测试用例
+
+使用假的加载函数测试ModelPool的懒加载、按内存上限的LRU淘汰与并发加载，以及checkpoint名称解析，不依赖torch
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.server.model_pool import ModelPool, checkpoint_bytes, list_checkpoints, resolve_checkpoint
+
+
+class TestModelPool(unittest.TestCase):
+    """测试ModelPool"""
+
+    def setUp(self):
+        self.loads, self.unloads, self.busy = [], [], set()
+
+        def load(key):
+            self.loads.append(key)
+            time.sleep(0.05)
+            if key == "broken":
+                raise OSError("no weights")
+            return {"key": key}
+
+        self.pool = ModelPool(load, lambda value: self.unloads.append(value["key"]), max_bytes=200,
+                              estimate=lambda key: 100, is_busy=lambda value: value["key"] in self.busy)
+
+    def test_lazy_load_and_lru_eviction(self):
+        """测试首次使用时加载，超出上限时淘汰最久未用的checkpoint"""
+        self.assertNotIn("a", self.pool)
+        self.assertEqual(self.pool.get("a"), {"key": "a"})
+        self.pool.get("b")
+        self.pool.get("a")
+        self.pool.get("c")
+        self.assertEqual(self.loads, ["a", "b", "c"])
+        self.assertEqual(self.unloads, ["b"])
+        self.assertEqual([entry["path"] for entry in self.pool.stats()], ["a", "c"])
+        self.assertEqual(self.pool.total_bytes, 200)
+
+    def test_busy_models_are_kept(self):
+        """测试仍有排队请求的checkpoint不被淘汰，池子暂时超出上限"""
+        self.pool.get("a")
+        self.pool.get("b")
+        self.busy.update({"a", "b"})
+        self.pool.get("c")
+        self.assertEqual(self.unloads, [])
+        self.assertEqual(self.pool.total_bytes, 300)
+
+    def test_concurrent_get_loads_once(self):
+        """测试同一checkpoint的并发请求只加载一次"""
+        values = []
+        threads = [threading.Thread(target=lambda: values.append(self.pool.get("a"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.loads, ["a"])
+        self.assertEqual(len(values), 4)
+
+    def test_load_error_and_evict(self):
+        """测试加载失败时抛出异常且不留在池中，evict立即卸载"""
+        with self.assertRaises(OSError):
+            self.pool.get("broken")
+        self.assertEqual(self.pool.stats(), [])
+        self.pool.get("a")
+        self.assertTrue(self.pool.evict("a"))
+        self.assertFalse(self.pool.evict("a"))
+        self.assertEqual(self.unloads, ["a"])
+        self.assertIsNone(self.pool.peek("a"))
+
+
+class TestCheckpoints(unittest.TestCase):
+    """测试checkpoint目录的列举、解析与大小估计"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ["checkpoint-300", "checkpoint-600"]:
+            os.makedirs(os.path.join(self.directory, name))
+            with open(os.path.join(self.directory, name, "config.json"), "w") as f:
+                f.write("{}")
+        with open(os.path.join(self.directory, "checkpoint-300", "model.safetensors"), "wb") as f:
+            f.write(b"\0" * 1000)
+        with open(os.path.join(self.directory, "checkpoint-300", "training_args.bin"), "wb") as f:
+            f.write(b"\0" * 10)
+        os.makedirs(os.path.join(self.directory, "runs"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_resolve(self):
+        self.assertEqual(list_checkpoints(self.directory), ["checkpoint-300", "checkpoint-600"])
+        self.assertEqual(resolve_checkpoint("checkpoint-600", self.directory), os.path.join(self.directory, "checkpoint-600"))
+        for name in ["qwen3-sft", "runs", "..", "../checkpoint-300", "", None]:
+            self.assertIsNone(resolve_checkpoint(name, self.directory), name)
+        self.assertEqual(list_checkpoints(os.path.join(self.directory, "missing")), [])
+
+    def test_checkpoint_bytes(self):
+        self.assertEqual(checkpoint_bytes(os.path.join(self.directory, "checkpoint-300")), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+共享前缀缓存测试用例
+
+测试热点前缀的识别，以及按字节上限的LRU淘汰
+"""
+
+import unittest
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.server.prefix_cache import PrefixCache
+
+
+SYSTEM = list(range(1000, 1010))
+
+
+class TestPrefixCache(unittest.TestCase):
+    """测试PrefixCache"""
+
+    def test_batch_shared_prefix(self):
+        """测试同一批次的请求共享前缀时返回按块对齐的前缀长度，且至少留一个token给后缀"""
+        cache = PrefixCache(max_bytes=100, block_size=4)
+        rows = [SYSTEM + [1, 2], SYSTEM + [3, 4, 5]]
+        self.assertEqual(cache.observe(rows), 8)
+        # 前缀恰好是整个提示词时，最后一块不能进入前缀
+        self.assertEqual(cache.observe([SYSTEM[:8], SYSTEM[:8] + [1]]), 4)
+        self.assertEqual(cache.observe([[1, 2, 3, 4, 5], [9, 2, 3, 4, 5]]), 0)
+        self.assertEqual(cache.observe([]), 0)
+
+    def test_single_request_needs_repeats(self):
+        """测试单条请求的前缀要出现min_hits次才算热点"""
+        cache = PrefixCache(max_bytes=100, block_size=4, min_hits=2)
+        self.assertEqual(cache.observe([SYSTEM + [1]]), 0)
+        self.assertEqual(cache.observe([SYSTEM + [2, 3]]), 8)
+        self.assertEqual(cache.observe([[7] * 9]), 0)
+
+    def test_get_put(self):
+        """测试按前缀存取，只接受块对齐的前缀，并统计命中"""
+        cache = PrefixCache(max_bytes=100, block_size=4)
+        self.assertIsNone(cache.get(SYSTEM[:8]))
+        self.assertTrue(cache.put(SYSTEM[:8], "kv", 10))
+        self.assertFalse(cache.put(SYSTEM[:7], "kv", 10))
+        self.assertEqual(cache.get(SYSTEM[:8]), "kv")
+        self.assertIsNone(cache.get(SYSTEM[:4]))
+        self.assertEqual(cache.stats(), {"entries": 1, "bytes": 10, "hits": 1, "misses": 2})
+        # 已缓存的前缀即使只出现一次也直接复用
+        fresh = PrefixCache(max_bytes=100, block_size=4, min_hits=5)
+        fresh.put(SYSTEM[:8], "kv", 10)
+        self.assertEqual(fresh.observe([SYSTEM + [1]]), 8)
+
+    def test_lru_eviction(self):
+        """测试超过字节上限时淘汰最久未使用的前缀"""
+        cache = PrefixCache(max_bytes=25, block_size=2)
+        cache.put([1, 1], "a", 10)
+        cache.put([2, 2], "b", 10)
+        cache.get([1, 1])
+        cache.put([3, 3], "c", 10)
+        self.assertEqual(cache.get([1, 1]), "a")
+        self.assertIsNone(cache.get([2, 2]))
+        self.assertEqual(cache.get([3, 3]), "c")
+        self.assertEqual(cache.total_bytes, 20)
+        # 单个超过上限的值不缓存
+        self.assertFalse(cache.put([4, 4], "d", 30))
+        # 覆盖同一前缀时替换原有大小
+        cache.put([3, 3], "c2", 5)
+        self.assertEqual((len(cache), cache.total_bytes), (2, 15))
+
+
+if __name__ == '__main__':
+    unittest.main()
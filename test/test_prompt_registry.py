@@ -0,0 +1,83 @@
+"""
+PromptRegistry 测试用例
+
+测试提示词模板的加载、字段解析、版本号与热重载
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.template.prompt_registry import PromptRegistry, get_prompt_registry
+from src.template.BaseClassTemp.BaseEvalClass import EvalClass
+
+
+class TestPromptRegistry(unittest.TestCase):
+    """提示词注册表测试类"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self._write("split", "上下文: {context}\n子句: {clause}\n输出: [{{\"class\": \"旁白\"}}]")
+        self._write("eval", "{sentence}|{response}")
+        with open(os.path.join(self.tmp.name, "readme.txt"), "w", encoding="utf-8") as f:
+            f.write("不是模板")
+        self.registry = PromptRegistry(self.tmp.name, check_interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, text, mtime_ns=None):
+        path = os.path.join(self.tmp.name, f"{name}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_load_and_format(self):
+        """测试只加载md文件，解析格式化字段并填充"""
+        self.assertEqual(self.registry.names(), ["eval", "split"])
+        template = self.registry.get("split")
+        self.assertEqual(template.fields, {"context", "clause"})
+        self.assertEqual(template.format(context="上文", clause="子句"), "上下文: 上文\n子句: 子句\n输出: [{\"class\": \"旁白\"}]")
+        with self.assertRaises(KeyError):
+            template.format(context="上文")
+        with self.assertRaises(ValueError):
+            self.registry.get("readme")
+
+    def test_hot_reload(self):
+        """测试修改、新增、删除模板后自动重新加载，版本号随内容变化"""
+        version, split_version = self.registry.version, self.registry.get("split").version
+        self._write("split", "{clause}", mtime_ns=10 ** 18)
+        self._write("role", "{clause}")
+        os.remove(os.path.join(self.tmp.name, "eval.md"))
+        self.assertEqual(self.registry.get("split").format(clause="子句"), "子句")
+        self.assertNotEqual(self.registry.get("split").version, split_version)
+        self.assertNotEqual(self.registry.version, version)
+        self.assertEqual(self.registry.names(), ["role", "split"])
+
+    def test_unchanged_files_not_reread(self):
+        """测试文件未修改时重新加载不会重新创建模板"""
+        template = self.registry.get("split")
+        self.assertEqual(self.registry.reload(), [])
+        self.assertIs(self.registry.get("split"), template)
+
+    def test_shared_registry(self):
+        """测试同一目录在进程内共享同一个注册表，默认目录与工作目录无关"""
+        self.assertIs(get_prompt_registry(self.tmp.name), get_prompt_registry(self.tmp.name + os.sep))
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.tmp.name)
+            self.assertIn("fine_split_process", get_prompt_registry())
+            sample = EvalClass(task_id=0, origin_input=None, ref_resp=None)
+            sample.write_origin_input({"context": "上文", "clause": "子句"})
+            self.assertEqual(sample.read_origin_input(), get_prompt_registry().get("fine_split_process").format(context="上文", clause="子句"))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+"""
+多副本数据并行服务测试用例
+
+用假的engine在spawn出的CPU工作进程中运行ReplicaPool，测试路由、流式输出、取消以及崩溃重启，不依赖torch
+"""
+
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import CancelledError
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.server.replicas import ReplicaPool, cpu_threads_per_worker
+from src.llm.server.scheduler import GenerationRequest, GenerationResult, QueueFullError
+
+
+class EchoEngine:
+    """把最后一条消息原样返回并带上设备名；"slow"会等待，"crash"会直接退出进程"""
+
+    def __init__(self, device):
+        self.device = device
+
+    def generate_batch(self, requests):
+        results = []
+        for request in requests:
+            content = request.messages[-1]["content"]
+            if content == "crash":
+                os._exit(3)
+            if content == "slow":
+                deadline = time.time() + 5
+                while not request.cancelled and time.time() < deadline:
+                    time.sleep(0.01)
+            if request.on_text is not None:
+                for char in content:
+                    request.on_text(char)
+            results.append(GenerationResult(text=f"{self.device}:{content}", prompt_tokens=1, completion_tokens=len(content),
+                                            finish_reason="cancelled" if request.cancelled else "stop"))
+        return results
+
+
+def echo_engine(model_path, device):
+    return EchoEngine(device)
+
+
+def request(content, **kwargs):
+    return GenerationRequest(messages=[{"role": "user", "content": content}], **kwargs)
+
+
+class TestReplicaPool(unittest.TestCase):
+    """测试ReplicaPool"""
+
+    def setUp(self):
+        self.pool = ReplicaPool("unused", ["cpu:0", "cpu:1"], engine_factory=echo_engine, max_batch_size=1,
+                                max_wait_ms=1, max_queue_size=1, restart_delay=0.1, poll_interval=0.05).start()
+        self.assertTrue(self.pool.wait_ready(timeout=60))
+
+    def tearDown(self):
+        self.pool.stop(timeout=5)
+
+    def test_least_loaded_routing(self):
+        """测试请求分到负载最低的工作进程，结果通过future返回"""
+        slow = self.pool.submit(request("slow"))
+        self.assertEqual(self.pool.submit(request("hi")).result(timeout=10).text.split(":")[1], "1")
+        slow.cancel()
+
+    def test_streaming(self):
+        """测试流式文本在父进程中交给on_text"""
+        pieces = []
+        result = self.pool.submit(request("走吧", on_text=pieces.append)).result(timeout=10)
+        self.assertEqual(result.text, "cpu:0:走吧")
+        self.assertEqual("".join(pieces), "走吧")
+
+    def test_queue_full(self):
+        """测试所有工作进程都满时抛出QueueFullError，取消后释放名额"""
+        requests = [request("slow") for _ in range(4)]
+        for item in requests:
+            self.pool.submit(item)
+        with self.assertRaises(QueueFullError):
+            self.pool.submit(request("x"))
+        for item in requests:
+            item.cancel()
+        deadline = time.time() + 10
+        while self.pool.queue_depth and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.pool.queue_depth, 0)
+        with self.assertRaises(CancelledError):
+            requests[0].future.result()
+
+    def test_restart_after_crash(self):
+        """测试工作进程崩溃时其请求报错，进程被重启后继续服务"""
+        with self.assertRaises(RuntimeError):
+            self.pool.submit(request("crash")).result(timeout=10)
+        self.assertTrue(self.pool.wait_ready(timeout=60))
+        self.assertEqual(sum(stats["restarts"] for stats in self.pool.stats()), 1)
+        self.assertTrue(self.pool.submit(request("ok")).result(timeout=10).text.endswith(":ok"))
+
+
+class TestCpuThreads(unittest.TestCase):
+    """测试CPU工作进程之间的线程数分配"""
+
+    def test_cpu_threads_per_worker(self):
+        self.assertEqual(cpu_threads_per_worker(["cpu", "cpu"], total=16), 8)
+        self.assertEqual(cpu_threads_per_worker(["cpu", "cpu", "cuda:0"], total=5), 2)
+        self.assertEqual(cpu_threads_per_worker(["cpu"] * 4, total=2), 1)
+        self.assertIsNone(cpu_threads_per_worker(["cuda:0", "cuda:1"]))
+        self.assertGreaterEqual(cpu_threads_per_worker(["cpu"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
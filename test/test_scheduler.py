@@ -0,0 +1,194 @@
+"""
+本地推理服务批处理调度器测试用例
+
+使用假的generate_batch，不依赖torch与模型
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.server.scheduler import BatchScheduler, GenerationRequest, GenerationResult, QueueFullError
+
+
+def make_request(text="你好", max_tokens=16):
+    return GenerationRequest(messages=[{"role": "user", "content": text}], max_tokens=max_tokens)
+
+
+class FakeEngine:
+    """记录每个批次的大小，把输入原样作为输出返回"""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def generate_batch(self, requests):
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append(len(requests))
+        return [GenerationResult(text=request.messages[-1]["content"], prompt_tokens=1, completion_tokens=1) for request in requests]
+
+
+class TestBatchScheduler(unittest.TestCase):
+    """测试BatchScheduler"""
+
+    def setUp(self):
+        self.schedulers = []
+
+    def tearDown(self):
+        for scheduler in self.schedulers:
+            scheduler.stop(timeout=1)
+
+    def make_scheduler(self, engine, **kwargs):
+        scheduler = BatchScheduler(engine.generate_batch, **kwargs)
+        self.schedulers.append(scheduler)
+        return scheduler
+
+    def test_batches_up_to_max_batch_size(self):
+        """测试排队的请求被合并成不超过max_batch_size的批次，且结果对应各自的请求"""
+        engine = FakeEngine()
+        scheduler = self.make_scheduler(engine, max_batch_size=4, max_wait_ms=50)
+        futures = [scheduler.submit(make_request(str(i))) for i in range(10)]
+        scheduler.start()
+        self.assertEqual([future.result(timeout=5).text for future in futures], [str(i) for i in range(10)])
+        self.assertEqual(engine.batches, [4, 4, 2])
+
+    def test_flush_after_max_wait(self):
+        """测试批次未满时，最早的请求等待max_wait后也会被执行"""
+        engine = FakeEngine()
+        scheduler = self.make_scheduler(engine, max_batch_size=8, max_wait_ms=20).start()
+        started = time.perf_counter()
+        result = scheduler.submit(make_request("单条")).result(timeout=5)
+        self.assertEqual(result.text, "单条")
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertEqual(engine.batches, [1])
+
+    def test_queue_full(self):
+        """测试队列已满时拒绝新请求"""
+        engine = FakeEngine()
+        scheduler = self.make_scheduler(engine, max_queue_size=2)
+        scheduler.submit(make_request())
+        scheduler.submit(make_request())
+        with self.assertRaises(QueueFullError):
+            scheduler.submit(make_request())
+        self.assertEqual(scheduler.queue_depth, 2)
+
+    def test_exception_propagates_to_batch(self):
+        """测试generate_batch抛出的异常传给该批的所有请求，且worker继续处理后续请求"""
+        calls = []
+
+        def generate_batch(requests):
+            calls.append(len(requests))
+            if len(calls) == 1:
+                raise RuntimeError("显存不足")
+            return [GenerationResult(text="ok", prompt_tokens=1, completion_tokens=1) for _ in requests]
+
+        scheduler = BatchScheduler(generate_batch, max_wait_ms=0)
+        self.schedulers.append(scheduler)
+        futures = [scheduler.submit(make_request()) for _ in range(2)]
+        scheduler.start()
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        self.assertEqual(scheduler.submit(make_request()).result(timeout=5).text, "ok")
+
+    def test_result_count_mismatch(self):
+        """测试返回结果数量与批次不一致时报错"""
+        scheduler = BatchScheduler(lambda requests: [], max_wait_ms=0).start()
+        self.schedulers.append(scheduler)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(make_request()).result(timeout=5)
+
+    def test_cancelled_requests_are_skipped(self):
+        """测试已取消的请求不进入批次"""
+        engine = FakeEngine()
+        scheduler = self.make_scheduler(engine, max_batch_size=8, max_wait_ms=0)
+        cancelled = scheduler.submit(make_request("取消"))
+        kept = scheduler.submit(make_request("保留"))
+        self.assertTrue(cancelled.cancel())
+        scheduler.start()
+        self.assertEqual(kept.result(timeout=5).text, "保留")
+        self.assertEqual(engine.batches, [1])
+
+    def test_request_cancel(self):
+        """测试GenerationRequest.cancel在排队时取消future，运行中时只设置cancelled标记供生成循环检查"""
+        gate = threading.Event()
+        seen = []
+
+        def generate_batch(requests):
+            gate.wait()
+            seen.append([request.cancelled for request in requests])
+            return [GenerationResult(text="", prompt_tokens=1, completion_tokens=0) for _ in requests]
+
+        scheduler = BatchScheduler(generate_batch, max_batch_size=1, max_wait_ms=0).start()
+        self.schedulers.append(scheduler)
+        running = make_request("运行中")
+        queued = make_request("排队中")
+        running_future = scheduler.submit(running)
+        while scheduler.queue_depth:
+            time.sleep(0.001)
+        queued_future = scheduler.submit(queued)
+        queued.cancel()
+        running.cancel()
+        gate.set()
+        self.assertTrue(queued_future.cancelled())
+        self.assertEqual(running_future.result(timeout=5).completion_tokens, 0)
+        self.assertEqual(seen, [[True]])
+
+    def test_in_flight_counts_running_batch(self):
+        """测试in_flight同时计入排队与正在生成的请求，queue_depth只计排队"""
+        gate = threading.Event()
+        scheduler = self.make_scheduler(FakeEngine(gate), max_batch_size=1, max_wait_ms=0).start()
+        first = scheduler.submit(make_request("一"))
+        scheduler.submit(make_request("二"))
+        while scheduler.queue_depth > 1:
+            time.sleep(0.001)
+        self.assertEqual((scheduler.queue_depth, scheduler.in_flight), (1, 2))
+        gate.set()
+        first.result(timeout=5)
+        deadline = time.time() + 5
+        while scheduler.in_flight and time.time() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    def test_queue_and_compute_time(self):
+        """测试结果中分别记录排队时间与批次计算时间"""
+        def generate_batch(requests):
+            time.sleep(0.05)
+            return [GenerationResult(text="", prompt_tokens=1, completion_tokens=1) for _ in requests]
+
+        scheduler = BatchScheduler(generate_batch, max_batch_size=1, max_wait_ms=0).start()
+        self.schedulers.append(scheduler)
+        first, second = scheduler.submit(make_request()), scheduler.submit(make_request())
+        first, second = first.result(timeout=5), second.result(timeout=5)
+        self.assertGreaterEqual(first.compute_time, 0.04)
+        self.assertGreaterEqual(second.compute_time, 0.04)
+        # 第二条请求需要等第一批结束
+        self.assertGreaterEqual(second.queue_time, 0.04)
+        self.assertLess(first.queue_time, second.queue_time)
+        self.assertGreater(scheduler.estimated_wait(), 0)
+
+    def test_stop_cancels_pending(self):
+        """测试stop取消仍在排队的请求，之后不再接受新请求"""
+        gate = threading.Event()
+        engine = FakeEngine(gate)
+        scheduler = self.make_scheduler(engine, max_batch_size=1, max_wait_ms=0).start()
+        running = scheduler.submit(make_request("运行中"))
+        while scheduler.queue_depth:
+            time.sleep(0.001)
+        pending = scheduler.submit(make_request("排队中"))
+        threading.Timer(0.05, gate.set).start()
+        scheduler.stop(timeout=5)
+        self.assertEqual(running.result(timeout=5).text, "运行中")
+        self.assertTrue(pending.cancelled())
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(make_request())
+
+
+if __name__ == '__main__':
+    unittest.main()
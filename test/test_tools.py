@@ -0,0 +1,125 @@
+"""
+tools 工具函数测试用例
+
+测试文本预处理等工具函数
+"""
+
+import unittest
+import io
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.tools import decode_model_json, parse_list_of_dicts, is_all_symbols, is_all_symbols_batch, check_sub_ta, check_sub_ta_batch, preprocess_text, preprocess_text_stream, replace_ta_to_name, replace_ta_to_name_batch
+
+
+class TestPreprocessText(unittest.TestCase):
+    """文本预处理测试类"""
+
+    TEXT = "\n  \n“萧炎，斗之力，三段！”\n\n　\n望着测验魔石碑……少年 面无表情。\n  \n"
+
+    def test_preprocess_text(self):
+        """测试删除空行、中文符号替换与删除空格"""
+        self.assertEqual(preprocess_text(self.TEXT), "'萧炎,斗之力,三段!'\n望着测验魔石碑......少年面无表情.")
+        self.assertEqual(preprocess_text(""), "")
+
+    def test_stream_matches_full_text(self):
+        """测试流式处理的结果与整体处理一致，块边界可以落在任意位置"""
+        expected = preprocess_text(self.TEXT)
+        for size in range(1, len(self.TEXT) + 1):
+            chunks = [self.TEXT[i:i + size] for i in range(0, len(self.TEXT), size)]
+            self.assertEqual("".join(preprocess_text_stream(chunks)), expected)
+
+    def test_stream_file_iterator(self):
+        """测试直接处理按行迭代的文件对象"""
+        self.assertEqual("".join(preprocess_text_stream(io.StringIO(self.TEXT))), preprocess_text(self.TEXT))
+
+
+class TestReplaceTaToName(unittest.TestCase):
+    """代词替换测试类"""
+
+    def test_in_order(self):
+        """测试同一代词的多个映射按出现顺序使用，且不修改传入的映射表"""
+        ta_list = [{"ta": "他", "name": "萧炎"}, {"ta": "她", "name": "萧薰儿"}, {"ta": "他", "name": "萧战"}]
+        result = replace_ta_to_name(ta_list, "他看着她，他们都笑了，他也笑了")
+        self.assertEqual(result, "他(萧炎)看着她(萧薰儿)，他(萧战)们都笑了，他也笑了")
+        self.assertEqual(len(ta_list), 3)
+
+    def test_prefer_earlier_mapping(self):
+        """测试同一位置能匹配多个代词时使用列表中靠前的映射"""
+        self.assertEqual(replace_ta_to_name([{"ta": "他们", "name": "众人"}, {"ta": "他", "name": "萧炎"}], "他们和他"), "他们(众人)和他(萧炎)")
+        self.assertEqual(replace_ta_to_name([{"ta": "他", "name": "萧炎"}, {"ta": "他们", "name": "众人"}], "他们和他"), "他(萧炎)们和他")
+
+    def test_occurrence_index(self):
+        """测试带index的映射只标注代词的指定次出现"""
+        ta_list = [{"ta": "他", "name": "萧战", "index": 1}, {"ta": "他", "name": "萧炎"}]
+        self.assertEqual(replace_ta_to_name(ta_list, "他说他会来"), "他(萧炎)说他(萧战)会来")
+
+    def test_batch(self):
+        """测试批量替换与逐条替换结果一致"""
+        ta_lists = [[{"ta": "我", "name": "萧炎"}], [{"ta": "自己", "name": "药老"}], []]
+        sub_sentences = ["我来了", "他自己说的", "没有代词"]
+        self.assertEqual(replace_ta_to_name_batch(ta_lists, sub_sentences), [replace_ta_to_name(t, s) for t, s in zip(ta_lists, sub_sentences)])
+
+
+class TestClauseScreening(unittest.TestCase):
+    """子句筛查测试类"""
+
+    CLAUSES = ["……！", "", "他说", "自己来", "Ta", "ta好", "第3句", "_~", "，。", "您"]
+
+    def test_is_all_symbols_batch(self):
+        """测试批量符号筛查与逐条结果一致，None视为空子句"""
+        self.assertEqual(is_all_symbols_batch(self.CLAUSES), [is_all_symbols(s) for s in self.CLAUSES])
+        self.assertEqual(is_all_symbols_batch(["……", None]), [True, False])
+
+    def test_check_sub_ta_batch(self):
+        """测试批量代词筛查与逐条结果一致"""
+        self.assertEqual(check_sub_ta_batch(iter(self.CLAUSES)), [check_sub_ta(s) for s in self.CLAUSES])
+        self.assertEqual(check_sub_ta_batch(self.CLAUSES)[2:6], [True, True, False, True])
+
+
+class TestDecodeModelJson(unittest.TestCase):
+    """模型输出JSON解析测试类"""
+
+    EXPECTED = [{"class": "语言", "content": "'萧炎,斗之力,三段!'"}, {"class": "旁白", "content": "少年面无表情"}]
+
+    def test_fast_path(self):
+        """测试合法JSON不经过任何修复"""
+        text = '```json\n[{"class": "语言", "content": "\'萧炎,斗之力,三段!\'"}, {"class": "旁白", "content": "少年面无表情"}]\n```'
+        self.assertEqual(decode_model_json(text), (self.EXPECTED, []))
+
+    def test_repairs(self):
+        """测试常见格式问题被修复，并报告修复项"""
+        cases = {
+            "好的：[{'class': '语言', 'content': ''萧炎,斗之力,三段!''}, {'class': '旁白', 'content': '少年面无表情'},] 以上": ["extract", "single_quotes", "inner_quotes", "trailing_comma"],
+            '[{“class”：“语言”，“content”：“\'萧炎,斗之力,三段!\'”}, {"class": "旁白", "content": "少年面无表情"}': ["full_width_quotes", "full_width_punctuation", "unbalanced_brackets"],
+            '[{"class": "语言", "content": "\'萧炎,斗之力,三段!\'"} {class: 旁白, content: 少年面无表情}]': ["missing_comma", "unquoted"],
+        }
+        for text, repairs in cases.items():
+            parsed, applied = decode_model_json(text)
+            self.assertEqual(parsed, self.EXPECTED)
+            self.assertEqual(sorted(applied), sorted(repairs))
+
+    def test_truncated(self):
+        """测试输出被截断时保留已输出的部分"""
+        parsed, repairs = decode_model_json('[{"class": "语言", "content": "\'萧炎,斗之力,三段!\'"}, {"class": "旁白", "content": "少年面')
+        self.assertEqual(parsed, [self.EXPECTED[0], {"class": "旁白", "content": "少年面"}])
+        self.assertIn("truncated", repairs)
+        # 截断在字符串中的反斜杠之后
+        parsed, repairs = decode_model_json('[{"a": "x\\')
+        self.assertEqual(parsed, [{"a": "x"}])
+        self.assertIn("truncated", repairs)
+        self.assertEqual(parse_list_of_dicts('[{"class":"语言","content":"他说\\'), [{"class": "语言", "content": "他说"}])
+
+    def test_parse_list_of_dicts(self):
+        """测试单个对象包装为列表，无法解析或不是字典列表时返回False"""
+        self.assertEqual(parse_list_of_dicts('{"class": "旁白"}'), [{"class": "旁白"}])
+        self.assertFalse(parse_list_of_dicts("没有任何结构"))
+        self.assertFalse(parse_list_of_dicts("[1, 2]"))
+        self.assertFalse(parse_list_of_dicts(None))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)